@@ -0,0 +1,62 @@
+# authentification/authentication.py
+"""
+Authentification JWT avec cache des utilisateurs.
+
+SimpleJWT relit l'utilisateur en base à chaque requête, puis la plupart des
+vues lisent son profil. Ici l'utilisateur est chargé avec son profil
+(select_related) et gardé AUTH_USER_CACHE_TTL secondes dans l'espace de
+cache 'utilisateurs' ; le cache est invalidé à chaque enregistrement ou
+suppression d'un User ou d'un profil (authentification/signals.py).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from taxibe_backend import caches
+
+User = get_user_model()
+
+
+def utilisateur_en_cache(user_id):
+    """User (profil préchargé) ou None ; une requête au plus, puis cache."""
+    return caches.obtenir(
+        'utilisateurs', ('auth', user_id),
+        lambda: User.objects.select_related('profile').filter(pk=user_id).first(),
+        getattr(settings, 'AUTH_USER_CACHE_TTL', 300),
+    )
+
+
+def invalider_utilisateur(*user_ids):
+    caches.supprimer('utilisateurs', *[('auth', user_id) for user_id in user_ids if user_id])
+
+
+class JWTAuthentificationTaxibe(JWTAuthentication):
+    """JWTAuthentication dont la recherche de l'utilisateur passe par le cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if api_settings.USER_ID_FIELD == 'id':
+            user = utilisateur_en_cache(user_id)
+        else:
+            user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -14,7 +14,5 @@ class AuthentificationTaxibeBackend(BaseBackend):
         return None
 
     def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
+        from .authentication import utilisateur_en_cache
+        return utilisateur_en_cache(user_id)
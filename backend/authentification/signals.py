@@ -0,0 +1,31 @@
+# authentification/signals.py
+"""
+Invalidation du cache des utilisateurs authentifiés
+(authentification/authentication.py).
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from utilisateur.models import Utilisateur
+from .authentication import invalider_utilisateur
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def invalider_user(sender, instance, update_fields=None, **kwargs):
+    # La date de dernière connexion, seule, ne justifie pas de vider le cache
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalider_utilisateur(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def oublier_user(sender, instance, **kwargs):
+    invalider_utilisateur(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Utilisateur)
+def invalider_profil(sender, instance, **kwargs):
+    invalider_utilisateur(instance.user_id)
@@ -1,3 +1,63 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from .authentication import utilisateur_en_cache
+
+
+# ========== CACHE DES UTILISATEURS JWT ==========
+
+class CacheUtilisateurTests(TestCase):
+    URL_ADMIN = '/api/utilisateur/users/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', email='admin@taxibe.mg', password='x', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.admin).access_token}')
+
+    def assertEnCache(self):
+        with self.assertNumQueries(0):
+            return utilisateur_en_cache(self.admin.pk)
+
+    def assertRelu(self):
+        with self.assertNumQueries(1):
+            return utilisateur_en_cache(self.admin.pk)
+
+    def test_retrogradation_immediate(self):
+        self.assertEqual(self.api.get(self.URL_ADMIN).status_code, 200)
+        self.admin.is_staff = False
+        self.admin.save()
+        self.assertEqual(self.api.get(self.URL_ADMIN).status_code, 403)
+
+    def test_modifications_du_user(self):
+        for champ, valeur in (('username', 'chef'), ('email', 'chef@taxibe.mg'), ('is_staff', False)):
+            utilisateur_en_cache(self.admin.pk)
+            setattr(self.admin, champ, valeur)
+            self.admin.save(update_fields=[champ])
+            self.assertEqual(getattr(self.assertRelu(), champ), valeur)
+
+    def test_derniere_connexion_seule_ignoree(self):
+        utilisateur_en_cache(self.admin.pk)
+        self.admin.last_login = timezone.now()
+        self.admin.save(update_fields=['last_login'])
+        self.assertEnCache()
+
+    def test_profil_modifie(self):
+        utilisateur_en_cache(self.admin.pk)
+        profil = self.admin.profile
+        profil.role = 'admin'
+        profil.save()
+        self.assertEqual(self.assertRelu().profile.role, 'admin')
+
+    def test_suppression(self):
+        self.assertEqual(self.api.get(self.URL_ADMIN).status_code, 200)
+        User.objects.filter(pk=self.admin.pk).delete()
+        self.assertIsNone(utilisateur_en_cache(self.admin.pk))
+        self.assertEqual(self.api.get(self.URL_ADMIN).status_code, 401)
@@ -4,3 +4,5 @@ class InteractionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'interaction'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,80 @@
+# backend/interaction/commentaires.py
+"""
+Fil des commentaires d'un bus, paginé par clé (date_creation, id).
+
+Chaque page se lit sur l'index (busRef, -date_creation, -id) sans OFFSET,
+quel que soit le nombre de commentaires du bus. La première page, la plus
+demandée (page détail d'un bus), est gardée dans l'espace de cache
+'commentaires' et invalidée à chaque écriture (voir interaction/signals.py).
+"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from taxibe_backend import caches
+from .models import Commentaire
+from .serializers import CommentaireSerializer
+
+
+def _param(name, default):
+    return getattr(settings, name, default)
+
+
+def invalider(bus_id):
+    if bus_id:
+        caches.supprimer('commentaires', ('bus', bus_id))
+
+
+def encoder_curseur(commentaire):
+    brut = f"{commentaire['date_creation']}|{commentaire['id']}"
+    return base64.urlsafe_b64encode(brut.encode()).decode()
+
+
+def decoder_curseur(curseur):
+    """(date_creation, id) du dernier commentaire vu ; ValueError si le curseur est invalide."""
+    try:
+        date, _, pk = base64.urlsafe_b64decode(curseur.encode()).decode().partition('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('curseur invalide')
+    if date is None:
+        raise ValueError('curseur invalide')
+    return date, pk
+
+
+def _page(bus_id, apres, limit):
+    qs = (
+        Commentaire.objects.filter(busRef_id=bus_id)
+        .select_related('utilisateurRef__profile', 'busRef')
+        .order_by('-date_creation', '-id')
+    )
+    if apres:
+        date, pk = apres
+        qs = qs.filter(Q(date_creation__lt=date) | Q(date_creation=date, id__lt=pk))
+    lignes = list(qs[:limit + 1])
+    commentaires = CommentaireSerializer(lignes[:limit], many=True).data
+    return {
+        'cursor': encoder_curseur(commentaires[-1]) if len(lignes) > limit else None,
+        'has_more': len(lignes) > limit,
+        'commentaires': commentaires,
+    }
+
+
+def fil_du_bus(bus_id, curseur=None, limit=None):
+    """Page du fil : {'cursor', 'has_more', 'commentaires'}. Lève ValueError sur un curseur invalide."""
+    taille = _param('COMMENT_FEED_PAGE_SIZE', 20)
+    limit = min(limit or taille, 100)
+    if curseur:
+        return _page(bus_id, decoder_curseur(curseur), limit)
+    if limit != taille:
+        return _page(bus_id, None, limit)
+
+    return caches.obtenir(
+        'commentaires', ('bus', bus_id),
+        lambda: _page(bus_id, None, limit),
+        _param('COMMENT_FEED_TTL', 300),
+    )
@@ -0,0 +1,117 @@
+# backend/interaction/exports.py
+"""
+Export en flux de l'historique des recherches.
+
+Les lignes sont lues par lots (pagination par clé sur date_recherche/id,
+sans OFFSET) et écrites au fil de l'eau : la mémoire reste constante quelle
+que soit la taille de l'export.
+"""
+import csv
+import json
+import zlib
+
+from django.db.models import Q
+from rest_framework.negotiation import BaseContentNegotiation
+
+EXPORT_BATCH_SIZE = 2000
+
+COLONNES = ['ID', 'Utilisateur', 'Départ', 'Arrivée', 'Date']
+
+
+def iter_historique(qs, batch_size=EXPORT_BATCH_SIZE):
+    """Parcourt `qs` du plus récent au plus ancien, lot par lot."""
+    qs = qs.order_by('-date_recherche', '-id').values(
+        'id', 'date_recherche', 'depart_id', 'arrivee_id',
+        'userRef__username', 'depart__nomArret', 'arrivee__nomArret',
+    )
+    dernier = None
+    while True:
+        lot = qs
+        if dernier:
+            lot = qs.filter(
+                Q(date_recherche__lt=dernier['date_recherche']) |
+                Q(date_recherche=dernier['date_recherche'], id__lt=dernier['id'])
+            )
+        n = 0
+        for ligne in lot[:batch_size].iterator(chunk_size=batch_size):
+            n += 1
+            dernier = ligne
+            yield ligne
+        if n < batch_size:
+            return
+
+
+class ExportNegotiation(BaseContentNegotiation):
+    """
+    `?format=` désigne ici le format du fichier exporté, pas un renderer DRF :
+    on court-circuite la négociation (sinon ?format=csv renvoie 404).
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+def _enregistrement(h):
+    return {
+        'id': h['id'],
+        'utilisateur': h['userRef__username'] or 'Anonyme',
+        'depart': h['depart__nomArret'] or str(h['depart_id']),
+        'arrivee': h['arrivee__nomArret'] or str(h['arrivee_id']),
+        'date': h['date_recherche'],
+    }
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer renvoie directement la ligne écrite."""
+
+    def write(self, value):
+        return value
+
+
+def lignes_csv(lignes):
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '\ufeff'  # BOM pour Excel
+    yield writer.writerow(COLONNES)
+    for h in lignes:
+        e = _enregistrement(h)
+        yield writer.writerow([
+            e['id'], e['utilisateur'], e['depart'], e['arrivee'],
+            e['date'].strftime('%d/%m/%Y %H:%M'),
+        ])
+
+
+def lignes_ndjson(lignes):
+    for h in lignes:
+        e = _enregistrement(h)
+        e['date'] = e['date'].isoformat()
+        yield json.dumps(e, ensure_ascii=False) + '\n'
+
+
+def lignes_json(lignes):
+    """Tableau JSON compact, écrit élément par élément."""
+    yield '['
+    separateur = ''
+    for ligne in lignes_ndjson(lignes):
+        yield separateur + ligne.rstrip('\n')
+        separateur = ',\n'
+    yield ']\n'
+
+
+def gzip_flux(morceaux, seuil=64 * 1024):
+    """Compresse un flux de chaînes au format gzip, par blocs d'environ `seuil` octets."""
+    compresseur = zlib.compressobj(6, zlib.DEFLATED, 31)
+    tampon = []
+    taille = 0
+    for morceau in morceaux:
+        data = morceau.encode('utf-8')
+        tampon.append(data)
+        taille += len(data)
+        if taille >= seuil:
+            sortie = compresseur.compress(b''.join(tampon))
+            tampon, taille = [], 0
+            if sortie:
+                yield sortie
+    yield compresseur.compress(b''.join(tampon)) + compresseur.flush()
@@ -0,0 +1,214 @@
+# backend/interaction/historique.py
+"""
+Enregistrement des recherches d'itinéraires dans l'historique.
+
+Point d'entrée unique pour la déduplication et la mise à jour des agrégats
+journaliers. Une même recherche (utilisateur, départ, arrivée) répétée dans
+la même tranche de 30 min ne fait que rafraîchir la date : la clé unique
+(userRef, depart, arrivee, creneau) rend l'opération sûre sous concurrence,
+et sur PostgreSQL elle tient en une seule requête (INSERT ... ON CONFLICT).
+
+Les recherches d'itinéraires passent par un tampon en mémoire (écriture
+différée) : elles sont écrites par lots, hors du temps de réponse.
+"""
+import atexit
+import logging
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import HistoriqueRecherche, creneau_de
+from . import rollups
+from .tendances import tendances
+
+logger = logging.getLogger(__name__)
+
+Recherche = namedtuple('Recherche', 'user_id depart_id arrivee_id creneau date')
+
+
+def _upsert_postgresql(recherches):
+    """
+    INSERT ... ON CONFLICT DO UPDATE de plusieurs lignes en une requête
+    (clés toutes distinctes). Retourne [(id, created)] dans l'ordre ; xmax = 0
+    signale une ligne insérée.
+    """
+    meta = HistoriqueRecherche._meta
+    q = connection.ops.quote_name
+    col = lambda name: q(meta.get_field(name).column)
+    table = q(meta.db_table)
+    cle = ', '.join(col(f) for f in ('userRef', 'depart', 'arrivee', 'creneau'))
+    valeurs = ', '.join(['(%s, %s, %s, %s, %s)'] * len(recherches))
+    sql = (
+        f"INSERT INTO {table} ({cle}, {col('date_recherche')}) VALUES {valeurs} "
+        f"ON CONFLICT ({cle}) DO UPDATE SET {col('date_recherche')} = "
+        f"GREATEST({table}.{col('date_recherche')}, EXCLUDED.{col('date_recherche')}) "
+        f"RETURNING {col('id')}, {cle}, (xmax = 0)"
+    )
+    params = [v for r in recherches for v in r]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        lignes = {tuple(row[1:5]): (row[0], row[5]) for row in cursor.fetchall()}
+    return [lignes[r[:4]] for r in recherches]
+
+
+def _upsert(recherches):
+    """Repli générique : INSERT dans un savepoint, UPDATE si la clé existe déjà."""
+    resultats = []
+    for r in recherches:
+        cle = dict(userRef_id=r.user_id, depart_id=r.depart_id, arrivee_id=r.arrivee_id, creneau=r.creneau)
+        try:
+            with transaction.atomic():
+                h = HistoriqueRecherche.objects.create(**cle, date_recherche=r.date)
+            resultats.append((h.pk, True))
+        except IntegrityError:
+            HistoriqueRecherche.objects.filter(**cle, date_recherche__lt=r.date).update(date_recherche=r.date)
+            pk = HistoriqueRecherche.objects.filter(**cle).values_list('pk', flat=True).first()
+            resultats.append((pk, False))
+    return resultats
+
+
+@transaction.atomic
+def _ecrire(recherches):
+    """Upsert d'un lot de recherches (clés distinctes) et mise à jour des agrégats."""
+    upsert = _upsert_postgresql if connection.vendor == 'postgresql' else _upsert
+    resultats = upsert(recherches)
+    nouvelles = [
+        (r.date, r.depart_id, r.arrivee_id)
+        for r, (_, created) in zip(recherches, resultats) if created
+    ]
+    if nouvelles:
+        # Le créneau ne chevauche jamais deux jours : seules les insertions comptent
+        rollups.ajuster_lot(nouvelles)
+        transaction.on_commit(lambda: [tendances.enregistrer(*n) for n in nouvelles])
+    return resultats
+
+
+def enregistrer_recherche(user, depart_id, arrivee_id):
+    """Écriture immédiate d'une recherche. Retourne (historique, created)."""
+    now = timezone.now()
+    recherche = Recherche(user.pk, int(depart_id), int(arrivee_id), creneau_de(now), now)
+    [(pk, created)] = _ecrire([recherche])
+    historique = HistoriqueRecherche(
+        pk=pk, userRef=user, depart_id=recherche.depart_id, arrivee_id=recherche.arrivee_id,
+        date_recherche=now, creneau=recherche.creneau,
+    )
+    return historique, created
+
+
+class TamponRecherches:
+    """
+    Tampon d'écriture différée des recherches (mémoire du processus).
+
+    Les recherches sont regroupées par clé (utilisateur, départ, arrivée,
+    créneau) : les répétitions d'un lot ne font qu'avancer la date. Le lot
+    est écrit toutes les HISTORY_FLUSH_SECONDS par un thread dédié, plus tôt
+    s'il atteint HISTORY_BUFFER_SIZE, et à l'arrêt du processus. Si la base
+    est indisponible, le lot est remis en attente, sans dépasser
+    HISTORY_BUFFER_MAX recherches.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._recherches = {}
+        self._reveil = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._recherches)
+
+    def ajouter(self, user_id, depart_id, arrivee_id):
+        now = timezone.now()
+        recherche = Recherche(user_id, int(depart_id), int(arrivee_id), creneau_de(now), now)
+        with self._lock:
+            cle = recherche[:4]
+            maximum = getattr(settings, 'HISTORY_BUFFER_MAX', 10000)
+            if cle not in self._recherches and len(self._recherches) >= maximum:
+                return  # base indisponible depuis longtemps : la mémoire du processus reste bornée
+            self._recherches[cle] = recherche
+            plein = len(self._recherches) >= getattr(settings, 'HISTORY_BUFFER_SIZE', 200)
+            if self._thread is None:
+                self._demarrer()
+        if plein:
+            self._reveil.set()
+
+    def _demarrer(self):
+        self._thread = threading.Thread(target=self._boucle, name='historique-flush', daemon=True)
+        self._thread.start()
+
+    def _boucle(self):
+        while True:
+            self._reveil.wait(getattr(settings, 'HISTORY_FLUSH_SECONDS', 2))
+            self._reveil.clear()
+            try:
+                self.flush()
+            finally:
+                # Connexion propre à ce thread : ne pas la garder ouverte entre deux lots
+                connection.close()
+
+    def flush(self):
+        """Écrit le lot en attente. Retourne le nombre de recherches écrites."""
+        with self._flush_lock:
+            with self._lock:
+                recherches, self._recherches = self._recherches, {}
+            if not recherches:
+                return 0
+            lot = list(recherches.values())
+            taille = getattr(settings, 'HISTORY_BUFFER_SIZE', 200)
+            ecrites = 0
+            for i in range(0, len(lot), taille):
+                try:
+                    ecrites += self._ecrire_lot(lot[i:i + taille])
+                except Exception:
+                    logger.exception("Erreur écriture historique (%d recherches remises en attente)", len(lot) - i)
+                    self._remettre(lot[i:])
+                    break
+            return ecrites
+
+    def _ecrire_lot(self, lot):
+        """
+        Écrit un lot ; si une contrainte est violée (arrêt ou utilisateur
+        supprimé depuis la recherche), reprend ligne par ligne et abandonne
+        les seules lignes en cause, sans bloquer les suivantes.
+        """
+        try:
+            _ecrire(lot)
+            return len(lot)
+        except IntegrityError:
+            pass
+        ecrites = 0
+        for recherche in lot:
+            try:
+                _ecrire([recherche])
+                ecrites += 1
+            except IntegrityError:
+                logger.warning("Recherche abandonnée (contrainte violée) : %s", recherche)
+        return ecrites
+
+    def _remettre(self, recherches):
+        """Remet des recherches en attente (base indisponible), dans la limite de HISTORY_BUFFER_MAX."""
+        maximum = getattr(settings, 'HISTORY_BUFFER_MAX', 10000)
+        perdues = 0
+        with self._lock:
+            for recherche in recherches:
+                cle = recherche[:4]
+                if cle in self._recherches:
+                    continue  # une recherche plus récente a la même clé
+                if len(self._recherches) >= maximum:
+                    perdues += 1
+                    continue
+                self._recherches[cle] = recherche
+        if perdues:
+            logger.error("Tampon de l'historique plein : %d recherches abandonnées", perdues)
+
+
+tampon = TamponRecherches()
+atexit.register(tampon.flush)
+
+
+def differer_recherche(user, depart_id, arrivee_id):
+    """Enregistre une recherche via le tampon (aucune écriture pendant la requête)."""
+    tampon.ajouter(user.pk, depart_id, arrivee_id)
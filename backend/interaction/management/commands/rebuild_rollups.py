@@ -0,0 +1,37 @@
+# interaction/management/commands/rebuild_rollups.py
+"""
+Reconstruit les agrégats journaliers des recherches depuis HistoriqueRecherche.
+
+Exemples :
+    python manage.py rebuild_rollups                    # tout l'historique
+    python manage.py rebuild_rollups --depuis 2025-01-01
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from interaction import rollups
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit (ou initialise) les agrégats journaliers des recherches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--depuis',
+            help='Ne reconstruit qu\'à partir de cette date (AAAA-MM-JJ)',
+        )
+
+    def handle(self, *args, **options):
+        depuis = None
+        if options['depuis']:
+            depuis = parse_date(options['depuis'])
+            if not depuis:
+                raise CommandError('--depuis doit être une date AAAA-MM-JJ')
+
+        self.stdout.write('📊 Reconstruction des agrégats de recherches...')
+        counts = rollups.reconstruire(depuis)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {counts['jours']} jours, {counts['trajets']} lignes trajet/jour, "
+            f"{counts['arrets']} lignes arrêt/jour"
+        ))
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interaction', '0001_initial'),
+        ('localisation', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RechercheArretJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Recherches par arrêt et par jour',
+                'verbose_name_plural': 'Recherches par arrêt et par jour',
+                'ordering': ['-jour'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RechercheJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(unique=True)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Recherches par jour',
+                'verbose_name_plural': 'Recherches par jour',
+                'ordering': ['-jour'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RechercheTrajetJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Recherches par trajet et par jour',
+                'verbose_name_plural': 'Recherches par trajet et par jour',
+                'ordering': ['-jour'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='historiquerecherche',
+            index=models.Index(fields=['userRef', '-date_recherche'], name='interaction_userRef_7f072e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiquerecherche',
+            index=models.Index(fields=['date_recherche'], name='interaction_date_re_f54ca6_idx'),
+        ),
+        migrations.AddField(
+            model_name='recherchearretjour',
+            name='arret',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='localisation.arret'),
+        ),
+        migrations.AddField(
+            model_name='recherchetrajetjour',
+            name='arrivee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='localisation.arret'),
+        ),
+        migrations.AddField(
+            model_name='recherchetrajetjour',
+            name='depart',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='localisation.arret'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='recherchearretjour',
+            unique_together={('jour', 'arret')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='recherchetrajetjour',
+            unique_together={('jour', 'depart', 'arrivee')},
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:10
+
+from datetime import timedelta, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, Max, OuterRef, Value
+from django.db.models.functions import ExtractMinute, TruncHour
+
+LOT = 5000
+
+
+def remplir_creneaux(apps, schema_editor):
+    """
+    Calcule le créneau des recherches existantes puis supprime les doublons
+    d'un même créneau en ne gardant que la ligne la plus récente (id max) de
+    chaque clé. Tout se fait en SQL, par plages d'id : la mémoire utilisée
+    ne dépend pas de la taille de la table.
+    """
+    HistoriqueRecherche = apps.get_model('interaction', 'HistoriqueRecherche')
+    max_id = HistoriqueRecherche.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+
+    # Même découpage que creneau_de() : tranches de 30 min en UTC
+    heure = TruncHour('date_recherche', tzinfo=timezone.utc)
+    minute = ExtractMinute('date_recherche', tzinfo=timezone.utc)
+    for debut in range(0, max_id, LOT):
+        ids = HistoriqueRecherche.objects.filter(id__gt=debut, id__lte=debut + LOT)
+        ids.annotate(minute=minute).filter(minute__lt=30).update(creneau=heure)
+        ids.annotate(minute=minute).filter(minute__gte=30).update(creneau=heure + Value(timedelta(minutes=30)))
+
+    # Doublon : une ligne de même clé a un id plus grand (seul l'id max de chaque clé reste)
+    plus_recente = HistoriqueRecherche.objects.filter(
+        userRef=OuterRef('userRef'), depart=OuterRef('depart'), arrivee=OuterRef('arrivee'),
+        creneau=OuterRef('creneau'), id__gt=OuterRef('id'),
+    )
+    for debut in range(0, max_id, LOT):
+        HistoriqueRecherche.objects.filter(id__gt=debut, id__lte=debut + LOT).filter(Exists(plus_recente)).delete()
+
+
+def conserver_dedoublonnage(apps, schema_editor):
+    """
+    Retour arrière sans effet : la colonne creneau disparaît avec l'annulation
+    de l'AddField, mais les doublons supprimés ne sont pas recréés.
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interaction', '0002_recherchearretjour_recherchejour_recherchetrajetjour_and_more'),
+        ('localisation', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historiquerecherche',
+            name='creneau',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(remplir_creneaux, conserver_dedoublonnage),
+        migrations.AlterField(
+            model_name='historiquerecherche',
+            name='creneau',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterUniqueTogether(
+            name='historiquerecherche',
+            unique_together={('userRef', 'depart', 'arrivee', 'creneau')},
+        ),
+    ]
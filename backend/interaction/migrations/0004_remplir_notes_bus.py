@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:20
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+
+def remplir_notes_bus(apps, schema_editor):
+    """Calcule les agrégats de commentaires des bus existants."""
+    Bus = apps.get_model('transport', 'Bus')
+    Commentaire = apps.get_model('interaction', 'Commentaire')
+    SignalementCommentaire = apps.get_model('interaction', 'SignalementCommentaire')
+
+    notes = {
+        c['busRef']: c
+        for c in Commentaire.objects.filter(busRef__isnull=False)
+        .values('busRef').annotate(total=Sum('note'), nb=Count('id')).order_by()
+    }
+    ouverts = dict(
+        SignalementCommentaire.objects.filter(status='open', commentaireRef__busRef__isnull=False)
+        .values_list('commentaireRef__busRef').annotate(nb=Count('id')).order_by()
+    )
+    bus = list(Bus.objects.filter(Q(pk__in=notes) | Q(pk__in=ouverts)))
+    for b in bus:
+        b.note_total = notes.get(b.pk, {}).get('total') or 0
+        b.nb_commentaires = notes.get(b.pk, {}).get('nb') or 0
+        b.nb_signalements_ouverts = ouverts.get(b.pk, 0)
+    Bus.objects.bulk_update(bus, ['note_total', 'nb_commentaires', 'nb_signalements_ouverts'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interaction', '0003_historiquerecherche_creneau'),
+        ('transport', '0005_bus_notes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remplir_notes_bus, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interaction', '0004_remplir_notes_bus'),
+        ('transport', '0005_bus_notes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commentaire',
+            index=models.Index(fields=['busRef', '-date_creation', '-id'], name='interaction_busRef__8cc0aa_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:05
+
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def remplir_rollups(apps, schema_editor):
+    """
+    Calcule les agrégats journaliers de l'historique existant (comme
+    rollups.reconstruire), sauf s'ils ont déjà été remplis.
+    """
+    HistoriqueRecherche = apps.get_model('interaction', 'HistoriqueRecherche')
+    RechercheJour = apps.get_model('interaction', 'RechercheJour')
+    RechercheTrajetJour = apps.get_model('interaction', 'RechercheTrajetJour')
+    RechercheArretJour = apps.get_model('interaction', 'RechercheArretJour')
+    if RechercheJour.objects.exists():
+        return
+
+    qs = HistoriqueRecherche.objects.annotate(
+        jour=TruncDate('date_recherche', tzinfo=timezone.get_current_timezone())
+    )
+    RechercheJour.objects.bulk_create(
+        [
+            RechercheJour(jour=r['jour'], total=r['total'])
+            for r in qs.values('jour').annotate(total=Count('id')).order_by()
+        ],
+        batch_size=1000,
+    )
+
+    trajets = []
+    arrets = Counter()
+    for r in qs.values('jour', 'depart_id', 'arrivee_id').annotate(total=Count('id')).order_by().iterator():
+        trajets.append(RechercheTrajetJour(
+            jour=r['jour'], depart_id=r['depart_id'], arrivee_id=r['arrivee_id'], total=r['total'],
+        ))
+        arrets[(r['jour'], r['depart_id'])] += r['total']
+        arrets[(r['jour'], r['arrivee_id'])] += r['total']
+    RechercheTrajetJour.objects.bulk_create(trajets, batch_size=1000)
+    RechercheArretJour.objects.bulk_create(
+        [RechercheArretJour(jour=jour, arret_id=arret_id, total=total) for (jour, arret_id), total in arrets.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interaction', '0005_commentaire_index_fil'),
+    ]
+
+    operations = [
+        migrations.RunPython(remplir_rollups, migrations.RunPython.noop),
+    ]
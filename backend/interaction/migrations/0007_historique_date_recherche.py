@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interaction', '0006_remplir_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historiquerecherche',
+            name='date_recherche',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from transport.models import Bus
 from localisation.models import Arret
@@ -16,6 +17,10 @@ class Commentaire(models.Model):
         ordering = ['-date_creation']
         verbose_name = 'Commentaire'
         verbose_name_plural = 'Commentaires'
+        indexes = [
+            # Fil d'un bus paginé par clé (interaction/commentaires.py)
+            models.Index(fields=['busRef', '-date_creation', '-id']),
+        ]
     
     def __str__(self):
         bus_info = f"Bus {self.busRef.numeroBus}" if self.busRef else "Sans bus"
@@ -93,12 +98,81 @@ class HistoriqueRecherche(models.Model):
     userRef = models.ForeignKey(User, on_delete=models.CASCADE, related_name='historique_recherches')
     depart = models.ForeignKey(Arret, on_delete=models.CASCADE, related_name='depart_hist')
     arrivee = models.ForeignKey(Arret, on_delete=models.CASCADE, related_name='arrivee_hist')
-    date_recherche = models.DateTimeField(auto_now_add=True)
+    # Date de la recherche, pas de son écriture (le tampon écrit en différé)
+    date_recherche = models.DateTimeField(default=timezone.now, editable=False)
+    # Tranche de 30 min de la recherche : une même recherche répétée dans la tranche
+    # ne fait que rafraîchir date_recherche (clé unique, voir interaction/historique.py)
+    creneau = models.DateTimeField(editable=False)
     
     class Meta:
         ordering = ['-date_recherche']
         verbose_name = 'Historique de recherche'
         verbose_name_plural = 'Historiques de recherches'
+        unique_together = ['userRef', 'depart', 'arrivee', 'creneau']
+        indexes = [
+            models.Index(fields=['userRef', '-date_recherche']),
+            models.Index(fields=['date_recherche']),
+        ]
     
     def __str__(self):
-        return f"Recherche de {self.userRef.username}: {self.depart} → {self.arrivee}"
\ No newline at end of file
+        return f"Recherche de {self.userRef.username}: {self.depart} → {self.arrivee}"
+
+    def save(self, *args, **kwargs):
+        if self.creneau is None:
+            self.creneau = creneau_de(self.date_recherche or timezone.now())
+        super().save(*args, **kwargs)
+
+
+CRENEAU_MINUTES = 30
+
+def creneau_de(date):
+    """Début de la tranche de 30 min contenant `date`."""
+    return date.replace(minute=date.minute - date.minute % CRENEAU_MINUTES, second=0, microsecond=0)
+
+# ========================== AGRÉGATS JOURNALIERS ==========================
+# Compteurs de recherches maintenus à chaque enregistrement d'historique
+# (voir interaction/rollups.py) ; reconstruits par `manage.py rebuild_rollups`.
+
+class RechercheJour(models.Model):
+    """Nombre de recherches par jour"""
+    jour = models.DateField(unique=True)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-jour']
+        verbose_name = 'Recherches par jour'
+        verbose_name_plural = 'Recherches par jour'
+
+    def __str__(self):
+        return f"{self.jour}: {self.total}"
+
+class RechercheTrajetJour(models.Model):
+    """Nombre de recherches par jour et par couple (départ, arrivée)"""
+    jour = models.DateField()
+    depart = models.ForeignKey(Arret, on_delete=models.CASCADE, related_name='+')
+    arrivee = models.ForeignKey(Arret, on_delete=models.CASCADE, related_name='+')
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['jour', 'depart', 'arrivee']
+        ordering = ['-jour']
+        verbose_name = 'Recherches par trajet et par jour'
+        verbose_name_plural = 'Recherches par trajet et par jour'
+
+    def __str__(self):
+        return f"{self.jour}: {self.depart_id} → {self.arrivee_id} ({self.total})"
+
+class RechercheArretJour(models.Model):
+    """Nombre de recherches par jour et par arrêt (en départ ou en arrivée)"""
+    jour = models.DateField()
+    arret = models.ForeignKey(Arret, on_delete=models.CASCADE, related_name='+')
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['jour', 'arret']
+        ordering = ['-jour']
+        verbose_name = 'Recherches par arrêt et par jour'
+        verbose_name_plural = 'Recherches par arrêt et par jour'
+
+    def __str__(self):
+        return f"{self.jour}: arrêt {self.arret_id} ({self.total})"
\ No newline at end of file
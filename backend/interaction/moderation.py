@@ -0,0 +1,151 @@
+# backend/interaction/moderation.py
+"""
+Actions de modération en lot (contributions et signalements).
+
+Chaque action s'applique à une liste d'ids dans une seule transaction, par
+UPDATE / DELETE ensemblistes ; les compteurs (réputation des utilisateurs,
+agrégats des bus) sont ajustés par une requête agrégée par table.
+
+Les points de réputation sont réglés dans settings (REPUTATION_*) et valent
+0 par défaut : sans règle fixée, la modération ne touche pas la réputation.
+"""
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from authentification.authentication import invalider_utilisateur
+from transport.models import Bus
+from utilisateur import stats
+from utilisateur.models import Utilisateur
+from .models import Commentaire, Contribution, SignalementCommentaire
+from .signals import en_lot
+from . import commentaires, notifications
+
+MAX_IDS = 1000
+
+
+def _ajuster(model, cle, deltas_par_ligne):
+    """
+    UPDATE unique : champ = champ + CASE cle WHEN ... END pour chaque champ.
+    `deltas_par_ligne` : {valeur de clé: {champ: delta}}.
+    """
+    champs = {champ for deltas in deltas_par_ligne.values() for champ in deltas}
+    if not champs:
+        return 0
+    maj = {}
+    for champ in champs:
+        cas = [
+            When(**{cle: valeur}, then=Value(deltas[champ]))
+            for valeur, deltas in deltas_par_ligne.items() if deltas.get(champ)
+        ]
+        delta = Case(*cas, default=Value(0), output_field=IntegerField())
+        maj[champ] = Greatest(F(champ) + delta, 0) if model is Bus else F(champ) + delta
+    return model.objects.filter(**{f'{cle}__in': list(deltas_par_ligne)}).update(**maj)
+
+
+def ajuster_reputation(deltas):
+    """{user_id: delta} → une seule requête sur les profils."""
+    deltas = {user_id: {'reputation': d} for user_id, d in deltas.items() if d}
+    if not deltas:
+        return 0
+    user_ids = list(deltas)
+    transaction.on_commit(lambda: (stats.invalider(*user_ids), invalider_utilisateur(*user_ids)))
+    return _ajuster(Utilisateur, 'user_id', deltas)
+
+
+# ========== CONTRIBUTIONS ==========
+
+@transaction.atomic
+def changer_statut_contributions(ids, statut):
+    """Passe les contributions au statut donné ; retourne le nombre modifié."""
+    lignes = list(
+        Contribution.objects.select_for_update()
+        .filter(id__in=ids).exclude(status=statut)
+        .values_list('id', 'utilisateurRef_id', 'status')
+    )
+    if not lignes:
+        return 0
+
+    # Réputation : gagnée en entrant dans 'approved', reprise en en sortant
+    points = getattr(settings, 'REPUTATION_CONTRIBUTION_APPROUVEE', 0)
+    reputation = Counter()
+    for _, user_id, ancien in lignes:
+        if statut == 'approved':
+            reputation[user_id] += points
+        elif ancien == 'approved':
+            reputation[user_id] -= points
+
+    n = Contribution.objects.filter(id__in=[pk for pk, _, _ in lignes]).update(
+        status=statut, date_modification=timezone.now()
+    )
+    ajuster_reputation(reputation)
+    transaction.on_commit(lambda: notifications.invalider(notifications.CLE_CONTRIBUTIONS))
+    return n
+
+
+# ========== SIGNALEMENTS ==========
+
+@transaction.atomic
+def classer_signalements(ids):
+    """Classe les signalements sans suite ('dismissed') ; retourne le nombre modifié."""
+    # Lignes verrouillées : deux classements concurrents ne décomptent pas deux fois
+    lignes = list(
+        SignalementCommentaire.objects.select_for_update(of=('self',))
+        .filter(id__in=ids).exclude(status='dismissed')
+        .values_list('id', 'status', 'commentaireRef__busRef')
+    )
+    if not lignes:
+        return 0
+
+    ouverts = Counter(bus_id for _, statut, bus_id in lignes if statut == 'open' and bus_id)
+    n = SignalementCommentaire.objects.filter(id__in=[pk for pk, _, _ in lignes]).update(status='dismissed')
+    _ajuster(Bus, 'pk', {bus_id: {'nb_signalements_ouverts': -k} for bus_id, k in ouverts.items()})
+    transaction.on_commit(lambda: notifications.invalider(notifications.CLE_SIGNALEMENTS))
+    return n
+
+
+@transaction.atomic
+def supprimer_commentaires_signales(ids):
+    """
+    Supprime les commentaires visés par les signalements (et, en cascade,
+    tous leurs signalements). Retourne (commentaires supprimés, signalements supprimés).
+    """
+    commentaire_ids = set(
+        SignalementCommentaire.objects.filter(id__in=ids).values_list('commentaireRef_id', flat=True)
+    )
+    lignes = list(
+        Commentaire.objects.select_for_update()
+        .filter(id__in=commentaire_ids)
+        .values_list('id', 'busRef_id', 'note', 'utilisateurRef_id')
+    )
+    if not lignes:
+        return 0, 0
+
+    bus = defaultdict(Counter)
+    reputation = Counter()
+    points = getattr(settings, 'REPUTATION_COMMENTAIRE_SUPPRIME', 0)
+    for _, bus_id, note, user_id in lignes:
+        reputation[user_id] += points
+        if bus_id:
+            bus[bus_id]['nb_commentaires'] -= 1
+            bus[bus_id]['note_total'] -= note
+    ouverts = SignalementCommentaire.objects.filter(
+        commentaireRef_id__in=commentaire_ids, status='open', commentaireRef__busRef__isnull=False,
+    ).values_list('commentaireRef__busRef', flat=True)
+    for bus_id in ouverts:
+        bus[bus_id]['nb_signalements_ouverts'] -= 1
+
+    nb_signalements = SignalementCommentaire.objects.filter(commentaireRef_id__in=commentaire_ids).count()
+    with en_lot():
+        nb_commentaires = Commentaire.objects.filter(id__in=commentaire_ids).delete()[1].get(Commentaire._meta.label, 0)
+
+    _ajuster(Bus, 'pk', bus)
+    ajuster_reputation(reputation)
+    bus_ids = list(bus)
+    transaction.on_commit(lambda: [commentaires.invalider(bus_id) for bus_id in bus_ids])
+    transaction.on_commit(notifications.invalider)
+    return nb_commentaires, nb_signalements
@@ -0,0 +1,119 @@
+# backend/interaction/notifications.py
+"""
+Compteurs de la cloche de notifications admin.
+
+Contributions en attente et signalements ouverts sont gardés en cache et
+ajustés à chaque écriture (cache.incr, voir interaction/signals.py) ; les
+derniers commentaires sont invalidés à chaque création / suppression.
+Une clé absente (expirée, invalidée par une action en lot) est recalculée
+au prochain accès, si bien que la base n'est interrogée qu'après un
+changement ou une expiration, quel que soit le nombre d'onglets ouverts.
+Les clés vivent dans l'espace de cache 'notifications' (taxibe_backend/caches.py).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from taxibe_backend import caches
+from .models import Commentaire, Contribution, SignalementCommentaire
+
+CLE_CONTRIBUTIONS = 'contributions'
+CLE_SIGNALEMENTS = 'signalements'
+CLE_COMMENTAIRES = 'commentaires'
+
+NB_DERNIERS_COMMENTAIRES = 5
+MAX_NOUVEAUX = 100
+
+
+def _ttl():
+    return getattr(settings, 'NOTIF_COUNTERS_TTL', 300)
+
+
+def ajuster(cle, delta):
+    """Ajuste un compteur en cache ; s'il est absent, il sera recalculé à la lecture."""
+    k = caches.cle('notifications', cle)
+    try:
+        cache.incr(k, delta)
+    except ValueError:
+        # Absent : un recalcul en cours ne doit pas garder un compte d'avant cette écriture
+        cache.set(f'{k}:sale', 1, _ttl())
+
+
+def invalider(*cles):
+    if cles:
+        caches.supprimer('notifications', *[(cle,) for cle in cles])
+    else:
+        caches.invalider('notifications')
+
+
+def _compteur(cle, qs):
+    """
+    Compteur en cache, recalculé s'il est absent. Un seul recalcul à la
+    fois (verrou) ; si un ajustement arrive pendant le comptage (marque
+    ':sale'), le compte n'est pas gardé et sera refait au prochain accès.
+    """
+    k = caches.cle('notifications', cle)
+    valeur = cache.get(k)
+    if valeur is not None:
+        return max(valeur, 0)
+
+    verrou = f'{k}:verrou'
+    if not cache.add(verrou, 1, caches.VERROU_TTL):
+        return max(qs.count(), 0)  # recalcul en cours ailleurs : compte sans le garder
+    try:
+        cache.delete(f'{k}:sale')
+        valeur = qs.count()
+        if cache.add(k, valeur, _ttl()) and cache.get(f'{k}:sale'):
+            cache.delete(k)
+    finally:
+        cache.delete(verrou)
+    return max(valeur, 0)
+
+
+def _commentaires():
+    cle = caches.cle('notifications', CLE_COMMENTAIRES)
+    valeur = cache.get(cle)
+    if valeur is None:
+        derniers = list(
+            Commentaire.objects.order_by('-id')
+            .values('id', 'contenu', 'note', 'date_creation', 'busRef_id', 'utilisateurRef__username')
+            [:NB_DERNIERS_COMMENTAIRES]
+        )
+        valeur = {
+            'dernier': derniers[0]['id'] if derniers else 0,
+            'derniers': [
+                {
+                    'id': c['id'],
+                    'username': c['utilisateurRef__username'],
+                    'contenu': c['contenu'],
+                    'note': c['note'],
+                    'busRef': c['busRef_id'],
+                    'date_creation': c['date_creation'],
+                }
+                for c in derniers
+            ],
+        }
+        cache.set(cle, valeur, _ttl())
+    return valeur
+
+
+def etat(depuis=None):
+    """
+    Compteurs courants. `depuis` : id du dernier commentaire déjà vu par le
+    client ; `nouveaux_commentaires` compte ceux qui ont suivi (plafonné).
+    """
+    contributions = _compteur(CLE_CONTRIBUTIONS, Contribution.objects.filter(status='pending'))
+    signalements = _compteur(CLE_SIGNALEMENTS, SignalementCommentaire.objects.filter(status='open'))
+    commentaires = _commentaires()
+
+    nouveaux = 0
+    if depuis is not None and depuis < commentaires['dernier']:
+        nouveaux = Commentaire.objects.filter(id__gt=depuis).order_by()[:MAX_NOUVEAUX].count()
+
+    return {
+        'version': f"{contributions}.{signalements}.{commentaires['dernier']}",
+        'contributions_en_attente': contributions,
+        'signalements_ouverts': signalements,
+        'dernier_commentaire': commentaires['dernier'],
+        'nouveaux_commentaires': nouveaux,
+        'derniers_commentaires': commentaires['derniers'],
+    }
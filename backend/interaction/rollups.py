@@ -0,0 +1,91 @@
+# backend/interaction/rollups.py
+"""
+Agrégats journaliers des recherches d'itinéraires.
+
+Les tables RechercheJour / RechercheTrajetJour / RechercheArretJour sont
+tenues à jour à chaque enregistrement d'historique, ce qui permet aux
+statistiques sur l'année ou sur tout l'historique de lire quelques
+centaines de lignes pré-agrégées au lieu de regrouper la table brute.
+
+Ce sont des compteurs de recherches : l'effacement de son historique par
+un utilisateur ne les diminue pas (sauf reconstruction complète).
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import HistoriqueRecherche, RechercheJour, RechercheTrajetJour, RechercheArretJour
+
+
+def _incrementer(model, delta, **cle):
+    """UPDATE total = total + delta ; crée la ligne si elle n'existe pas encore."""
+    if model.objects.filter(**cle).update(total=F('total') + delta):
+        return
+    if delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(total=delta, **cle)
+    except IntegrityError:
+        # Créée entre-temps par une requête concurrente
+        model.objects.filter(**cle).update(total=F('total') + delta)
+
+
+def ajuster_lot(recherches):
+    """Compte un lot de recherches [(date, depart_id, arrivee_id)] : une mise à jour par ligne d'agrégat."""
+    jours, trajets, arrets = Counter(), Counter(), Counter()
+    for date, depart_id, arrivee_id in recherches:
+        jour = timezone.localdate(date)
+        jours[jour] += 1
+        trajets[(jour, depart_id, arrivee_id)] += 1
+        arrets[(jour, depart_id)] += 1
+        arrets[(jour, arrivee_id)] += 1
+    for jour, n in jours.items():
+        _incrementer(RechercheJour, n, jour=jour)
+    for (jour, depart_id, arrivee_id), n in trajets.items():
+        _incrementer(RechercheTrajetJour, n, jour=jour, depart_id=depart_id, arrivee_id=arrivee_id)
+    for (jour, arret_id), n in arrets.items():
+        _incrementer(RechercheArretJour, n, jour=jour, arret_id=arret_id)
+
+
+@transaction.atomic
+def reconstruire(depuis=None, batch_size=1000):
+    """
+    Recalcule les agrégats depuis la table brute (à partir du jour `depuis`,
+    ou entièrement). Retourne le nombre de lignes écrites par table.
+    """
+    tz = timezone.get_current_timezone()
+    qs = HistoriqueRecherche.objects.annotate(jour=TruncDate('date_recherche', tzinfo=tz))
+    rollups = (RechercheJour, RechercheTrajetJour, RechercheArretJour)
+    if depuis:
+        qs = qs.filter(jour__gte=depuis)
+        for model in rollups:
+            model.objects.filter(jour__gte=depuis).delete()
+    else:
+        for model in rollups:
+            model.objects.all().delete()
+
+    jours = [
+        RechercheJour(jour=r['jour'], total=r['total'])
+        for r in qs.values('jour').annotate(total=Count('id')).order_by()
+    ]
+
+    trajets = []
+    arrets = Counter()
+    for r in qs.values('jour', 'depart_id', 'arrivee_id').annotate(total=Count('id')).order_by().iterator():
+        trajets.append(RechercheTrajetJour(
+            jour=r['jour'], depart_id=r['depart_id'], arrivee_id=r['arrivee_id'], total=r['total'],
+        ))
+        arrets[(r['jour'], r['depart_id'])] += r['total']
+        arrets[(r['jour'], r['arrivee_id'])] += r['total']
+
+    RechercheJour.objects.bulk_create(jours, batch_size=batch_size)
+    RechercheTrajetJour.objects.bulk_create(trajets, batch_size=batch_size)
+    RechercheArretJour.objects.bulk_create(
+        [RechercheArretJour(jour=jour, arret_id=arret_id, total=total) for (jour, arret_id), total in arrets.items()],
+        batch_size=batch_size,
+    )
+    return {'jours': len(jours), 'trajets': len(trajets), 'arrets': len(arrets)}
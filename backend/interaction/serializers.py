@@ -1,6 +1,8 @@
 # backend/interaction/serializers.py
 from rest_framework import serializers
 from .models import Favori, Contribution, Commentaire, HistoriqueRecherche, SignalementCommentaire
+from utilisateur import avatars
+from utilisateur.models import profil_de
 
 # ========== FAVORI ==========
 class FavoriSerializer(serializers.ModelSerializer):
@@ -40,14 +42,21 @@ class ContributionSerializer(serializers.ModelSerializer):
 class CommentaireSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='utilisateurRef.username', read_only=True)
     bus_numero = serializers.CharField(source='busRef.numeroBus', read_only=True, allow_null=True)
+    avatar = serializers.SerializerMethodField()
 
     class Meta:
         model = Commentaire
         fields = [
-            'id', 'username', 'busRef', 'bus_numero', 'contenu', 'note',
+            'id', 'username', 'avatar', 'busRef', 'bus_numero', 'contenu', 'note',
             'date_creation', 'date_modification'
         ]
-        read_only_fields = ['id', 'date_creation', 'date_modification', 'username', 'bus_numero']
+        read_only_fields = ['id', 'date_creation', 'date_modification', 'username', 'avatar', 'bus_numero']
+
+    def get_avatar(self, obj):
+        """Petite miniature de l'auteur {webp, jpeg} (charger utilisateurRef__profile)"""
+        profile = profil_de(obj.utilisateurRef) if obj.utilisateurRef_id else None
+        variantes = avatars.variantes(profile) if profile else None
+        return variantes['sm'] if variantes else None
 
 # ========== HISTORIQUE RECHERCHE ==========
 class HistoriqueRechercheSerializer(serializers.ModelSerializer):
@@ -0,0 +1,177 @@
+# interaction/signals.py
+"""
+Agrégats des commentaires par bus (note moyenne, nombre de commentaires,
+signalements ouverts), mis à jour par expressions F à chaque écriture, et
+invalidation de la première page du fil de commentaires en cache, des
+compteurs de la cloche admin (interaction/notifications.py), des
+compteurs d'activité du profil (utilisateur/stats.py) et des statistiques
+de l'historique (espace de cache 'analytics').
+
+Les agrégats des bus sont écrits dans la transaction ; le cache n'est
+touché qu'après le commit (transaction.on_commit), sans quoi un lecteur
+concurrent pourrait remettre en cache l'état d'avant l'écriture.
+
+Les opérations en lot (interaction/moderation.py) coupent ces récepteurs
+avec `en_lot()` et appliquent elles-mêmes des mises à jour agrégées.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from taxibe_backend import caches
+from transport.models import Bus
+from utilisateur import stats
+from .models import Commentaire, Contribution, Favori, HistoriqueRecherche, SignalementCommentaire
+from . import commentaires, notifications
+
+
+_lot = threading.local()
+
+
+@contextmanager
+def en_lot():
+    """Désactive les mises à jour ligne à ligne (thread courant) le temps d'un traitement en lot."""
+    _lot.actif = True
+    try:
+        yield
+    finally:
+        _lot.actif = False
+
+
+def _lot_actif():
+    return getattr(_lot, 'actif', False)
+
+
+def _ajuster_bus(bus_filter, **deltas):
+    """UPDATE atomique des compteurs (aucune lecture préalable du bus)."""
+    deltas = {
+        champ: F(champ) + delta if delta > 0 else Greatest(F(champ) + delta, 0)
+        for champ, delta in deltas.items() if delta
+    }
+    if deltas:
+        Bus.objects.filter(**bus_filter).update(**deltas)
+
+
+# ========== COMMENTAIRES ==========
+
+@receiver(post_init, sender=Commentaire)
+def memoriser_commentaire(sender, instance, **kwargs):
+    # __dict__ : ne pas recharger un champ différé (.only()) à chaque instanciation
+    instance._bus_initial = instance.__dict__.get('busRef_id')
+    instance._note_initiale = instance.__dict__.get('note')
+
+
+@receiver(post_save, sender=Commentaire)
+def compter_commentaire(sender, instance, created, **kwargs):
+    if _lot_actif():
+        return
+    if created:
+        if instance.busRef_id:
+            _ajuster_bus({'pk': instance.busRef_id}, nb_commentaires=1, note_total=instance.note)
+    elif (instance.busRef_id, instance.note) != (instance._bus_initial, instance._note_initiale):
+        if instance._bus_initial:
+            _ajuster_bus({'pk': instance._bus_initial}, nb_commentaires=-1, note_total=-instance._note_initiale)
+        if instance.busRef_id:
+            _ajuster_bus({'pk': instance.busRef_id}, nb_commentaires=1, note_total=instance.note)
+    bus_ids = {instance.busRef_id, instance._bus_initial}
+    transaction.on_commit(lambda: [commentaires.invalider(bus_id) for bus_id in bus_ids])
+    if created:
+        user_id = instance.utilisateurRef_id
+        transaction.on_commit(lambda: (
+            notifications.invalider(notifications.CLE_COMMENTAIRES), stats.invalider(user_id),
+        ))
+    memoriser_commentaire(sender, instance)
+
+
+@receiver(post_delete, sender=Commentaire)
+def decompter_commentaire(sender, instance, **kwargs):
+    if _lot_actif():
+        return
+    if instance._bus_initial:
+        _ajuster_bus({'pk': instance._bus_initial}, nb_commentaires=-1, note_total=-instance._note_initiale)
+    bus_id, user_id = instance._bus_initial, instance.utilisateurRef_id
+    transaction.on_commit(lambda: (
+        commentaires.invalider(bus_id),
+        notifications.invalider(notifications.CLE_COMMENTAIRES),
+        stats.invalider(user_id),
+    ))
+
+
+# ========== SIGNALEMENTS ==========
+
+@receiver(post_init, sender=SignalementCommentaire)
+def memoriser_signalement(sender, instance, **kwargs):
+    instance._ouvert_initial = instance.__dict__.get('status') == 'open'
+
+
+@receiver(post_save, sender=SignalementCommentaire)
+def compter_signalement(sender, instance, created, **kwargs):
+    if _lot_actif():
+        return
+    ouvert = instance.status == 'open'
+    initial = False if created else instance._ouvert_initial
+    if ouvert != initial:
+        _ajuster_bus({'commentaires': instance.commentaireRef_id}, nb_signalements_ouverts=1 if ouvert else -1)
+        delta = 1 if ouvert else -1
+        transaction.on_commit(lambda: notifications.ajuster(notifications.CLE_SIGNALEMENTS, delta))
+    instance._ouvert_initial = ouvert
+
+
+@receiver(post_delete, sender=SignalementCommentaire)
+def decompter_signalement(sender, instance, **kwargs):
+    if _lot_actif():
+        return
+    if instance._ouvert_initial:
+        _ajuster_bus({'commentaires': instance.commentaireRef_id}, nb_signalements_ouverts=-1)
+        transaction.on_commit(lambda: notifications.ajuster(notifications.CLE_SIGNALEMENTS, -1))
+
+
+# ========== CONTRIBUTIONS ==========
+
+@receiver(post_init, sender=Contribution)
+def memoriser_contribution(sender, instance, **kwargs):
+    instance._en_attente_initial = instance.__dict__.get('status') == 'pending'
+
+
+@receiver(post_save, sender=Contribution)
+def compter_contribution(sender, instance, created, **kwargs):
+    en_attente = instance.status == 'pending'
+    initial = False if created else instance._en_attente_initial
+    if en_attente != initial:
+        delta = 1 if en_attente else -1
+        transaction.on_commit(lambda: notifications.ajuster(notifications.CLE_CONTRIBUTIONS, delta))
+    if created:
+        user_id = instance.utilisateurRef_id
+        transaction.on_commit(lambda: stats.invalider(user_id))
+    instance._en_attente_initial = en_attente
+
+
+@receiver(post_delete, sender=Contribution)
+def decompter_contribution(sender, instance, **kwargs):
+    if instance._en_attente_initial:
+        transaction.on_commit(lambda: notifications.ajuster(notifications.CLE_CONTRIBUTIONS, -1))
+    user_id = instance.utilisateurRef_id
+    transaction.on_commit(lambda: stats.invalider(user_id))
+
+
+# ========== FAVORIS ==========
+
+@receiver(post_save, sender=Favori)
+@receiver(post_delete, sender=Favori)
+def compter_favori(sender, instance, **kwargs):
+    user_id = instance.utilisateurRef_id
+    transaction.on_commit(lambda: stats.invalider(user_id))
+
+
+# ========== HISTORIQUE ==========
+
+@receiver(post_delete, sender=HistoriqueRecherche)
+def oublier_recherche(sender, **kwargs):
+    # Les nouvelles recherches (écritures par lots, sans signal) apparaissent
+    # à l'expiration des statistiques ; seules les suppressions les invalident.
+    transaction.on_commit(lambda: caches.invalider('analytics'))
@@ -0,0 +1,181 @@
+# backend/interaction/tendances.py
+"""
+Top des trajets et arrêts recherchés, tenu en mémoire.
+
+Un résumé Space-Saving par jour local (paires départ → arrivée, et arrêts)
+est alimenté à chaque recherche. Le top d'une fenêtre glissante de N jours
+s'obtient en fusionnant N petits résumés, sans requête SQL.
+
+Garantie Space-Saving : avec une capacité k, tout élément dont la fréquence
+dépasse total/k est présent, et chaque compteur surestime la vraie valeur
+d'au plus `erreur`.
+
+Les agrégats journaliers (interaction/rollups.py) servent de stockage
+durable : les résumés en sont rechargés périodiquement, ce qui rattrape
+aussi les recherches enregistrées par les autres processus.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def _param(name, default):
+    return getattr(settings, name, default)
+
+
+class SpaceSaving:
+    """Résumé Space-Saving (Metwally et al.) : k compteurs au plus."""
+
+    def __init__(self, capacite):
+        self.capacite = capacite
+        self.compteurs = {}  # clé -> [compte, erreur]
+        self.total = 0
+
+    def __len__(self):
+        return len(self.compteurs)
+
+    def ajouter(self, cle, n=1):
+        self.total += n
+        compteur = self.compteurs.get(cle)
+        if compteur is not None:
+            compteur[0] += n
+        elif len(self.compteurs) < self.capacite:
+            self.compteurs[cle] = [n, 0]
+        else:
+            # Remplace le plus petit compteur, dont la valeur devient l'erreur
+            victime = min(self.compteurs, key=lambda c: self.compteurs[c][0])
+            minimum = self.compteurs.pop(victime)[0]
+            self.compteurs[cle] = [minimum + n, minimum]
+
+    def minimum(self):
+        """Borne sur la fréquence d'un élément absent (0 si le résumé n'est pas plein)."""
+        if len(self.compteurs) < self.capacite:
+            return 0
+        return min(c[0] for c in self.compteurs.values())
+
+    def fusionner(self, autres):
+        """Nouveau résumé équivalent à l'union de `self` et `autres`."""
+        resumes = [self, *autres]
+        minimums = [r.minimum() for r in resumes]
+        cles = set().union(*(r.compteurs for r in resumes))
+        fusion = {}
+        for cle in cles:
+            compte = erreur = 0
+            for resume, minimum in zip(resumes, minimums):
+                compteur = resume.compteurs.get(cle)
+                if compteur is None:
+                    compte += minimum
+                    erreur += minimum
+                else:
+                    compte += compteur[0]
+                    erreur += compteur[1]
+            fusion[cle] = [compte, erreur]
+
+        resultat = SpaceSaving(self.capacite)
+        resultat.total = sum(r.total for r in resumes)
+        garder = sorted(fusion, key=lambda c: fusion[c][0], reverse=True)[:self.capacite]
+        resultat.compteurs = {cle: fusion[cle] for cle in garder}
+        return resultat
+
+    def top(self, n):
+        """[(clé, compte, erreur)] des n plus fréquents."""
+        meilleurs = sorted(self.compteurs.items(), key=lambda item: item[1][0], reverse=True)[:n]
+        return [(cle, compte, erreur) for cle, (compte, erreur) in meilleurs]
+
+
+class Tendances:
+    """Résumés journaliers des recherches (trajets et arrêts) du processus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jours = {}  # jour -> {'trajets': SpaceSaving, 'arrets': SpaceSaving}
+        self._last_sync = None
+
+    @staticmethod
+    def _resumes(jours, jour):
+        resumes = jours.get(jour)
+        if resumes is None:
+            capacite = _param('SEARCH_SKETCH_CAPACITY', 200)
+            resumes = jours[jour] = {
+                'trajets': SpaceSaving(capacite),
+                'arrets': SpaceSaving(capacite),
+            }
+        return resumes
+
+    def enregistrer(self, date, depart_id, arrivee_id):
+        """Compte une recherche (appelé à chaque nouvel historique)."""
+        jour = timezone.localdate(date)
+        with self._lock:
+            resumes = self._resumes(self._jours, jour)
+            resumes['trajets'].ajouter((depart_id, arrivee_id))
+            resumes['arrets'].ajouter(depart_id)
+            resumes['arrets'].ajouter(arrivee_id)
+
+    def sync(self, force=False):
+        """Recharge les résumés depuis les agrégats journaliers (au plus toutes les SEARCH_SKETCH_SYNC_SECONDS)."""
+        now = time.monotonic()
+        if not force and self._last_sync is not None and now - self._last_sync < _param('SEARCH_SKETCH_SYNC_SECONDS', 60):
+            return
+
+        from .models import RechercheTrajetJour, RechercheArretJour
+
+        depuis = timezone.localdate() - timedelta(days=_param('SEARCH_SKETCH_DAYS', 31) - 1)
+        trajets = (
+            RechercheTrajetJour.objects.filter(jour__gte=depuis)
+            .order_by('jour', '-total')
+            .values_list('jour', 'depart_id', 'arrivee_id', 'total')
+        )
+        arrets = (
+            RechercheArretJour.objects.filter(jour__gte=depuis)
+            .order_by('jour', '-total')
+            .values_list('jour', 'arret_id', 'total')
+        )
+
+        # Lignes d'un même jour par total décroissant : le résumé du jour est exact pour son top
+        jours = {}
+        for jour, depart_id, arrivee_id, total in trajets.iterator():
+            self._resumes(jours, jour)['trajets'].ajouter((depart_id, arrivee_id), total)
+        for jour, arret_id, total in arrets.iterator():
+            self._resumes(jours, jour)['arrets'].ajouter(arret_id, total)
+
+        with self._lock:
+            self._jours = jours
+            self._last_sync = now
+
+    def top(self, genre, jours, limit):
+        """
+        Top `limit` des `genre` ('trajets' ou 'arrets') sur les `jours`
+        derniers jours locaux : [(clé, compte, erreur)].
+        """
+        self.sync()
+        aujourdhui = timezone.localdate()
+        fenetre = {aujourdhui - timedelta(days=i) for i in range(jours)}
+        with self._lock:
+            resumes = [r[genre] for jour, r in self._jours.items() if jour in fenetre]
+            if not resumes:
+                return []
+            return resumes[0].fusionner(resumes[1:]).top(limit)
+
+    def clear(self):
+        with self._lock:
+            self._jours = {}
+            self._last_sync = None
+
+
+tendances = Tendances()
+
+
+def noms_arrets(ids):
+    """{id: nom} des arrêts, depuis la carte du réseau en mémoire (base en repli)."""
+    from transport.live import get_reseau
+    from transport.models import Arret
+
+    connus = get_reseau()['arrets']
+    noms = {i: connus[i] for i in ids if i in connus}
+    manquants = [i for i in ids if i not in noms]
+    if manquants:
+        noms.update(Arret.objects.filter(id__in=manquants).values_list('id', 'nomArret'))
+    return noms
@@ -1,3 +1,786 @@
-from django.test import TestCase
+import gzip
+import json
+import random
+import threading
+from collections import Counter
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.models import Count, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from taxibe_backend import caches
+from transport.models import Bus
+from transport.tests import creer_reseau
+from utilisateur.models import Utilisateur
+from .historique import Recherche, TamponRecherches, _ecrire, _upsert, _upsert_postgresql, enregistrer_recherche
+from .models import (
+    Commentaire, Contribution, Favori, HistoriqueRecherche, RechercheArretJour, RechercheJour, RechercheTrajetJour,
+    SignalementCommentaire, creneau_de,
+)
+from .signals import en_lot
+from .tendances import SpaceSaving, tendances
+from . import commentaires, exports, moderation, notifications, rollups
+
+
+# ========== AGRÉGATS JOURNALIERS ==========
+
+class RollupsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.bob = User.objects.create_user('bob', password='x')
+
+    def setUp(self):
+        cache.clear()
+
+    def comptes(self):
+        return (
+            list(RechercheJour.objects.values_list('total', flat=True)),
+            sorted(RechercheTrajetJour.objects.values_list('depart_id', 'arrivee_id', 'total')),
+            sorted(RechercheArretJour.objects.values_list('arret_id', 'total')),
+        )
+
+    def test_chaque_recherche_met_a_jour_les_agregats(self):
+        a, b, c = (arret.pk for arret in self.arrets[:3])
+        enregistrer_recherche(self.alice, a, b)
+        enregistrer_recherche(self.bob, a, b)
+        enregistrer_recherche(self.bob, a, c)
+        self.assertEqual(self.comptes(), ([3], [(a, b, 2), (a, c, 1)], [(a, 3), (b, 2), (c, 1)]))
+
+    def test_recherche_repetee_comptee_une_fois(self):
+        a, b = self.arrets[0].pk, self.arrets[1].pk
+        _, created = enregistrer_recherche(self.alice, a, b)
+        self.assertTrue(created)
+        _, created = enregistrer_recherche(self.alice, a, b)  # même créneau de 30 min
+        self.assertFalse(created)
+        self.assertEqual(HistoriqueRecherche.objects.count(), 1)
+        self.assertEqual(self.comptes(), ([1], [(a, b, 1)], [(a, 1), (b, 1)]))
+
+    def test_reconstruire_retrouve_les_memes_comptes(self):
+        a, b, c = (arret.pk for arret in self.arrets[:3])
+        for user, depart, arrivee in ((self.alice, a, b), (self.bob, a, b), (self.alice, c, a)):
+            enregistrer_recherche(user, depart, arrivee)
+        incrementaux = self.comptes()
+        RechercheArretJour.objects.update(total=0)
+
+        self.assertEqual(rollups.reconstruire(), {'jours': 1, 'trajets': 2, 'arrets': 3})
+        self.assertEqual(self.comptes(), incrementaux)
+
+
+class EcritureHistoriqueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.alice = User.objects.create_user('alice', password='x')
+
+    def recherche(self, date):
+        return Recherche(self.alice.pk, self.arrets[0].pk, self.arrets[1].pk, creneau_de(date), date)
+
+    def test_ecriture_differee_garde_la_date_de_recherche(self):
+        date = timezone.now() - timedelta(days=3)
+        _ecrire([self.recherche(date)])
+        historique = HistoriqueRecherche.objects.get()
+        self.assertEqual(historique.date_recherche, date)
+        self.assertEqual(historique.creneau, creneau_de(date))
+        self.assertEqual(RechercheJour.objects.get().jour, timezone.localdate(date))
+
+    def verifier_upsert(self, upsert):
+        debut = creneau_de(timezone.now() - timedelta(days=1))
+        [(pk, created)] = upsert([self.recherche(debut + timedelta(minutes=10))])
+        self.assertTrue(created)
+
+        # Même créneau, plus tard : date rafraîchie, pas de nouvelle ligne
+        self.assertEqual(upsert([self.recherche(debut + timedelta(minutes=20))]), [(pk, False)])
+        # Plus tôt (écriture en retard) : la date la plus récente est gardée
+        self.assertEqual(upsert([self.recherche(debut + timedelta(minutes=5))]), [(pk, False)])
+        self.assertEqual(HistoriqueRecherche.objects.get().date_recherche, debut + timedelta(minutes=20))
+
+        # Créneau suivant : nouvelle ligne
+        [(autre, created)] = upsert([self.recherche(debut + timedelta(minutes=40))])
+        self.assertTrue(created)
+        self.assertNotEqual(autre, pk)
+
+    def test_upsert_generique(self):
+        self.verifier_upsert(_upsert)
+
+    @skipUnless(connection.vendor == 'postgresql', 'INSERT ... ON CONFLICT de PostgreSQL')
+    def test_upsert_postgresql(self):
+        self.verifier_upsert(_upsert_postgresql)
+
+    @skipUnless(connection.vendor == 'postgresql', 'INSERT ... ON CONFLICT de PostgreSQL')
+    def test_upsert_postgresql_lot_mixte(self):
+        date = creneau_de(timezone.now()) + timedelta(minutes=1)
+        [(pk, _)] = _upsert_postgresql([self.recherche(date)])
+        autre = Recherche(self.alice.pk, self.arrets[1].pk, self.arrets[0].pk, creneau_de(date), date)
+        resultats = _upsert_postgresql([autre, self.recherche(date + timedelta(minutes=1))])
+        self.assertEqual([created for _, created in resultats], [True, False])
+        self.assertEqual(resultats[1][0], pk)
+
+
+# ========== TENDANCES (SPACE-SAVING) ==========
+
+class SpaceSavingTests(TestCase):
+
+    def flux(self):
+        """Flux biaisé : quelques clés très fréquentes noyées dans une longue traîne."""
+        aleatoire = random.Random(42)
+        cles = [0] * 300 + [1] * 200 + [2] * 100 + [aleatoire.randrange(3, 500) for _ in range(400)]
+        aleatoire.shuffle(cles)
+        return cles
+
+    def test_exact_sous_la_capacite(self):
+        resume = SpaceSaving(10)
+        for cle in 'aabacb':
+            resume.ajouter(cle)
+        resume.ajouter('d', 5)
+        self.assertEqual(resume.top(3), [('d', 5, 0), ('a', 3, 0), ('b', 2, 0)])
+        self.assertEqual(resume.total, 11)
+
+    def test_bornes_garanties(self):
+        cles = self.flux()
+        vrais = Counter(cles)
+        resume = SpaceSaving(20)
+        for cle in cles:
+            resume.ajouter(cle)
+        self.assertEqual(len(resume), 20)
+        self.assertEqual([cle for cle, _, _ in resume.top(3)], [0, 1, 2])
+        for cle, compte, erreur in resume.top(20):
+            self.assertLessEqual(compte - erreur, vrais[cle])
+            self.assertGreaterEqual(compte, vrais[cle])
+
+    def test_fusion(self):
+        cles = self.flux()
+        vrais = Counter(cles)
+        moities = [SpaceSaving(20), SpaceSaving(20)]
+        for i, cle in enumerate(cles):
+            moities[i % 2].ajouter(cle)
+        fusion = moities[0].fusionner(moities[1:])
+        self.assertEqual(fusion.total, len(cles))
+        self.assertEqual([cle for cle, _, _ in fusion.top(3)], [0, 1, 2])
+        for cle, compte, erreur in fusion.top(20):
+            self.assertLessEqual(compte - erreur, vrais[cle])
+            self.assertGreaterEqual(compte, vrais[cle])
+
+
+class TendancesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.bob = User.objects.create_user('bob', password='x')
+
+    def setUp(self):
+        cache.clear()
+        tendances.clear()
+
+    def test_sync_depuis_les_agregats(self):
+        a, b, c = (arret.pk for arret in self.arrets[:3])
+        enregistrer_recherche(self.alice, a, b)
+        enregistrer_recherche(self.bob, a, b)
+        enregistrer_recherche(self.bob, c, a)
+        tendances.sync(force=True)
+        self.assertEqual(tendances.top('trajets', 7, 5), [((a, b), 2, 0), ((c, a), 1, 0)])
+        self.assertEqual(tendances.top('arrets', 7, 1), [(a, 3, 0)])
+
+    def test_enregistrer_sans_requete(self):
+        a, b = self.arrets[0].pk, self.arrets[1].pk
+        tendances.sync(force=True)
+        with self.assertNumQueries(0):
+            tendances.enregistrer(timezone.now(), a, b)
+            self.assertEqual(tendances.top('trajets', 1, 5), [((a, b), 1, 0)])
+
+
+# ========== TAMPON DE L'HISTORIQUE ==========
+
+class TamponMixin:
+
+    def setUp(self):
+        cache.clear()
+        self.tampon = TamponRecherches()
+        self.tampon._demarrer = lambda: None  # flush appelé par le test, pas de thread
+
+    def creer_donnees(self):
+        self.ville, self.quartier, self.arrets, self.bus = creer_reseau()
+        self.alice = User.objects.create_user('alice', password='x')
+
+
+class TamponRecherchesTests(TamponMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.creer_donnees()
+
+    def test_flush_regroupe_les_repetitions(self):
+        a, b, c = (arret.pk for arret in self.arrets[:3])
+        for depart, arrivee in ((a, b), (a, b), (b, c)):
+            self.tampon.ajouter(self.alice.pk, depart, arrivee)
+        self.assertEqual(len(self.tampon), 2)
+        self.assertEqual(self.tampon.flush(), 2)
+        self.assertEqual(len(self.tampon), 0)
+        self.assertEqual(HistoriqueRecherche.objects.count(), 2)
+        self.assertEqual(RechercheJour.objects.get().total, 2)
+
+    def test_base_indisponible_remet_en_attente(self):
+        a, b = self.arrets[0].pk, self.arrets[1].pk
+        self.tampon.ajouter(self.alice.pk, a, b)
+        with mock.patch('interaction.historique._ecrire', side_effect=OperationalError), \
+                self.assertLogs('interaction.historique', 'ERROR'):
+            self.assertEqual(self.tampon.flush(), 0)
+        self.assertEqual(len(self.tampon), 1)
+        self.assertEqual(HistoriqueRecherche.objects.count(), 0)
+
+        self.assertEqual(self.tampon.flush(), 1)
+        self.assertEqual(HistoriqueRecherche.objects.count(), 1)
+
+    @override_settings(HISTORY_BUFFER_MAX=2)
+    def test_tampon_borne(self):
+        a, b, c = (arret.pk for arret in self.arrets[:3])
+        self.tampon.ajouter(self.alice.pk, a, b)
+        self.tampon.ajouter(self.alice.pk, b, c)
+        with mock.patch('interaction.historique._ecrire', side_effect=OperationalError), \
+                self.assertLogs('interaction.historique', 'ERROR'):
+            self.tampon.flush()
+        self.tampon.ajouter(self.alice.pk, c, a)  # tampon plein : ignorée
+        self.tampon.ajouter(self.alice.pk, a, b)  # clé déjà en attente : acceptée
+        self.assertEqual(len(self.tampon), 2)
+        self.assertEqual(self.tampon.flush(), 2)
+
+
+class TamponContraintesTests(TamponMixin, TransactionTestCase):
+    # Clés étrangères vérifiées au commit : il faut de vraies transactions
+
+    def setUp(self):
+        super().setUp()
+        self.creer_donnees()
+
+    def test_ligne_invalide_abandonnee_sans_bloquer_le_lot(self):
+        a, b = self.arrets[0].pk, self.arrets[1].pk
+        self.tampon.ajouter(self.alice.pk, a, b)
+        self.tampon.ajouter(self.alice.pk, a, 999999)  # arrêt supprimé depuis la recherche
+        self.tampon.ajouter(self.alice.pk, b, a)
+        with self.assertLogs('interaction.historique', 'WARNING'):
+            self.assertEqual(self.tampon.flush(), 2)
+        self.assertEqual(len(self.tampon), 0)
+        self.assertEqual(
+            sorted(HistoriqueRecherche.objects.values_list('depart_id', 'arrivee_id')), [(a, b), (b, a)],
+        )
+
+
+# ========== FIL DES COMMENTAIRES ==========
+
+@override_settings(COMMENT_FEED_PAGE_SIZE=2)
+class FilCommentairesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.commentaires = [
+            Commentaire.objects.create(utilisateurRef=cls.alice, busRef=cls.bus, contenu=f'Avis {i}', note=i % 5 + 1)
+            for i in range(5)
+        ]
+        # Deux commentaires à la même seconde : départagés par l'id
+        Commentaire.objects.filter(pk__in=[c.pk for c in cls.commentaires[1:3]]).update(
+            date_creation=cls.commentaires[1].date_creation,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def url(self, bus_id=None):
+        return f'/api/interaction/commentaires/bus/{bus_id or self.bus.pk}/'
+
+    def parcourir(self, **params):
+        ids, curseur = [], None
+        while True:
+            page = self.client.get(self.url(), {**params, **({'cursor': curseur} if curseur else {})}).json()
+            ids += [c['id'] for c in page['commentaires']]
+            if not page['has_more']:
+                return ids
+            curseur = page['cursor']
+
+    def test_pages_sans_doublon_ni_trou(self):
+        attendus = list(
+            Commentaire.objects.filter(busRef=self.bus).order_by('-date_creation', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(len(attendus), 5)
+        self.assertEqual(self.parcourir(), attendus)
+        self.assertEqual(self.parcourir(limit=3), attendus)
+
+    def test_derniere_page(self):
+        page = commentaires.fil_du_bus(self.bus.pk, limit=5)
+        self.assertFalse(page['has_more'])
+        self.assertIsNone(page['cursor'])
+
+    def test_curseur_invalide(self):
+        for curseur in ('!!!', 'bm9uLWRhdGV8MQ=='):  # « non-date|1 »
+            with self.assertRaises(ValueError):
+                commentaires.decoder_curseur(curseur)
+            self.assertEqual(self.client.get(self.url(), {'cursor': curseur}).status_code, 400)
+
+    def test_bus_inconnu(self):
+        self.assertEqual(self.client.get(self.url(999999)).status_code, 404)
+
+    def test_premiere_page_en_cache_puis_invalidee(self):
+        self.client.get(self.url())
+        with self.assertNumQueries(0):
+            self.client.get(self.url())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nouveau = Commentaire.objects.create(utilisateurRef=self.alice, busRef=self.bus, contenu='Nouveau')
+        self.assertEqual(self.client.get(self.url()).json()['commentaires'][0]['id'], nouveau.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nouveau.delete()
+        self.assertNotIn(nouveau.pk, [c['id'] for c in self.client.get(self.url()).json()['commentaires']])
+
+
+# ========== AGRÉGATS DES COMMENTAIRES PAR BUS ==========
+
+class CompteursBusMixin:
+    """Compare les compteurs dénormalisés des bus à un recalcul depuis les tables."""
+
+    @classmethod
+    def creer_acteurs(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.bus2 = Bus.objects.create(
+            numeroBus='7', primus=cls.arrets[0], terminus=cls.arrets[-1], villeRef=cls.ville,
+        )
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.bob = User.objects.create_user('bob', password='x')
+        cls.admin = User.objects.create_user('admin', password='x', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+
+    def en_tant_que(self, user):
+        self.api.force_authenticate(user)
+        return self.api
+
+    def assertCompteursExacts(self):
+        for bus in Bus.objects.all():
+            attendu = Commentaire.objects.filter(busRef=bus).aggregate(n=Count('id'), total=Sum('note'))
+            ouverts = SignalementCommentaire.objects.filter(commentaireRef__busRef=bus, status='open').count()
+            self.assertEqual(
+                (bus.nb_commentaires, bus.note_total, bus.nb_signalements_ouverts),
+                (attendu['n'], attendu['total'] or 0, ouverts),
+                f'Bus {bus.numeroBus}',
+            )
+
+    def commenter(self, user, bus, note):
+        reponse = self.en_tant_que(user).post(
+            '/api/interaction/commentaires/', {'busRef': bus.pk, 'contenu': 'Avis', 'note': note},
+        )
+        self.assertEqual(reponse.status_code, 201)
+        return reponse.json()['id']
+
+    def signaler(self, user, commentaire_id):
+        reponse = self.en_tant_que(user).post(
+            f'/api/interaction/commentaires/{commentaire_id}/report/', {'reason': 'spam'},
+        )
+        self.assertEqual(reponse.status_code, 200)
+        return SignalementCommentaire.objects.get(utilisateurRef=user, commentaireRef_id=commentaire_id).pk
+
+
+class CompteursBusTests(CompteursBusMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creer_acteurs()
+
+    def test_creation_modification_suppression(self):
+        premier = self.commenter(self.alice, self.bus, 4)
+        self.commenter(self.bob, self.bus, 2)
+        self.assertCompteursExacts()
+        self.assertEqual(Bus.objects.get(pk=self.bus.pk).note_moyenne, 3.0)
+
+        url = f'/api/interaction/commentaires/{premier}/'
+        self.assertEqual(self.en_tant_que(self.alice).patch(url, {'note': 1}).status_code, 200)
+        self.assertCompteursExacts()
+        self.assertEqual(self.en_tant_que(self.alice).patch(url, {'contenu': 'Modifié'}).status_code, 200)
+        self.assertCompteursExacts()
+        self.assertEqual(self.en_tant_que(self.alice).patch(url, {'busRef': self.bus2.pk}).status_code, 200)
+        self.assertCompteursExacts()
+
+        self.assertEqual(self.en_tant_que(self.alice).delete(url).status_code, 204)
+        self.assertCompteursExacts()
+
+    def test_signalements(self):
+        commentaire = self.commenter(self.alice, self.bus, 5)
+        signalement = self.signaler(self.bob, commentaire)
+        self.signaler(self.admin, commentaire)
+        self.assertCompteursExacts()
+        self.assertEqual(Bus.objects.get(pk=self.bus.pk).nb_signalements_ouverts, 2)
+
+        self.en_tant_que(self.admin).post(f'/api/interaction/reports/{signalement}/dismiss/')
+        self.assertCompteursExacts()
+        self.signaler(self.bob, commentaire)  # signalé à nouveau : rouvert
+        self.signaler(self.bob, commentaire)  # déjà ouvert : inchangé
+        self.assertCompteursExacts()
+        self.assertEqual(Bus.objects.get(pk=self.bus.pk).nb_signalements_ouverts, 2)
+
+    def test_suppression_du_commentaire_signale(self):
+        commentaire = self.commenter(self.alice, self.bus, 3)
+        self.signaler(self.bob, commentaire)
+        self.commenter(self.bob, self.bus, 5)
+        self.en_tant_que(self.alice).delete(f'/api/interaction/commentaires/{commentaire}/')
+        self.assertCompteursExacts()
+        self.assertEqual(Bus.objects.get(pk=self.bus.pk).nb_signalements_ouverts, 0)
+
+    def test_en_lot_coupe_les_recepteurs(self):
+        with en_lot():
+            Commentaire.objects.create(utilisateurRef=self.alice, busRef=self.bus, note=4)
+        self.assertEqual(Bus.objects.get(pk=self.bus.pk).nb_commentaires, 0)
+        Commentaire.objects.create(utilisateurRef=self.alice, busRef=self.bus, note=4)
+        self.assertEqual(Bus.objects.get(pk=self.bus.pk).nb_commentaires, 1)
+
+
+# ========== MODÉRATION EN LOT ==========
+
+class ModerationTests(CompteursBusMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creer_acteurs()
+
+    def reputation(self, user):
+        return Utilisateur.objects.get(user=user).reputation
+
+    def post_admin(self, url, ids):
+        return self.en_tant_que(self.admin).post(url, {'ids': ids}, format='json')
+
+    def test_ids_invalides(self):
+        url = '/api/interaction/reports/bulk_dismiss/'
+        for ids in ([], 'abc', ['x'], list(range(1, moderation.MAX_IDS + 2))):
+            self.assertEqual(self.post_admin(url, ids).status_code, 400, ids)
+        self.assertEqual(self.post_admin(url, list(range(1, moderation.MAX_IDS + 1))).status_code, 200)
+        self.assertEqual(self.en_tant_que(self.alice).post(url, {'ids': [1]}, format='json').status_code, 403)
+
+    def test_classer_ids_mixtes(self):
+        c1 = self.commenter(self.alice, self.bus, 4)
+        c2 = self.commenter(self.alice, self.bus2, 2)
+        s1, s2, s3 = self.signaler(self.bob, c1), self.signaler(self.admin, c1), self.signaler(self.bob, c2)
+        self.en_tant_que(self.admin).post(f'/api/interaction/reports/{s2}/dismiss/')
+
+        reponse = self.post_admin('/api/interaction/reports/bulk_dismiss/', [s1, s2, s3, 999999])
+        self.assertEqual(reponse.json(), {'updated': 2})  # s2 déjà classé, 999999 inexistant
+        self.assertCompteursExacts()
+        self.assertEqual(self.post_admin('/api/interaction/reports/bulk_dismiss/', [s1, s3]).json(), {'updated': 0})
+        self.assertCompteursExacts()
+
+    @override_settings(REPUTATION_COMMENTAIRE_SUPPRIME=-5)
+    def test_supprimer_commentaires_signales(self):
+        c1 = self.commenter(self.alice, self.bus, 4)
+        c2 = self.commenter(self.alice, self.bus, 2)
+        self.commenter(self.bob, self.bus, 5)
+        s1, s2, s3 = self.signaler(self.bob, c1), self.signaler(self.admin, c1), self.signaler(self.bob, c2)
+        self.en_tant_que(self.admin).post(f'/api/interaction/reports/{s2}/dismiss/')
+
+        # Deux signalements du même commentaire : supprimé une seule fois
+        reponse = self.post_admin('/api/interaction/reports/bulk_remove_comment/', [s1, s2, s3, 999999])
+        self.assertEqual(reponse.json(), {'removed_comments': 2, 'removed_reports': 3})
+        self.assertCompteursExacts()
+        self.assertEqual(self.reputation(self.alice), -10)
+        self.assertEqual(self.reputation(self.bob), 0)
+
+        reponse = self.post_admin('/api/interaction/reports/bulk_remove_comment/', [s1])
+        self.assertEqual(reponse.json(), {'removed_comments': 0, 'removed_reports': 0})
+        self.assertEqual(self.reputation(self.alice), -10)
+
+    def test_reputation_nulle_par_defaut(self):
+        c1 = self.commenter(self.alice, self.bus, 4)
+        s1 = self.signaler(self.bob, c1)
+        self.post_admin('/api/interaction/reports/bulk_remove_comment/', [s1])
+        self.assertEqual(self.reputation(self.alice), 0)
+
+    @override_settings(REPUTATION_CONTRIBUTION_APPROUVEE=10)
+    def test_statut_des_contributions(self):
+        contributions = [
+            Contribution.objects.create(utilisateurRef=user, busRef=self.bus, description='Horaire faux')
+            for user in (self.alice, self.alice, self.bob)
+        ]
+        ids = [c.pk for c in contributions]
+        self.en_tant_que(self.admin).post(f'/api/interaction/contributions/{ids[2]}/approve/')
+        self.assertEqual(self.reputation(self.bob), 10)
+
+        reponse = self.post_admin('/api/interaction/contributions/bulk_approve/', ids + [999999])
+        self.assertEqual(reponse.json(), {'updated': 2})  # la troisième était déjà approuvée
+        self.assertEqual((self.reputation(self.alice), self.reputation(self.bob)), (20, 10))
+
+        reponse = self.post_admin('/api/interaction/contributions/bulk_reject/', ids[1:])
+        self.assertEqual(reponse.json(), {'updated': 2})
+        self.assertEqual((self.reputation(self.alice), self.reputation(self.bob)), (10, 0))
+        self.assertEqual(
+            sorted(Contribution.objects.values_list('status', flat=True)), ['approved', 'rejected', 'rejected'],
+        )
+
+
+# ========== NOTIFICATIONS ADMIN ==========
+
+class NotificationsTests(CompteursBusMixin, TestCase):
+    URL = '/api/interaction/notifications/compteurs/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creer_acteurs()
+
+    def contribuer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Contribution.objects.create(utilisateurRef=self.alice, description='Tarif changé')
+
+    def test_compteurs_ajustes_sans_requete(self):
+        self.contribuer()
+        self.assertEqual(notifications.etat()['contributions_en_attente'], 1)
+        self.contribuer()
+        with self.assertNumQueries(0):
+            etat = notifications.etat()
+        self.assertEqual(etat['contributions_en_attente'], 2)
+        self.assertEqual(etat['signalements_ouverts'], 0)
+
+    def test_ajustement_pendant_le_recalcul(self):
+        class Comptage:
+            # Une contribution est commitée entre le COUNT et la mise en cache
+            def count(self):
+                notifications.ajuster(notifications.CLE_CONTRIBUTIONS, 1)
+                return 0
+
+        self.assertEqual(notifications._compteur(notifications.CLE_CONTRIBUTIONS, Comptage()), 0)
+        self.assertIsNone(cache.get(caches.cle('notifications', notifications.CLE_CONTRIBUTIONS)))
+        self.contribuer()
+        self.assertEqual(notifications.etat()['contributions_en_attente'], 1)
+
+    def test_longpoll_version_deja_changee(self):
+        api = self.en_tant_que(self.admin)
+        with mock.patch('interaction.views.time.sleep', side_effect=AssertionError('attente inutile')):
+            data = api.get(self.URL, {'version': 'ancienne', 'wait': 20}).json()
+        self.assertEqual(data['version'], notifications.etat()['version'])
+
+    @override_settings(NOTIF_LONGPOLL_INTERVAL=0.01)
+    def test_longpoll_repond_au_changement(self):
+        api = self.en_tant_que(self.admin)
+        version = api.get(self.URL).json()['version']
+        changer = lambda _: notifications.ajuster(notifications.CLE_CONTRIBUTIONS, 1)
+        with mock.patch('interaction.views.time.sleep', side_effect=changer) as attente:
+            data = api.get(self.URL, {'version': version, 'wait': 20}).json()
+        self.assertEqual(attente.call_count, 1)
+        self.assertNotEqual(data['version'], version)
+        self.assertEqual(data['contributions_en_attente'], 1)
+
+    @override_settings(NOTIF_LONGPOLL_INTERVAL=0.01)
+    def test_longpoll_expire(self):
+        api = self.en_tant_que(self.admin)
+        version = api.get(self.URL).json()['version']
+        data = api.get(self.URL, {'version': version, 'wait': 0.05}).json()
+        self.assertEqual(data['version'], version)
+        self.assertNotIn('retry_after', data)
+
+    @override_settings(NOTIF_LONGPOLL_RETRY=7)
+    def test_longpoll_sature(self):
+        api = self.en_tant_que(self.admin)
+        version = api.get(self.URL).json()['version']
+        with mock.patch('interaction.views._attentes_longpoll', threading.BoundedSemaphore(1)) as attentes:
+            attentes.acquire()  # seule place déjà prise
+            with mock.patch('interaction.views.time.sleep', side_effect=AssertionError('attente refusée')):
+                reponse = api.get(self.URL, {'version': version, 'wait': 20})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['retry_after'], 7)
+        self.assertEqual(reponse.json()['version'], version)
+
+    def test_reserve_au_staff(self):
+        self.assertEqual(self.en_tant_que(self.alice).get(self.URL).status_code, 403)
+
+
+# ========== STATISTIQUES DE L'HISTORIQUE ==========
+
+class StatsHistoriqueTests(TestCase):
+    URL = '/api/interaction/historiques/stats/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        alice, bob, carol = (User.objects.create_user(nom, password='x') for nom in ('alice', 'bob', 'carol'))
+        a, b, c = cls.arrets[:3]
+        now = timezone.now()
+        for user, depart, arrivee, age in (
+            (alice, a, b, timedelta(seconds=1)),
+            (alice, a, c, timedelta(seconds=2)),
+            (bob, a, b, timedelta(seconds=3)),
+            (alice, b, c, timedelta(days=3)),
+            (bob, b, a, timedelta(days=20)),
+            (carol, c, a, timedelta(days=200)),
+            (alice, c, b, timedelta(days=500)),
+        ):
+            HistoriqueRecherche.objects.create(userRef=user, depart=depart, arrivee=arrivee, date_recherche=now - age)
+        rollups.reconstruire()
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def stats(self, periode, requetes):
+        with self.assertNumQueries(requetes):
+            reponse = self.api.get(self.URL, {'periode': periode})
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()
+
+    def test_periode_courte_en_une_requete(self):
+        stats = self.stats('semaine', 1)
+        self.assertEqual(
+            (stats['total_recherches'], stats['recherches_aujourdhui'], stats['recherches_semaine']), (4, 3, 4),
+        )
+        self.assertEqual(stats['utilisateurs_uniques'], 2)
+        self.assertEqual(stats['moyenne_par_jour'], round(4 / 7, 1))
+        self.assertEqual([jour['recherches'] for jour in stats['evolution']], [0, 0, 0, 1, 0, 0, 3])
+
+        stats = self.stats('mois', 1)
+        self.assertEqual((stats['total_recherches'], stats['utilisateurs_uniques']), (5, 2))
+
+    def test_periodes_longues_lues_dans_les_agregats(self):
+        stats = self.stats('annee', 3)
+        self.assertEqual((stats['total_recherches'], stats['utilisateurs_uniques']), (6, 3))
+        self.assertEqual((stats['recherches_aujourdhui'], stats['recherches_semaine']), (3, 4))
+        self.assertEqual(sum(jour['recherches'] for jour in stats['evolution']), 4)
+
+        stats = self.stats('tout', 3)
+        self.assertEqual((stats['total_recherches'], stats['utilisateurs_uniques']), (7, 3))
+        self.assertEqual(stats['moyenne_par_jour'], round(7 / 500, 1))
+
+    def test_mis_en_cache_par_periode(self):
+        premiere = self.stats('semaine', 1)
+        self.assertEqual(self.stats('semaine', 0), premiere)
+        caches.invalider('analytics')
+        self.assertEqual(self.stats('semaine', 1), premiere)
+
+
+# ========== EXPORT EN FLUX ==========
+
+class ExportHistoriqueTests(TestCase):
+    URL = '/api/interaction/historiques/export/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        alice = User.objects.create_user('alice', password='x')
+        now = timezone.now()
+        # Trois recherches à la même date : l'id départage les lots
+        dates = [now, now - timedelta(minutes=1), now - timedelta(minutes=1), now - timedelta(minutes=1),
+                 now - timedelta(hours=2)]
+        cls.historiques = [
+            HistoriqueRecherche.objects.create(
+                userRef=alice, depart=cls.arrets[i], arrivee=cls.arrets[i + 1], date_recherche=date,
+            )
+            for i, date in enumerate(dates)
+        ]
+        cls.attendus = [h.pk for h in sorted(cls.historiques, key=lambda h: (h.date_recherche, h.pk), reverse=True)]
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def exporter(self, **params):
+        reponse = self.api.get(self.URL, params)
+        self.assertEqual(reponse.status_code, 200)
+        return reponse, b''.join(reponse.streaming_content)
+
+    def test_lots_sans_doublon_ni_trou(self):
+        for taille in (1, 2, 3, 5, 100):
+            ids = [h['id'] for h in exports.iter_historique(HistoriqueRecherche.objects.all(), batch_size=taille)]
+            self.assertEqual(ids, self.attendus, taille)
+
+    def test_csv(self):
+        reponse, contenu = self.exporter(format='csv')
+        self.assertEqual(reponse['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('historique_tout.csv', reponse['Content-Disposition'])
+        texte = contenu.decode('utf-8')
+        self.assertTrue(texte.startswith('\ufeff'))
+        lignes = texte.lstrip('\ufeff').splitlines()
+        self.assertEqual(lignes[0], 'ID;Utilisateur;Départ;Arrivée;Date')
+        self.assertEqual([int(ligne.split(';')[0]) for ligne in lignes[1:]], self.attendus)
+        self.assertEqual(lignes[1].split(';')[1:4], ['alice', self.arrets[0].nomArret, self.arrets[1].nomArret])
+
+    def test_json_et_ndjson(self):
+        _, contenu = self.exporter(format='json')
+        self.assertEqual([e['id'] for e in json.loads(contenu)], self.attendus)
+        reponse, contenu = self.exporter(format='ndjson')
+        self.assertEqual(reponse['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(ligne)['id'] for ligne in contenu.decode('utf-8').splitlines()], self.attendus)
+
+    def test_gzip(self):
+        _, brut = self.exporter(format='ndjson')
+        reponse, compresse = self.exporter(format='ndjson', gzip='1')
+        self.assertEqual(reponse['Content-Type'], 'application/gzip')
+        self.assertIn('historique_tout.ndjson.gz', reponse['Content-Disposition'])
+        self.assertEqual(gzip.decompress(compresse), brut)
+
+    def test_periode(self):
+        ancienne = self.historiques[-1]
+        HistoriqueRecherche.objects.filter(pk=ancienne.pk).update(date_recherche=timezone.now() - timedelta(days=10))
+        _, contenu = self.exporter(format='json', periode='semaine')
+        self.assertEqual([e['id'] for e in json.loads(contenu)], [pk for pk in self.attendus if pk != ancienne.pk])
+
+
+# ========== STATUT DES FAVORIS ==========
+
+class StatutFavorisTests(TestCase):
+    URL = '/api/interaction/favoris/statut/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.bus7 = Bus.objects.create(numeroBus='7', primus=cls.arrets[0], terminus=cls.arrets[-1], villeRef=cls.ville)
+        cls.bus9 = Bus.objects.create(numeroBus='9', primus=cls.arrets[0], terminus=cls.arrets[-1], villeRef=cls.ville)
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.bob = User.objects.create_user('bob', password='x')
+        Favori.objects.create(utilisateurRef=cls.alice, busRef=cls.bus9)
+        Favori.objects.create(utilisateurRef=cls.alice, busRef=cls.bus)
+        Favori.objects.create(utilisateurRef=cls.bob, busRef=cls.bus7)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.alice)
+
+    def test_get_et_post(self):
+        ids = [self.bus.pk, self.bus7.pk, self.bus9.pk]
+        with self.assertNumQueries(1):
+            reponse = self.api.get(self.URL, {'bus': ','.join(map(str, ids))})
+        self.assertEqual(reponse.json(), {'favoris': sorted([self.bus.pk, self.bus9.pk])})
+        reponse = self.api.post(self.URL, {'bus': [self.bus7.pk, self.bus9.pk]}, format='json')
+        self.assertEqual(reponse.json(), {'favoris': [self.bus9.pk]})
+
+    def test_liste_vide_sans_requete(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.api.get(self.URL).json(), {'favoris': []})
+        self.assertEqual(self.api.post(self.URL, {'bus': []}, format='json').json(), {'favoris': []})
+
+    def test_ids_invalides(self):
+        self.assertEqual(self.api.get(self.URL, {'bus': '1,abc'}).status_code, 400)
+        for bus in ('1,2', {'id': 1}, ['x']):
+            self.assertEqual(self.api.post(self.URL, {'bus': bus}, format='json').status_code, 400, bus)
+
+    def test_reserve_aux_connectes(self):
+        self.assertEqual(APIClient().get(self.URL, {'bus': self.bus.pk}).status_code, 401)
+
+    def test_is_favori_dans_la_liste_des_bus(self):
+        def favoris(api):
+            return {b['id']: b['is_favori'] for b in api.get('/api/transport/bus/').json()}
+
+        attendu = {self.bus.pk: True, self.bus7.pk: False, self.bus9.pk: True}
+        self.assertEqual(favoris(self.api), attendu)
+        self.api.force_authenticate(self.bob)
+        self.assertEqual(favoris(self.api), {self.bus.pk: False, self.bus7.pk: True, self.bus9.pk: False})
+        self.assertEqual(favoris(APIClient()), dict.fromkeys(attendu, False))
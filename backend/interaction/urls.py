@@ -1,4 +1,5 @@
 # backend/interaction/urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import (
     FavoriViewSet,
@@ -6,6 +7,7 @@ from .views import (
     CommentaireViewSet,
     HistoriqueRechercheViewSet,
     SignalementCommentaireViewSet,
+    compteurs_notifications,
 )
 
 router = DefaultRouter()
@@ -15,4 +17,6 @@ router.register(r'commentaires', CommentaireViewSet, basename='commentaires')
 router.register(r'historiques', HistoriqueRechercheViewSet, basename='historiques')
 router.register(r'reports', SignalementCommentaireViewSet, basename='reports')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = [
+    path('notifications/compteurs/', compteurs_notifications, name='notifications-compteurs'),
+] + router.urls
\ No newline at end of file
@@ -1,27 +1,30 @@
 # backend/interaction/views.py (VERSION COMPLÈTE AVEC get_or_create)
 from django.conf import settings
+from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
 from django.utils.dateparse import parse_date
 from django.utils import timezone
 from datetime import datetime, timedelta
+import threading
+import time
 
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Count, Exists, Min, OuterRef, Q, Sum
 
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.db.models.functions import TruncDate, TruncHour
-import csv
-import json
 
 
+from taxibe_backend import caches
+
 # 🔥 IMPORT DE VOTRE MODÈLE UTILISATEUR
-from utilisateur.models import Utilisateur 
+from utilisateur.models import assurer_profil
 
 from .models import (
     Favori,
@@ -29,6 +32,9 @@ from .models import (
     Commentaire,
     HistoriqueRecherche,
     SignalementCommentaire,
+    RechercheJour,
+    RechercheTrajetJour,
+    RechercheArretJour,
 )
 from .serializers import (
     FavoriSerializer,
@@ -38,6 +44,9 @@ from .serializers import (
     SignalementCommentaireSerializer,
 )
 from transport.models import Bus
+from .historique import enregistrer_recherche
+from . import exports, commentaires, moderation, notifications
+from .tendances import tendances, noms_arrets
 
 # Helper admin
 ADMIN_ROLES = {'admin', 'staff', 'moderator', 'manager', 'superadmin'}
@@ -48,6 +57,24 @@ def user_is_admin(user):
     return role in ADMIN_ROLES
 
 
+def _ids_du_lot(request):
+    """Liste d'ids d'une action en lot ({"ids": [...]}), ou None si invalide"""
+    ids = request.data.get('ids')
+    if not isinstance(ids, list) or not ids or len(ids) > moderation.MAX_IDS:
+        return None
+    try:
+        return sorted({int(i) for i in ids})
+    except (TypeError, ValueError):
+        return None
+
+
+def _erreur_lot():
+    return Response(
+        {'error': f'ids doit être une liste de 1 à {moderation.MAX_IDS} identifiants'},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
 # ============ Favoris ============
 class FavoriViewSet(viewsets.ModelViewSet):
     queryset = Favori.objects.all()
@@ -60,6 +87,21 @@ class FavoriViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(utilisateurRef=self.request.user)
 
+    @action(detail=False, methods=['get', 'post'])
+    def statut(self, request):
+        """Bus favoris parmi une liste d'ids (?bus=1,2,3 ou {"bus": [...]}), en une requête"""
+        bus_ids = request.data.get('bus') if request.method == 'POST' else request.query_params.get('bus', '').split(',')
+        if not isinstance(bus_ids, list):
+            return Response({'error': 'bus doit être une liste d\'ids'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            bus_ids = {int(i) for i in bus_ids if str(i).strip()}
+        except (TypeError, ValueError):
+            return Response({'error': 'ids de bus invalides'}, status=status.HTTP_400_BAD_REQUEST)
+        favoris = Favori.objects.filter(
+            utilisateurRef=request.user, busRef_id__in=bus_ids
+        ).order_by().values_list('busRef_id', flat=True) if bus_ids else []
+        return Response({'favoris': sorted(favoris)})
+
     @action(detail=False, methods=['post'])
     def toggle(self, request):
         bus_id = request.data.get('busRef')
@@ -82,12 +124,12 @@ class ContributionViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             return [AllowAny()]
-        if self.action in ['approve', 'reject']:
+        if self.action in ['approve', 'reject', 'bulk_approve', 'bulk_reject']:
             return [IsAdminUser()]
         return [IsAuthenticated()]
 
     def get_queryset(self):
-        qs = super().get_queryset().select_related('utilisateurRef', 'busRef')
+        qs = super().get_queryset().select_related('utilisateurRef__profile', 'busRef')
         status_param = self.request.query_params.get('status')
         if status_param:
             qs = qs.filter(status=status_param)
@@ -95,12 +137,8 @@ class ContributionViewSet(viewsets.ModelViewSet):
 
     @transaction.atomic
     def perform_create(self, serializer):
-        # 🔥 CORRECTION : OBTENIR OU CRÉER le profil Utilisateur
-        user_instance = self.request.user
-        utilisateur, _ = Utilisateur.objects.get_or_create(
-            user=user_instance,
-            defaults={'username': user_instance.username} 
-        )
+        # Le profil porte la réputation : il doit exister (sans écriture s'il existe déjà)
+        assurer_profil(self.request.user)
         serializer.save(utilisateurRef=self.request.user)
 
     def perform_update(self, serializer):
@@ -117,17 +155,33 @@ class ContributionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
     def approve(self, request, pk=None):
         contrib = self.get_object()
-        contrib.status = 'approved'
-        contrib.save()
+        moderation.changer_statut_contributions([contrib.pk], 'approved')
+        contrib.refresh_from_db()
         return Response(self.get_serializer(contrib).data)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
     def reject(self, request, pk=None):
         contrib = self.get_object()
-        contrib.status = 'rejected'
-        contrib.save()
+        moderation.changer_statut_contributions([contrib.pk], 'rejected')
+        contrib.refresh_from_db()
         return Response(self.get_serializer(contrib).data)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_approve(self, request):
+        """Approuver plusieurs contributions : {"ids": [...]}"""
+        ids = _ids_du_lot(request)
+        if ids is None:
+            return _erreur_lot()
+        return Response({'updated': moderation.changer_statut_contributions(ids, 'approved')})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_reject(self, request):
+        """Rejeter plusieurs contributions : {"ids": [...]}"""
+        ids = _ids_du_lot(request)
+        if ids is None:
+            return _erreur_lot()
+        return Response({'updated': moderation.changer_statut_contributions(ids, 'rejected')})
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def mes_contributions(self, request):
         qs = self.get_queryset().filter(utilisateurRef=request.user)
@@ -140,7 +194,7 @@ class CommentaireViewSet(viewsets.ModelViewSet):
     serializer_class = CommentaireSerializer
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'par_bus']:
             return [AllowAny()]
         return [IsAuthenticated()]
 
@@ -151,14 +205,26 @@ class CommentaireViewSet(viewsets.ModelViewSet):
             qs = qs.filter(busRef_id=bus_id)
         return qs
 
+    @action(detail=False, methods=['get'], url_path=r'bus/(?P<bus_id>\d+)')
+    def par_bus(self, request, bus_id=None):
+        """Fil des commentaires d'un bus : ?cursor=<curseur opaque>&limit=N"""
+        limit = request.query_params.get('limit')
+        try:
+            page = commentaires.fil_du_bus(
+                int(bus_id),
+                curseur=request.query_params.get('cursor'),
+                limit=int(limit) if limit else None,
+            )
+        except ValueError:
+            return Response({'error': 'cursor ou limit invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        if not page['commentaires'] and not Bus.objects.filter(pk=bus_id).exists():
+            return Response({'error': 'Bus introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(page)
+
     @transaction.atomic
     def perform_create(self, serializer):
-        # 🔥 CORRECTION : OBTENIR OU CRÉER le profil Utilisateur
-        user_instance = self.request.user
-        utilisateur, _ = Utilisateur.objects.get_or_create(
-            user=user_instance,
-            defaults={'username': user_instance.username} 
-        )
+        # Le profil porte la réputation : il doit exister (sans écriture s'il existe déjà)
+        assurer_profil(self.request.user)
         serializer.save(utilisateurRef=self.request.user)
 
     def perform_update(self, serializer):
@@ -258,8 +324,6 @@ class HistoriqueRechercheViewSet(viewsets.ModelViewSet):
             qs = qs.filter(
                 Q(depart__nomArret__icontains=q_param) |
                 Q(arrivee__nomArret__icontains=q_param) |
-                Q(depart__nom__icontains=q_param) |
-                Q(arrivee__nom__icontains=q_param) |
                 Q(userRef__username__icontains=q_param)
             )
             
@@ -285,6 +349,24 @@ class HistoriqueRechercheViewSet(viewsets.ModelViewSet):
         
         return qs
 
+    # Périodes longues : lues dans les agrégats journaliers (interaction/rollups.py)
+    PERIODES_AGREGEES = ('annee', 'tout')
+
+    # Périodes courtes : top approché en mémoire (interaction/tendances.py), ?exact=1 pour la base
+    JOURS_TENDANCES = {'jour': 1, 'semaine': 7, 'mois': 30}
+
+    def _tendances(self, genre, periode, limit):
+        """Top approché [(clé, compte, erreur)], ou None si la base doit répondre"""
+        if periode not in self.JOURS_TENDANCES or self.request.query_params.get('exact') in ('1', 'true'):
+            return None
+        return tendances.top(genre, self.JOURS_TENDANCES[periode], limit)
+
+    def _filter_rollup_by_periode(self, qs, periode):
+        """Filtre un queryset d'agrégats journaliers (champ `jour`) par période"""
+        if periode == 'annee':
+            qs = qs.filter(jour__gte=timezone.localdate() - timedelta(days=365))
+        return qs
+
     def create(self, request, *args, **kwargs):
         """Création avec déduplication (30 min)"""
         user = request.user
@@ -297,25 +379,17 @@ class HistoriqueRechercheViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        since = timezone.now() - timedelta(minutes=30)
-        last = HistoriqueRecherche.objects.filter(
-            userRef=user, 
-            depart_id=depart, 
-            arrivee_id=arrivee, 
-            date_recherche__gte=since
-        ).order_by('-date_recherche').first()
-
-        if last:
-            last.date_recherche = timezone.now()
-            last.save(update_fields=['date_recherche'])
-            ser = self.get_serializer(last)
-            return Response(ser.data, status=status.HTTP_200_OK)
-
-        serializer = self.get_serializer(data={'depart': depart, 'arrivee': arrivee})
+        serializer = self.get_serializer(data={'userRef': user.pk, 'depart': depart, 'arrivee': arrivee})
         serializer.is_valid(raise_exception=True)
-        serializer.save(userRef=user)
-        headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+        historique, created = enregistrer_recherche(
+            user, serializer.validated_data['depart'].pk, serializer.validated_data['arrivee'].pk
+        )
+        ser = self.get_serializer(historique)
+        if not created:
+            return Response(ser.data, status=status.HTTP_200_OK)
+        headers = self.get_success_headers(ser.data)
+        return Response(ser.data, status=status.HTTP_201_CREATED, headers=headers)
 
     def perform_destroy(self, instance):
         user = self.request.user
@@ -333,23 +407,59 @@ class HistoriqueRechercheViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='stats')
     def stats(self, request):
-        """Statistiques globales de l'historique"""
+        """Statistiques globales de l'historique (espace de cache 'analytics')"""
         periode = request.query_params.get('periode', 'semaine')
+        return Response(caches.obtenir('analytics', ('historique', periode), lambda: self._stats(periode)))
+
+    def _stats(self, periode):
+        """Statistiques d'une période (une seule requête d'agrégation)"""
         now = timezone.now()
         
         # Base queryset filtré par période
         qs = self._filter_by_periode(HistoriqueRecherche.objects.all(), periode)
+        agregee = periode in self.PERIODES_AGREGEES
         
-        # Stats de base
-        total = qs.count()
+        # Bornes des jours dans le fuseau local (Indian/Antananarivo)
+        today_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        week_start = now - timedelta(days=7)
+        jours_evolution = [today_start - timedelta(days=i) for i in range(6, -1, -1)]
         
-        # Aujourd'hui
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        aujourdhui = qs.filter(date_recherche__gte=today_start).count()
+        if agregee:
+            # Total et première recherche depuis les agrégats ; les comptages
+            # récents ci-dessous ne parcourent que les 7 derniers jours
+            rollup = self._filter_rollup_by_periode(RechercheJour.objects.all(), periode).aggregate(
+                total=Sum('total'), premiere=Min('jour'),
+            )
+            recentes = qs.filter(date_recherche__gte=min(week_start, jours_evolution[0]))
+            utilisateurs = User.objects.filter(
+                Exists(qs.filter(userRef=OuterRef('pk')))
+            ).count()
+        else:
+            recentes = qs
         
-        # Cette semaine
-        week_start = now - timedelta(days=7)
-        semaine = qs.filter(date_recherche__gte=week_start).count()
+        # Comptages conditionnels : total, aujourd'hui, semaine, 7 jours d'évolution,
+        # utilisateurs uniques et première recherche en un seul parcours
+        agg = recentes.aggregate(
+            total=Count('id'),
+            aujourdhui=Count('id', filter=Q(date_recherche__gte=today_start)),
+            semaine=Count('id', filter=Q(date_recherche__gte=week_start)),
+            utilisateurs_uniques=Count('userRef', distinct=True),
+            premiere=Min('date_recherche'),
+            **{
+                f'jour_{i}': Count('id', filter=Q(
+                    date_recherche__gte=day_start,
+                    date_recherche__lt=day_start + timedelta(days=1),
+                ))
+                for i, day_start in enumerate(jours_evolution)
+            }
+        )
+        if agregee:
+            agg['total'] = rollup['total'] or 0
+            agg['utilisateurs_uniques'] = utilisateurs
+            agg['premiere'] = rollup['premiere'] and timezone.make_aware(
+                datetime.combine(rollup['premiere'], datetime.min.time())
+            )
+        total = agg['total']
         
         # Moyenne par jour
         if periode == 'jour':
@@ -361,34 +471,28 @@ class HistoriqueRechercheViewSet(viewsets.ModelViewSet):
         elif periode == 'annee':
             jours = 365
         else:
-            jours = max((now - qs.order_by('date_recherche').first().date_recherche).days, 1) if qs.exists() else 1
+            jours = max((now - agg['premiere']).days, 1) if agg['premiere'] else 1
             
         moyenne = round(total / jours, 1) if jours > 0 else 0
         
         # Évolution par jour (7 derniers jours)
-        evolution = []
-        for i in range(6, -1, -1):
-            day = now - timedelta(days=i)
-            day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = day_start + timedelta(days=1)
-            count = qs.filter(date_recherche__gte=day_start, date_recherche__lt=day_end).count()
-            evolution.append({
-                'jour': day.strftime('%a'),  # Lun, Mar, etc.
-                'date': day.strftime('%d/%m'),
-                'recherches': count
-            })
-        
-        # Utilisateurs uniques
-        utilisateurs_uniques = qs.values('userRef').distinct().count()
+        evolution = [
+            {
+                'jour': day_start.strftime('%a'),  # Lun, Mar, etc.
+                'date': day_start.strftime('%d/%m'),
+                'recherches': agg[f'jour_{i}'],
+            }
+            for i, day_start in enumerate(jours_evolution)
+        ]
         
-        return Response({
+        return {
             'total_recherches': total,
-            'recherches_aujourdhui': aujourdhui,
-            'recherches_semaine': semaine,
+            'recherches_aujourdhui': agg['aujourdhui'],
+            'recherches_semaine': agg['semaine'],
             'moyenne_par_jour': moyenne,
-            'utilisateurs_uniques': utilisateurs_uniques,
+            'utilisateurs_uniques': agg['utilisateurs_uniques'],
             'evolution': evolution
-        })
+        }
 
     @action(detail=False, methods=['get'], url_path='top-trajets')
     def top_trajets(self, request):
@@ -396,19 +500,40 @@ class HistoriqueRechercheViewSet(viewsets.ModelViewSet):
         limit = int(request.query_params.get('limit', 10))
         periode = request.query_params.get('periode', 'semaine')
         
-        qs = self._filter_by_periode(HistoriqueRecherche.objects.all(), periode)
+        top = self._tendances('trajets', periode, limit)
+        if top is not None:
+            noms = noms_arrets({i for (depart, arrivee), _, _ in top for i in (depart, arrivee)})
+            result = []
+            for (depart, arrivee), count, erreur in top:
+                depart_nom = noms.get(depart) or 'Inconnu'
+                arrivee_nom = noms.get(arrivee) or 'Inconnu'
+                result.append({
+                    'trajet': f"{depart_nom} → {arrivee_nom}",
+                    'depart': depart_nom,
+                    'arrivee': arrivee_nom,
+                    'count': count,
+                    'erreur': erreur,
+                })
+            return Response(result)
         
-        trajets = qs.values(
-            'depart__nomArret', 'depart__nom',
-            'arrivee__nomArret', 'arrivee__nom'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')[:limit]
+        if periode in self.PERIODES_AGREGEES:
+            trajets = self._filter_rollup_by_periode(RechercheTrajetJour.objects.all(), periode).values(
+                'depart__nomArret', 'arrivee__nomArret'
+            ).annotate(
+                count=Sum('total')
+            ).order_by('-count')[:limit]
+        else:
+            qs = self._filter_by_periode(HistoriqueRecherche.objects.all(), periode)
+            trajets = qs.values(
+                'depart__nomArret', 'arrivee__nomArret'
+            ).annotate(
+                count=Count('id')
+            ).order_by('-count')[:limit]
         
         result = []
         for t in trajets:
-            depart_nom = t.get('depart__nomArret') or t.get('depart__nom') or 'Inconnu'
-            arrivee_nom = t.get('arrivee__nomArret') or t.get('arrivee__nom') or 'Inconnu'
+            depart_nom = t.get('depart__nomArret') or 'Inconnu'
+            arrivee_nom = t.get('arrivee__nomArret') or 'Inconnu'
             result.append({
                 'trajet': f"{depart_nom} → {arrivee_nom}",
                 'depart': depart_nom,
@@ -424,23 +549,40 @@ class HistoriqueRechercheViewSet(viewsets.ModelViewSet):
         limit = int(request.query_params.get('limit', 10))
         periode = request.query_params.get('periode', 'semaine')
         
+        top = self._tendances('arrets', periode, limit)
+        if top is not None:
+            noms = noms_arrets({arret for arret, _, _ in top})
+            return Response([
+                {'arret': noms.get(arret) or 'Inconnu', 'count': count, 'erreur': erreur}
+                for arret, count, erreur in top
+            ])
+        
+        if periode in self.PERIODES_AGREGEES:
+            # Les agrégats comptent déjà départs et arrivées par arrêt
+            arrets = self._filter_rollup_by_periode(RechercheArretJour.objects.all(), periode).values(
+                'arret__nomArret'
+            ).annotate(count=Sum('total')).order_by('-count')[:limit]
+            return Response([
+                {'arret': a['arret__nomArret'] or 'Inconnu', 'count': a['count']} for a in arrets
+            ])
+        
         qs = self._filter_by_periode(HistoriqueRecherche.objects.all(), periode)
         
         # Comptage des départs
-        departs = qs.values('depart__nomArret', 'depart__nom').annotate(count=Count('id'))
+        departs = qs.values('depart__nomArret').annotate(count=Count('id'))
         
         # Comptage des arrivées
-        arrivees = qs.values('arrivee__nomArret', 'arrivee__nom').annotate(count=Count('id'))
+        arrivees = qs.values('arrivee__nomArret').annotate(count=Count('id'))
         
         # Fusion des comptages
         arrets_count = {}
         
         for d in departs:
-            nom = d.get('depart__nomArret') or d.get('depart__nom') or 'Inconnu'
+            nom = d.get('depart__nomArret') or 'Inconnu'
             arrets_count[nom] = arrets_count.get(nom, 0) + d['count']
             
         for a in arrivees:
-            nom = a.get('arrivee__nomArret') or a.get('arrivee__nom') or 'Inconnu'
+            nom = a.get('arrivee__nomArret') or 'Inconnu'
             arrets_count[nom] = arrets_count.get(nom, 0) + a['count']
         
         # Tri et limite
@@ -450,59 +592,30 @@ class HistoriqueRechercheViewSet(viewsets.ModelViewSet):
         
         return Response(result)
 
-    @action(detail=False, methods=['get'], url_path='export')
+    @action(detail=False, methods=['get'], url_path='export', content_negotiation_class=exports.ExportNegotiation)
     def export(self, request):
-        """Exporter l'historique en CSV ou JSON"""
+        """Exporter l'historique en flux (CSV, JSON ou NDJSON), gzip optionnel"""
         format_type = request.query_params.get('format', 'csv')
         periode = request.query_params.get('periode', 'tout')
+        compresser = request.query_params.get('gzip') in ('1', 'true')
         
-        qs = self._filter_by_periode(
-            HistoriqueRecherche.objects.select_related('userRef', 'depart', 'arrivee'),
-            periode
-        ).order_by('-date_recherche')
-        
-        # Limiter pour les gros exports
-        qs = qs[:5000]
-        
-        if format_type == 'json':
-            data = []
-            for h in qs:
-                data.append({
-                    'id': h.id,
-                    'utilisateur': h.userRef.username if h.userRef else 'Anonyme',
-                    'depart': getattr(h.depart, 'nomArret', None) or getattr(h.depart, 'nom', str(h.depart_id)),
-                    'arrivee': getattr(h.arrivee, 'nomArret', None) or getattr(h.arrivee, 'nom', str(h.arrivee_id)),
-                    'date': h.date_recherche.isoformat()
-                })
-            
-            response = HttpResponse(
-                json.dumps(data, ensure_ascii=False, indent=2),
-                content_type='application/json'
-            )
-            response['Content-Disposition'] = f'attachment; filename="historique_{periode}.json"'
-            return response
+        qs = self._filter_by_periode(HistoriqueRecherche.objects.all(), periode)
+        lignes = exports.iter_historique(qs)
         
+        if format_type == 'ndjson':
+            flux, content_type, extension = exports.lignes_ndjson(lignes), 'application/x-ndjson', 'ndjson'
+        elif format_type == 'json':
+            flux, content_type, extension = exports.lignes_json(lignes), 'application/json', 'json'
         else:  # CSV par défaut
-            response = HttpResponse(content_type='text/csv; charset=utf-8')
-            response['Content-Disposition'] = f'attachment; filename="historique_{periode}.csv"'
-            response.write('\ufeff')  # BOM pour Excel
-            
-            writer = csv.writer(response, delimiter=';')
-            writer.writerow(['ID', 'Utilisateur', 'Départ', 'Arrivée', 'Date'])
-            
-            for h in qs:
-                depart_nom = getattr(h.depart, 'nomArret', None) or getattr(h.depart, 'nom', str(h.depart_id))
-                arrivee_nom = getattr(h.arrivee, 'nomArret', None) or getattr(h.arrivee, 'nom', str(h.arrivee_id))
-                
-                writer.writerow([
-                    h.id,
-                    h.userRef.username if h.userRef else 'Anonyme',
-                    depart_nom,
-                    arrivee_nom,
-                    h.date_recherche.strftime('%d/%m/%Y %H:%M')
-                ])
-            
-            return response
+            flux, content_type, extension = exports.lignes_csv(lignes), 'text/csv; charset=utf-8', 'csv'
+        
+        filename = f'historique_{periode}.{extension}'
+        if compresser:
+            flux, content_type, filename = exports.gzip_flux(flux), 'application/gzip', filename + '.gz'
+        
+        response = StreamingHttpResponse(flux, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 # ============ Signalements (admin) ============
 class SignalementCommentaireViewSet(viewsets.ModelViewSet):
@@ -528,15 +641,72 @@ class SignalementCommentaireViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def dismiss(self, request, pk=None):
         rep = self.get_object()
-        rep.status = 'dismissed'
-        rep.save()
+        moderation.classer_signalements([rep.pk])
+        rep.refresh_from_db()
         return Response(self.get_serializer(rep).data)
 
     @action(detail=True, methods=['post'])
     def remove_comment(self, request, pk=None):
         rep = self.get_object()
-        cm = rep.commentaireRef
-        cm.delete()
+        # Le signalement disparaît avec le commentaire (CASCADE) : le sérialiser avant
         rep.status = 'removed'
-        rep.save()
-        return Response(self.get_serializer(rep).data)
\ No newline at end of file
+        data = self.get_serializer(rep).data
+        moderation.supprimer_commentaires_signales([rep.pk])
+        return Response(data)
+
+    @action(detail=False, methods=['post'])
+    def bulk_dismiss(self, request):
+        """Classer plusieurs signalements sans suite : {"ids": [...]}"""
+        ids = _ids_du_lot(request)
+        if ids is None:
+            return _erreur_lot()
+        return Response({'updated': moderation.classer_signalements(ids)})
+
+    @action(detail=False, methods=['post'])
+    def bulk_remove_comment(self, request):
+        """Supprimer les commentaires visés par plusieurs signalements : {"ids": [...]}"""
+        ids = _ids_du_lot(request)
+        if ids is None:
+            return _erreur_lot()
+        nb_commentaires, nb_signalements = moderation.supprimer_commentaires_signales(ids)
+        return Response({'removed_comments': nb_commentaires, 'removed_reports': nb_signalements})
+
+
+# ============ Notifications (admin) ============
+_attentes_longpoll = threading.BoundedSemaphore(getattr(settings, 'NOTIF_LONGPOLL_WAITERS', 4))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def compteurs_notifications(request):
+    """
+    Compteurs de la cloche admin, servis depuis le cache.
+    ?depuis=<id du dernier commentaire vu> : nombre de nouveaux commentaires
+    ?version=<version reçue>&wait=<s> : long-polling, répond dès que les
+    compteurs changent (ou au bout de `wait` secondes) ; si trop d'attentes
+    sont déjà en cours, répond tout de suite avec retry_after (s)
+    """
+    try:
+        depuis = int(request.query_params['depuis']) if request.query_params.get('depuis') else None
+        wait = min(float(request.query_params.get('wait', 0)), getattr(settings, 'NOTIF_LONGPOLL_MAX', 25))
+    except ValueError:
+        return Response({'error': 'depuis et wait doivent être numériques'}, status=status.HTTP_400_BAD_REQUEST)
+    version = request.query_params.get('version')
+
+    data = notifications.etat(depuis)
+    if not version or data['version'] != version or wait <= 0:
+        return Response(data)
+
+    # Chaque attente occupe un worker WSGI : au-delà de NOTIF_LONGPOLL_WAITERS
+    # attentes simultanées, réponse immédiate et client prié de repasser plus tard
+    if not _attentes_longpoll.acquire(blocking=False):
+        data['retry_after'] = getattr(settings, 'NOTIF_LONGPOLL_RETRY', 15)
+        return Response(data)
+    try:
+        fin = time.monotonic() + wait
+        while data['version'] == version and time.monotonic() < fin:
+            time.sleep(min(getattr(settings, 'NOTIF_LONGPOLL_INTERVAL', 1), max(fin - time.monotonic(), 0)))
+            data = notifications.etat(depuis)
+    finally:
+        _attentes_longpoll.release()
+    return Response(data)
@@ -0,0 +1,174 @@
+# taxibe_backend/caches.py
+"""
+Cache commun, par espaces de noms versionnés.
+
+Clés : taxibe:<espace>:v<version>:<parties>. La version de chaque espace est
+gardée dans le cache lui-même ; invalider un espace l'incrémente, ce qui
+rend d'un coup toutes ses clés obsolètes (elles expirent ensuite d'elles-
+mêmes) sans les énumérer, y compris dans un cache partagé entre processus.
+Les invalidations sont branchées sur les signaux des modèles
+(transport/signals.py, interaction/signals.py).
+
+obtenir() protège des ruées sur une même clé :
+- une valeur reste fraîche `timeout` secondes puis est gardée encore un
+  moment : passé ce délai, un seul processus (verrou cache.add) la
+  recalcule pendant que les autres servent l'ancienne ;
+- sur une clé absente, un seul processus calcule, les autres attendent
+  brièvement son résultat avant de calculer eux-mêmes.
+
+Le backend est celui de CACHES (settings.py) : mémoire locale par défaut,
+Redis partagé en production.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+# Espaces et durée de fraîcheur par défaut (secondes), surchargeable par CACHE_TTLS
+ESPACES = {
+    'reseau': 600,          # lignes, trajets, GeoJSON (Bus, Trajet, TrajetArret, Arret)
+    'arrets': 600,          # arrêts, villes, quartiers, index de recherche
+    'analytics': 60,        # statistiques de l'historique des recherches
+    'utilisateurs': 300,    # utilisateurs authentifiés, compteurs de profil
+    'commentaires': 300,    # première page du fil de chaque bus
+    'notifications': 300,   # compteurs de la cloche admin
+    'temps_reel': 30,       # tableaux des prochains passages
+}
+
+VERROU_TTL = 30         # durée maximale d'un calcul protégé
+ATTENTE_MAX = 2.0       # attente d'une valeur calculée par un autre processus
+ATTENTE_PAS = 0.05
+
+
+def _ttl(espace, timeout):
+    if timeout is not None:
+        return timeout
+    return getattr(settings, 'CACHE_TTLS', {}).get(espace, ESPACES[espace])
+
+
+def _cle_version(espace):
+    if espace not in ESPACES:
+        raise KeyError(f'Espace de cache inconnu : {espace}')
+    return f'taxibe:{espace}:version'
+
+
+def _nouvelle_version():
+    # Horodatage (ms) : une version recréée après éviction ne retombe jamais sur une ancienne
+    return int(time.time() * 1000)
+
+
+def version(espace):
+    """Version courante de l'espace (créée au premier accès)."""
+    cle_version = _cle_version(espace)
+    valeur = cache.get(cle_version)
+    if valeur is None:
+        cache.add(cle_version, _nouvelle_version(), None)
+        valeur = cache.get(cle_version)
+    return valeur
+
+
+def prefixe(espace):
+    """Préfixe des clés de l'espace à sa version courante (une lecture du cache)."""
+    return f'taxibe:{espace}:v{version(espace)}'
+
+
+def cle(espace, *parties):
+    return ':'.join([prefixe(espace), *map(str, parties)])
+
+
+def invalider(*espaces):
+    """Rend obsolètes toutes les clés des espaces donnés."""
+    for espace in espaces:
+        cle_version = _cle_version(espace)
+        try:
+            cache.incr(cle_version)
+        except ValueError:
+            cache.set(cle_version, _nouvelle_version(), None)
+
+
+def supprimer(espace, *liste_parties):
+    """Supprime des clés précises : supprimer('utilisateurs', ('stats', 3), ...)."""
+    p = prefixe(espace)
+    cache.delete_many([':'.join([p, *map(str, parties)]) for parties in liste_parties])
+
+
+# ========== LECTURE PROTÉGÉE ==========
+
+def _calculer(k, calcul, ttl):
+    try:
+        valeur = calcul()
+        if ttl is None:
+            cache.set(k, (valeur, None), None)
+        else:
+            cache.set(k, (valeur, time.time() + ttl), ttl + max(ttl // 2, 1))
+        return valeur
+    finally:
+        cache.delete(f'{k}:verrou')
+
+
+def obtenir(espace, parties, calcul, timeout=None):
+    """
+    Valeur de `parties` dans l'espace, calculée par `calcul()` si absente
+    ou périmée (timeout : secondes de fraîcheur, None = durée de l'espace).
+    """
+    ttl = _ttl(espace, timeout)
+    k = cle(espace, *parties)
+    entree = cache.get(k)
+    if entree is not None:
+        valeur, frais_jusqua = entree
+        if frais_jusqua is None or time.time() < frais_jusqua:
+            return valeur
+        if not cache.add(f'{k}:verrou', 1, VERROU_TTL):
+            return valeur  # déjà en cours de recalcul ailleurs
+        return _calculer(k, calcul, ttl)
+
+    if cache.add(f'{k}:verrou', 1, VERROU_TTL):
+        return _calculer(k, calcul, ttl)
+    fin = time.monotonic() + ATTENTE_MAX
+    while time.monotonic() < fin:
+        time.sleep(ATTENTE_PAS)
+        entree = cache.get(k)
+        if entree is not None:
+            return entree[0]
+    return calcul()
+
+
+class _NonCachable(Exception):
+    def __init__(self, reponse):
+        self.reponse = reponse
+
+
+def en_cache(espace, timeout=None):
+    """
+    Décorateur de vue GET (sous @api_view) : réponses 200 gardées dans
+    l'espace, par vue, arguments d'URL et paramètres de requête.
+    """
+    def decorateur(vue):
+        @functools.wraps(vue)
+        def enveloppe(request, *args, **kwargs):
+            if request.method != 'GET':
+                return vue(request, *args, **kwargs)
+            requete = '&'.join(
+                f'{nom}={valeur}' for nom, valeurs in sorted(request.query_params.lists()) for valeur in valeurs
+            )
+            parties = (
+                vue.__name__,
+                *(f'{nom}={valeur}' for nom, valeur in sorted(kwargs.items())),
+                hashlib.md5(requete.encode()).hexdigest(),
+            )
+
+            def calcul():
+                reponse = vue(request, *args, **kwargs)
+                if reponse.status_code != 200:
+                    raise _NonCachable(reponse)
+                return reponse.data
+
+            try:
+                return Response(obtenir(espace, parties, calcul, timeout))
+            except _NonCachable as e:
+                return e.reponse
+        return enveloppe
+    return decorateur
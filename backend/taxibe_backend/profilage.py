@@ -0,0 +1,252 @@
+# taxibe_backend/profilage.py
+"""
+Profilage des requêtes HTTP.
+
+ProfilageMiddleware mesure pour chaque requête le nombre et la durée des
+requêtes SQL (connection.execute_wrapper, actif même sans DEBUG), le temps
+de la vue (sérialisation comprise), le temps de rendu de la réponse (JSON
+DRF) et la durée totale. Les mesures partent dans l'en-tête Server-Timing
+(onglet Réseau du navigateur) et sont agrégées par route dans des
+histogrammes en mémoire, exposés au format texte Prometheus sur
+/api/metrics/ (METRICS_TOKEN ou compte staff).
+
+Les histogrammes sont propres à chaque processus : avec plusieurs workers,
+un scrape ne voit que celui qui lui répond (exposer chaque worker comme
+une cible distincte pour des chiffres complets).
+"""
+import hmac
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+# Bornes des histogrammes (secondes ; nombre de requêtes SQL)
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BORNES_SQL = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Méthodes gardées telles quelles en étiquette ; les autres (choisies par le client) deviennent 'other'
+METHODES = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+METRIQUES = {
+    'taxibe_http_request_duration_seconds': ('Durée totale des requêtes HTTP', BORNES_DUREE),
+    'taxibe_http_db_duration_seconds': ('Temps passé en SQL par requête HTTP', BORNES_DUREE),
+    'taxibe_http_db_queries': ('Requêtes SQL par requête HTTP', BORNES_SQL),
+    'taxibe_http_render_duration_seconds': ('Temps de rendu de la réponse', BORNES_DUREE),
+}
+
+
+def _param(name, default):
+    return getattr(settings, name, default)
+
+
+# ========== HISTOGRAMMES ==========
+
+class Histogramme:
+    """Histogramme cumulatif façon Prometheus (le = borne supérieure incluse)."""
+
+    __slots__ = ('bornes', 'comptes', 'somme', 'total')
+
+    def __init__(self, bornes):
+        self.bornes = bornes
+        self.comptes = [0] * len(bornes)
+        self.somme = 0.0
+        self.total = 0
+
+    def observer(self, valeur):
+        for i, borne in enumerate(self.bornes):
+            if valeur <= borne:
+                self.comptes[i] += 1
+                break
+        self.somme += valeur
+        self.total += 1
+
+    def cumul(self):
+        """[(borne, nombre d'observations <= borne)]"""
+        resultat, n = [], 0
+        for borne, compte in zip(self.bornes, self.comptes):
+            n += compte
+            resultat.append((borne, n))
+        return resultat
+
+
+class Registre:
+    """Histogrammes par (métrique, route, méthode) et réponses par code HTTP."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histogrammes = {}
+        self.reponses = {}
+
+    def enregistrer(self, route, methode, code, mesures):
+        with self._lock:
+            for nom, valeur in mesures.items():
+                cle = (nom, route, methode)
+                histogramme = self.histogrammes.get(cle)
+                if histogramme is None:
+                    histogramme = self.histogrammes[cle] = Histogramme(METRIQUES[nom][1])
+                histogramme.observer(valeur)
+            cle = (route, methode, code)
+            self.reponses[cle] = self.reponses.get(cle, 0) + 1
+
+    def vider(self):
+        with self._lock:
+            self.histogrammes.clear()
+            self.reponses.clear()
+
+    def exporter(self):
+        """Texte d'exposition Prometheus (version 0.0.4)."""
+        with self._lock:
+            histogrammes = {
+                cle: (h.cumul(), h.somme, h.total) for cle, h in self.histogrammes.items()
+            }
+            reponses = dict(self.reponses)
+
+        lignes = []
+        for nom, (aide, _) in METRIQUES.items():
+            lignes.append(f'# HELP {nom} {aide}')
+            lignes.append(f'# TYPE {nom} histogram')
+            for (metrique, route, methode), (cumul, somme, total) in sorted(histogrammes.items()):
+                if metrique != nom:
+                    continue
+                etiquettes = f'route="{_echapper(route)}",method="{methode}"'
+                for borne, n in cumul:
+                    lignes.append(f'{nom}_bucket{{{etiquettes},le="{borne}"}} {n}')
+                lignes.append(f'{nom}_bucket{{{etiquettes},le="+Inf"}} {total}')
+                lignes.append(f'{nom}_sum{{{etiquettes}}} {somme:.6f}')
+                lignes.append(f'{nom}_count{{{etiquettes}}} {total}')
+
+        lignes.append('# HELP taxibe_http_responses_total Réponses HTTP par route et code')
+        lignes.append('# TYPE taxibe_http_responses_total counter')
+        for (route, methode, code), n in sorted(reponses.items()):
+            lignes.append(
+                f'taxibe_http_responses_total{{route="{_echapper(route)}",method="{methode}",code="{code}"}} {n}'
+            )
+        return '\n'.join(lignes) + '\n'
+
+
+def _echapper(valeur):
+    return valeur.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registre = Registre()
+
+
+# ========== MIDDLEWARE ==========
+
+class _Mesure:
+    __slots__ = ('requetes_sql', 'duree_sql', 'debut_rendu')
+
+    def __init__(self):
+        self.requetes_sql = 0
+        self.duree_sql = 0.0
+        self.debut_rendu = None
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree_sql += time.perf_counter() - debut
+            self.requetes_sql += 1
+
+
+def _route(request):
+    """Motif d'URL de la vue (cardinalité bornée), pas le chemin réel."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'non_resolue'
+    return '/' + match.route.replace('^', '').replace('$', '')
+
+
+def _methode(request):
+    return request.method if request.method in METHODES else 'other'
+
+
+def _ms(secondes):
+    return f'{secondes * 1000:.1f}'
+
+
+class ProfilageMiddleware:
+    """À placer en tête de MIDDLEWARE pour que la durée totale couvre tout le traitement."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _param('PROFILAGE_ACTIF', True):
+            return self.get_response(request)
+
+        mesure = _Mesure()
+        request._profilage = mesure
+        debut = time.perf_counter()
+        with ExitStack() as pile:
+            for connexion in connections.all():
+                pile.enter_context(connexion.execute_wrapper(mesure))
+            response = self.get_response(request)
+        fin = time.perf_counter()
+
+        total = fin - debut
+        rendu = fin - mesure.debut_rendu if mesure.debut_rendu is not None else 0.0
+        vue = max(total - rendu - mesure.duree_sql, 0.0)
+
+        if _param('SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join([
+                f'sql;dur={_ms(mesure.duree_sql)};desc="{mesure.requetes_sql} SQL"',  # en-tête ASCII
+                f'vue;dur={_ms(vue)}',
+                f'rendu;dur={_ms(rendu)}',
+                f'total;dur={_ms(total)}',
+            ])
+
+        route = _route(request)
+        registre.enregistrer(route, _methode(request), response.status_code, {
+            'taxibe_http_request_duration_seconds': total,
+            'taxibe_http_db_duration_seconds': mesure.duree_sql,
+            'taxibe_http_db_queries': mesure.requetes_sql,
+            'taxibe_http_render_duration_seconds': rendu,
+        })
+
+        if total >= _param('PROFILAGE_SEUIL_LENT', 1.0):
+            logger.warning(
+                'Requête lente %s %s (%s) : %s ms, %d requêtes SQL (%s ms)',
+                request.method, request.path, route, _ms(total), mesure.requetes_sql, _ms(mesure.duree_sql),
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # Appelé juste avant response.render() (réponses DRF comprises)
+        mesure = getattr(request, '_profilage', None)
+        if mesure is not None:
+            mesure.debut_rendu = time.perf_counter()
+        return response
+
+
+# ========== EXPOSITION ==========
+
+def _autorise(request):
+    jeton = _param('METRICS_TOKEN', '')
+    entete = request.META.get('HTTP_AUTHORIZATION', '')
+    if jeton and entete.startswith('Bearer ') and hmac.compare_digest(entete[7:].strip(), jeton):
+        return True
+    if getattr(request, 'user', None) is not None and request.user.is_staff:
+        return True  # session admin Django
+    if entete.startswith('Bearer '):
+        from authentification.authentication import JWTAuthentificationTaxibe
+        try:
+            resultat = JWTAuthentificationTaxibe().authenticate(request)
+        except Exception:
+            return False
+        return bool(resultat and resultat[0].is_staff)
+    return False
+
+
+def metriques(request):
+    """GET /api/metrics/ : histogrammes par route au format Prometheus."""
+    if not _autorise(request):
+        return HttpResponse('Accès refusé\n', status=403, content_type='text/plain; charset=utf-8')
+    return HttpResponse(registre.exporter(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -39,12 +39,14 @@ INSTALLED_APPS = [
     'transport',
     'interaction',
     'utilisateur',
+    'authentification',
 ]
 
 # ------------------------------------------------
 # ⚙️ Middleware
 # ------------------------------------------------
 MIDDLEWARE = [
+    'taxibe_backend.profilage.ProfilageMiddleware',  # 📈 en premier : mesure la requête entière
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # 🔥 Important : avant CommonMiddleware
@@ -94,7 +96,7 @@ DATABASES = {
 # ------------------------------------------------
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentification.authentication.JWTAuthentificationTaxibe',
     ),
     # Lecture publique, écriture sécurisée
     'DEFAULT_PERMISSION_CLASSES': (
@@ -132,6 +134,118 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'    # pour la collecte en prod
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'           # stockage des images uploads
 
+# ------------------------------------------------
+# 🗄️ Cache (espaces versionnés : taxibe_backend/caches.py)
+# ------------------------------------------------
+# Mémoire locale par défaut (tests, développement, un seul processus) ;
+# CACHE_URL=redis://hote:6379/0 en production pour partager le cache et
+# ses invalidations entre les processus (paquet redis, dans requirements.txt).
+CACHE_URL = os.getenv('CACHE_URL', '')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'taxibe',
+            'OPTIONS': {'MAX_ENTRIES': 20000},  # un tableau de passages par arrêt
+        }
+    }
+CACHE_TTLS = {}                   # fraîcheur par espace (s), ex. {'reseau': 3600} ; défauts dans caches.ESPACES
+
+# ------------------------------------------------
+# 📈 Profilage et journaux
+# ------------------------------------------------
+PROFILAGE_ACTIF = True            # SQL / vue / rendu par requête (taxibe_backend/profilage.py)
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'True') == 'True'  # en-tête Server-Timing des réponses
+PROFILAGE_SEUIL_LENT = 1.0        # requêtes journalisées comme lentes au-delà (s)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # jeton Bearer du scrape Prometheus de /api/metrics/
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name} : {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        app: {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False}
+        for app in ('taxibe_backend', 'authentification', 'utilisateur', 'localisation', 'transport', 'interaction')
+    },
+}
+
+# ------------------------------------------------
+# 🚌 Suivi temps réel des bus
+# ------------------------------------------------
+LIVE_POSITION_MAX_AGE = int(os.getenv('LIVE_POSITION_MAX_AGE', 300))  # secondes avant qu'une position soit périmée
+LIVE_TICK_SECONDS = int(os.getenv('LIVE_TICK_SECONDS', 5))            # intervalle min. entre deux recalculs
+LIVE_TICK_WORKERS = 1                                                 # recalcul dans un thread dédié (0 : sur place)
+LIVE_BOARD_TTL = int(os.getenv('LIVE_BOARD_TTL', 30))                 # durée de vie des tableaux de passage
+LIVE_BOARD_SIZE = 10                                                  # passages affichés par arrêt
+LIVE_BOARD_HORIZON_MINUTES = 60
+LIVE_BUS_SPEED_KMH = float(os.getenv('LIVE_BUS_SPEED_KMH', 18))        # vitesse commerciale moyenne
+LIVE_ROUTE_TOLERANCE = 1000                                           # mètres hors tracé tolérés
+LIVE_GRID_CELL_SIZE = 250                                             # taille (m) des cases de l'index spatial
+LIVE_SYNC_SECONDS = 1                                                 # resynchronisation max. depuis la base
+LIVE_SYNC_BATCH = 1000                                                # positions lues par requête de synchronisation
+LIVE_CURSOR_OVERLAP = 50                                              # séquences relues derrière un curseur (commits tardifs)
+LIVE_GEOFENCE_RADIUS = 40                                             # entrée dans la zone d'un arrêt (m)
+LIVE_GEOFENCE_EXIT_RADIUS = 60                                        # sortie de la zone (hystérésis, m)
+
+# ------------------------------------------------
+# 📊 Statistiques de recherche
+# ------------------------------------------------
+SEARCH_SKETCH_CAPACITY = 200      # compteurs par résumé Space-Saving (top trajets / arrêts)
+SEARCH_SKETCH_DAYS = 31           # jours gardés en mémoire
+SEARCH_SKETCH_SYNC_SECONDS = 60   # rechargement depuis les agrégats journaliers
+HISTORY_BUFFER_SIZE = 200         # recherches par lot d'écriture de l'historique
+HISTORY_FLUSH_SECONDS = 2         # délai max. avant écriture d'un lot
+HISTORY_BUFFER_MAX = 10000        # recherches gardées au plus en attente (base indisponible)
+
+# ------------------------------------------------
+# 🔎 Recherche d'arrêts
+# ------------------------------------------------
+STOP_SEARCH_POPULARITY_WEIGHT = 4     # bonus max. d'un arrêt très recherché
+STOP_SEARCH_PROXIMITY_WEIGHT = 4      # bonus max. d'un arrêt tout proche (avec ?lat=&lng=)
+STOP_SEARCH_PROXIMITY_RADIUS = 1000   # distance (m) à laquelle le bonus de proximité est divisé par deux
+
+# ------------------------------------------------
+# 💬 Commentaires
+# ------------------------------------------------
+COMMENT_FEED_PAGE_SIZE = 20       # commentaires par page du fil d'un bus
+COMMENT_FEED_TTL = 300            # cache de la première page (invalidé à chaque écriture)
+
+# ------------------------------------------------
+# 🛡️ Modération
+# ------------------------------------------------
+REPUTATION_CONTRIBUTION_APPROUVEE = 0   # points par contribution approuvée (repris si elle ne l'est plus)
+REPUTATION_COMMENTAIRE_SUPPRIME = 0     # points (négatifs) par commentaire supprimé après signalement
+
+# ------------------------------------------------
+# 🔔 Notifications admin
+# ------------------------------------------------
+NOTIF_COUNTERS_TTL = 300          # compteurs en cache (ajustés à chaque écriture)
+NOTIF_LONGPOLL_MAX = 25           # attente max. d'une requête long-polling (s)
+NOTIF_LONGPOLL_INTERVAL = 1       # fréquence de relecture du cache pendant l'attente (s)
+NOTIF_LONGPOLL_WAITERS = 4        # attentes simultanées par processus (chacune occupe un worker)
+NOTIF_LONGPOLL_RETRY = 15         # délai (s) suggéré au client quand toutes les attentes sont prises
+
+# ------------------------------------------------
+# 👤 Profil utilisateur
+# ------------------------------------------------
+USER_STATS_TTL = 60               # compteurs d'activité par utilisateur (invalidés à chaque écriture)
+AUTH_USER_CACHE_TTL = 300         # utilisateur + profil des requêtes JWT (invalidés à chaque écriture)
+ADMIN_USERS_PAGE_SIZE = 50        # utilisateurs par page de la liste admin
+AVATAR_WORKERS = int(os.getenv("AVATAR_WORKERS", "2"))  # threads de génération des miniatures (0 : sur place)
+
 # ------------------------------------------------
 # 🌐 CORS
 # ------------------------------------------------
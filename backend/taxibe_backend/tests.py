@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from transport.tests import creer_reseau
+from .profilage import registre
+
+
+# ========== EN-TÊTE SERVER-TIMING ==========
+
+class ServerTimingTests(TestCase):
+    URL = '/api/transport/bus/'
+
+    @classmethod
+    def setUpTestData(cls):
+        creer_reseau()
+
+    def setUp(self):
+        cache.clear()
+        registre.vider()
+
+    def test_entete_et_histogrammes(self):
+        reponse = self.client.get(self.URL)
+        self.assertEqual(reponse.status_code, 200)
+        mesures = dict(partie.split(';', 1) for partie in reponse['Server-Timing'].split(', '))
+        self.assertEqual(list(mesures), ['sql', 'vue', 'rendu', 'total'])
+        self.assertRegex(mesures['sql'], r'^dur=\d+\.\d;desc="[1-9]\d* SQL"$')
+
+        texte = registre.exporter()
+        self.assertIn('taxibe_http_request_duration_seconds_count{route="/api/transport/bus/",method="GET"} 1', texte)
+        self.assertIn('taxibe_http_responses_total{route="/api/transport/bus/",method="GET",code="200"} 1', texte)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_entete_desactivable(self):
+        reponse = self.client.get(self.URL)
+        self.assertNotIn('Server-Timing', reponse)
+        self.assertIn('route="/api/transport/bus/"', registre.exporter())
+
+    @override_settings(PROFILAGE_ACTIF=False)
+    def test_profilage_inactif(self):
+        self.assertNotIn('Server-Timing', self.client.get(self.URL))
+        self.assertNotIn('route="/api/transport/bus/"', registre.exporter())
+
+
+# ========== EXPOSITION DES MÉTRIQUES ==========
+
+@override_settings(METRICS_TOKEN='jeton-scrape')
+class MetriquesTests(TestCase):
+    URL = '/api/metrics/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        cls.alice = User.objects.create_user('alice', password='x')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, autorisation=None):
+        entetes = {'HTTP_AUTHORIZATION': autorisation} if autorisation else {}
+        return self.client.get(self.URL, **entetes)
+
+    def jwt(self, user):
+        return f'Bearer {RefreshToken.for_user(user).access_token}'
+
+    def test_refuse_sans_jeton_ni_staff(self):
+        self.assertEqual(self.get().status_code, 403)
+        self.assertEqual(self.get('Bearer mauvais').status_code, 403)
+        self.assertEqual(self.get(self.jwt(self.alice)).status_code, 403)
+        self.client.force_login(self.alice)
+        self.assertEqual(self.get().status_code, 403)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_jeton_vide_jamais_accepte(self):
+        self.assertEqual(self.get('Bearer ').status_code, 403)
+
+    def test_jeton_de_scrape(self):
+        reponse = self.get('Bearer jeton-scrape')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn('# TYPE taxibe_http_request_duration_seconds histogram', reponse.content.decode())
+
+    def test_compte_staff(self):
+        self.assertEqual(self.get(self.jwt(self.admin)).status_code, 200)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.get().status_code, 200)
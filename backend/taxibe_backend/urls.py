@@ -1,11 +1,14 @@
 # backend/taxibe_backend/urls.py (CORRIGÉ ET FONCTIONNEL)
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.conf.urls.static import static
 
+from taxibe_backend.profilage import metriques
+from utilisateur.avatars import servir_variante
+
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -26,10 +29,21 @@ urlpatterns = [
     path('api/auth/token/refresh/', csrf_exempt(TokenRefreshView.as_view()), name='token_refresh'),
     path('api/auth/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
 
+    # 📈 Métriques Prometheus (METRICS_TOKEN ou compte staff)
+    path('api/metrics/', metriques, name='metriques'),
+
     # UI DRF login (pour tester via navigateur)
     path('api-auth/', include('rest_framework.urls')),
 ]
 
+# 🖼️ Miniatures d'avatars : noms dérivés du contenu, cache HTTP d'un an
+urlpatterns += [
+    re_path(
+        rf"^{settings.MEDIA_URL.lstrip('/')}avatars/v/(?P<path>[\w.-]+)$",
+        servir_variante, name='avatar_variante',
+    ),
+]
+
 # ✅ IMPORTANT: Servir les fichiers media (avatars, images) en développement
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,6 +1,6 @@
 # transport/admin.py
 from django.contrib import admin
-from .models import Bus, Trajet, TrajetArret
+from .models import Bus, Trajet, TrajetArret, PassageArret
 
 @admin.register(Bus)
 class BusAdmin(admin.ModelAdmin):
@@ -18,4 +18,18 @@ class TrajetAdmin(admin.ModelAdmin):
 class TrajetArretAdmin(admin.ModelAdmin):
     list_display = ['trajetRef', 'arretRef', 'ordrePassage', 'direction']
     list_filter = ['direction']
-    ordering = ['trajetRef', 'ordrePassage']
\ No newline at end of file
+    ordering = ['trajetRef', 'ordrePassage']
+
+@admin.register(PassageArret)
+class PassageArretAdmin(admin.ModelAdmin):
+    list_display = ['bus', 'arret', 'type', 'date']
+    list_filter = ['type', 'date']
+    date_hierarchy = 'date'
+    ordering = ['-date']
+
+    # Journal en ajout seul : alimenté uniquement par le géofencing
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,5 @@ class TransportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transport'
 
+    def ready(self):
+        from . import signals  # noqa: F401
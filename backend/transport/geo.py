@@ -0,0 +1,114 @@
+# transport/geo.py
+"""
+Fonctions géographiques partagées (distances entre points GPS, index spatial).
+"""
+from math import radians, sin, cos, sqrt, atan2, isfinite
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Formule de Haversine - Distance en mètres"""
+    R = 6371000
+    lat1_rad, lat2_rad = radians(lat1), radians(lat2)
+    delta_lat, delta_lon = radians(lat2 - lat1), radians(lon2 - lon1)
+    a = sin(delta_lat / 2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(delta_lon / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    return R * c
+
+
+# Longueur d'un degré de latitude (mètres)
+METRES_PAR_DEGRE = 111320
+
+
+def point_valide(lat, lng):
+    """Latitude et longitude finies, dans [-90, 90] et [-180, 180] (NaN et infini refusés)."""
+    return isfinite(lat) and isfinite(lng) and -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+class GridIndex:
+    """
+    Index spatial en grille pour des points mobiles.
+
+    Chaque point est rangé dans une case de `cell_size` mètres ; déplacer un
+    point coûte O(1) et une recherche ne parcourt que les cases qui
+    recouvrent la zone demandée (O(k) pour k points proches).
+    """
+
+    def __init__(self, cell_size=250):
+        self.cell_deg = cell_size / METRES_PAR_DEGRE
+        self._cells = {}
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def _cell(self, lat, lng):
+        return (int(lat // self.cell_deg), int(lng // self.cell_deg))
+
+    def get(self, key):
+        """(lat, lng) d'un point, ou None."""
+        point = self._points.get(key)
+        return point[:2] if point else None
+
+    def insert(self, key, lat, lng):
+        """Ajoute ou déplace un point ; un point invalide (NaN, infini, hors du globe) est retiré."""
+        if not point_valide(lat, lng):
+            self.remove(key)
+            return
+        cell = self._cell(lat, lng)
+        previous = self._points.get(key)
+        if previous and previous[2] != cell:
+            self._discard(key, previous[2])
+        self._points[key] = (lat, lng, cell)
+        self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        previous = self._points.pop(key, None)
+        if previous:
+            self._discard(key, previous[2])
+
+    def _discard(self, key, cell):
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+
+    def _scan(self, south, west, north, east):
+        (i0, j0), (i1, j1) = self._cell(south, west), self._cell(north, east)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+            # Zone très large (carte dézoomée) : moins de cases occupées que de cases couvertes
+            cells = [c for c in self._cells if i0 <= c[0] <= i1 and j0 <= c[1] <= j1]
+        else:
+            cells = [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+        for cell in cells:
+            for key in self._cells.get(cell, ()):
+                yield key, self._points[key]
+
+    def in_bbox(self, south, west, north, east):
+        """Clés des points situés dans le rectangle."""
+        if not (point_valide(south, west) and point_valide(north, east)):
+            return []
+        return [
+            key for key, (lat, lng, _) in self._scan(south, west, north, east)
+            if south <= lat <= north and west <= lng <= east
+        ]
+
+    def near(self, lat, lng, radius):
+        """[(clé, distance en mètres)] des points à moins de `radius` mètres, triés."""
+        if not point_valide(lat, lng) or not isfinite(radius) or radius < 0:
+            return []
+        dlat = radius / METRES_PAR_DEGRE
+        dlng = radius / (METRES_PAR_DEGRE * max(cos(radians(lat)), 0.01))
+        # Zone de recherche ramenée aux bornes du globe
+        south, north = max(lat - dlat, -90), min(lat + dlat, 90)
+        west, east = max(lng - dlng, -180), min(lng + dlng, 180)
+        result = []
+        for key, (plat, plng, _) in self._scan(south, west, north, east):
+            distance = calculate_distance(lat, lng, plat, plng)
+            if distance <= radius:
+                result.append((key, distance))
+        result.sort(key=lambda x: x[1])
+        return result
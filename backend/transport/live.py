@@ -0,0 +1,557 @@
+# transport/live.py
+"""
+Suivi temps réel des bus.
+
+- Stockage en mémoire de la dernière position connue de chaque bus
+- Ingestion des positions GPS (historique PositionBus + Bus.current_*)
+- Tableau des prochains passages par arrêt, recalculé en bloc à chaque
+  "tick" de positions, dans un thread à part, et servi depuis le cache
+  (aucun calcul pendant les requêtes, ingestion comprise)
+- Réseau (trajets et arrêts) gardé en mémoire tant que la version de
+  l'espace de cache 'reseau' ne change pas (taxibe_backend/caches.py)
+- Géofencing : journal des arrivées / départs des bus aux arrêts
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, F, Max, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from taxibe_backend import caches
+from .geo import GridIndex, calculate_distance
+from .models import Bus, PassageArret, PositionBus, TrajetArret
+
+logger = logging.getLogger(__name__)
+
+
+def _param(name, default):
+    return getattr(settings, name, default)
+
+
+# ========== STOCKAGE DES POSITIONS ==========
+
+class LivePositionStore:
+    """
+    Dernière position connue de chaque bus (mémoire du processus).
+
+    Chaque position porte sa séquence d'ingestion (id de la PositionBus).
+    Le store se resynchronise depuis la base avec un curseur sur cette
+    séquence, ce qui lui fait voir aussi les positions reçues par les
+    autres processus sans relire tout l'historique.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._index = GridIndex(_param('LIVE_GRID_CELL_SIZE', 250))
+        self._cursor = None
+        self._last_sync = 0.0
+
+    def update(self, bus_id, latitude, longitude, timestamp, seq):
+        with self._lock:
+            previous = self._positions.get(bus_id)
+            if previous and previous['seq'] >= seq:
+                return False
+            if previous is None:
+                precedente = None
+            elif (previous['latitude'], previous['longitude']) == (latitude, longitude):
+                precedente = previous['precedente']  # bus à l'arrêt : on garde le dernier mouvement
+            else:
+                precedente = (previous['latitude'], previous['longitude'])
+            self._positions[bus_id] = {
+                'bus_id': bus_id,
+                'latitude': latitude,
+                'longitude': longitude,
+                'timestamp': timestamp,
+                'seq': seq,
+                # Position précédente : sert à déduire le sens de circulation
+                'precedente': precedente,
+            }
+            self._index.insert(bus_id, latitude, longitude)
+            return True
+
+    def _limite_fraicheur(self):
+        return timezone.now() - timedelta(seconds=_param('LIVE_POSITION_MAX_AGE', 300))
+
+    def snapshot(self):
+        """Positions encore fraîches (LIVE_POSITION_MAX_AGE secondes)."""
+        self.sync()
+        limit = self._limite_fraicheur()
+        with self._lock:
+            return {
+                bus_id: dict(fix)
+                for bus_id, fix in self._positions.items()
+                if fix['timestamp'] >= limit
+            }
+
+    def near(self, lat, lng, radius):
+        """Positions fraîches à moins de `radius` mètres, triées par distance."""
+        self.sync()
+        limit = self._limite_fraicheur()
+        with self._lock:
+            return [
+                dict(self._positions[bus_id], distance=distance)
+                for bus_id, distance in self._index.near(lat, lng, radius)
+                if self._positions[bus_id]['timestamp'] >= limit
+            ]
+
+    def in_bbox(self, south, west, north, east):
+        """Positions fraîches dans le rectangle (vue de la carte)."""
+        self.sync()
+        limit = self._limite_fraicheur()
+        with self._lock:
+            return [
+                dict(self._positions[bus_id])
+                for bus_id in self._index.in_bbox(south, west, north, east)
+                if self._positions[bus_id]['timestamp'] >= limit
+            ]
+
+    def remove(self, bus_id):
+        with self._lock:
+            self._positions.pop(bus_id, None)
+            self._index.remove(bus_id)
+
+    def clear(self):
+        with self._lock:
+            self._positions.clear()
+            self._index = GridIndex(_param('LIVE_GRID_CELL_SIZE', 250))
+            self._cursor = None
+            self._last_sync = 0.0
+
+    def sync(self, force=False):
+        """
+        Applique les positions ingérées depuis le dernier curseur, par lots.
+
+        Les ids deviennent visibles dans l'ordre des commits, pas dans celui
+        de leur attribution : une position dont l'id est inférieur au curseur
+        peut apparaître après coup. Chaque synchronisation relit donc les
+        LIVE_CURSOR_OVERLAP dernières séquences (update() ignore les doublons).
+        """
+        maintenant = time.monotonic()
+        if not force and maintenant - self._last_sync < _param('LIVE_SYNC_SECONDS', 1):
+            return
+        depuis_derniere = maintenant - self._last_sync
+        self._last_sync = maintenant
+
+        if self._cursor is None or depuis_derniere > _param('LIVE_POSITION_MAX_AGE', 300):
+            self._cursor = self._amorcer()
+            return
+
+        lot = _param('LIVE_SYNC_BATCH', 1000)
+        debut = max(self._cursor - _param('LIVE_CURSOR_OVERLAP', 50), 0)
+        while True:
+            rows = list(
+                PositionBus.objects
+                .filter(id__gt=debut)
+                .order_by('id')
+                .values_list('id', 'bus_id', 'latitude', 'longitude', 'timestamp')[:lot]
+            )
+            for seq, bus_id, lat, lng, ts in rows:
+                self.update(bus_id, lat, lng, ts, seq)
+            if rows:
+                debut = rows[-1][0]
+                self._cursor = max(self._cursor, debut)
+            if len(rows) < lot:
+                return
+
+    def _amorcer(self):
+        """
+        Premier accès (ou store resté inactif plus que LIVE_POSITION_MAX_AGE) :
+        relit en arrière depuis la tête du flux, par lots sur la clé primaire,
+        jusqu'aux positions périmées. Retourne le curseur (id de tête).
+        """
+        tete = PositionBus.objects.aggregate(tete=Max('id'))['tete'] or 0
+        limite = self._limite_fraicheur()
+        lot = _param('LIVE_SYNC_BATCH', 1000)
+        borne = tete + 1
+        while True:
+            rows = list(
+                PositionBus.objects
+                .filter(id__lt=borne)
+                .order_by('-id')
+                .values_list('id', 'bus_id', 'latitude', 'longitude', 'timestamp')[:lot]
+            )
+            for seq, bus_id, lat, lng, ts in reversed(rows):
+                if ts >= limite:
+                    self.update(bus_id, lat, lng, ts, seq)
+            if len(rows) < lot or rows[-1][4] < limite:
+                return tete
+            borne = rows[-1][0]
+
+
+store = LivePositionStore()
+
+
+# ========== RÉSEAU (séquences d'arrêts) ==========
+
+_reseau = None
+_reseau_version = None
+_reseau_lock = threading.Lock()
+
+
+def invalider_reseau():
+    """À appeler (après le commit) quand Bus / Trajet / TrajetArret / Arret changent, pour tous les processus."""
+    global _reseau
+    with _reseau_lock:
+        _reseau = None
+    caches.invalider('reseau')
+
+
+def get_reseau():
+    """
+    Bus et séquence ordonnée des arrêts de chaque trajet (deux requêtes, puis
+    mémoire) ; reconstruit si la version partagée de l'espace 'reseau' a changé.
+    """
+    global _reseau, _reseau_version
+    version = caches.version('reseau')
+    with _reseau_lock:
+        if _reseau is not None and _reseau_version == version:
+            return _reseau
+
+    rows = (
+        TrajetArret.objects
+        .order_by('trajetRef_id', 'ordrePassage')
+        .values_list(
+            'trajetRef_id', 'trajetRef__typeTrajet',
+            'trajetRef__busRef_id',
+            'arretRef_id', 'arretRef__nomArret', 'arretRef__latitude', 'arretRef__longitude',
+        )
+    )
+
+    bus = {
+        b['id']: {'numero': b['numeroBus'], 'status': b['status']}
+        for b in Bus.objects.values('id', 'numeroBus', 'status')
+    }
+    trajets, trajets_par_bus, arrets, arrets_par_bus = {}, {}, {}, {}
+    index_arrets = GridIndex(_param('LIVE_GRID_CELL_SIZE', 250))
+    for trajet_id, type_trajet, bus_id, arret_id, nom, lat, lng in rows:
+        trajet = trajets.get(trajet_id)
+        if trajet is None:
+            trajet = trajets[trajet_id] = {
+                'id': trajet_id, 'type': type_trajet, 'bus_id': bus_id,
+                'arrets': [], 'cumul': [],
+            }
+            trajets_par_bus.setdefault(bus_id, []).append(trajet_id)
+
+        # Distance cumulée depuis le premier arrêt du trajet
+        if trajet['arrets']:
+            prev = trajet['arrets'][-1]
+            cumul = trajet['cumul'][-1] + calculate_distance(prev['latitude'], prev['longitude'], lat, lng)
+        else:
+            cumul = 0.0
+        trajet['arrets'].append({'id': arret_id, 'nom': nom, 'latitude': lat, 'longitude': lng})
+        trajet['cumul'].append(cumul)
+        arrets[arret_id] = nom
+        arrets_par_bus.setdefault(bus_id, set()).add(arret_id)
+        index_arrets.insert(arret_id, lat, lng)
+
+    reseau = {
+        'trajets': trajets,
+        'trajets_par_bus': trajets_par_bus,
+        'bus': bus,
+        'arrets': arrets,
+        'arrets_par_bus': arrets_par_bus,
+        'index_arrets': index_arrets,
+    }
+    with _reseau_lock:
+        _reseau, _reseau_version = reseau, version
+    return reseau
+
+
+# ========== PRÉDICTION DES PASSAGES ==========
+
+def _progression(trajet, lat, lng):
+    """
+    Projette une position sur le trajet.
+
+    Retourne (index du prochain arrêt, distance jusqu'à cet arrêt,
+    distance déjà parcourue, écart au tracé).
+    """
+    arrets, cumul = trajet['arrets'], trajet['cumul']
+    distances = [calculate_distance(lat, lng, a['latitude'], a['longitude']) for a in arrets]
+    ecart = min(distances)
+    k = distances.index(ecart)
+
+    # Plus proche du suivant que l'arrêt k ne l'est : le bus a dépassé l'arrêt k
+    if k + 1 < len(arrets) and distances[k + 1] < cumul[k + 1] - cumul[k]:
+        k += 1
+
+    parcouru = max(cumul[k] - distances[k], 0.0)
+    return k, distances[k], parcouru, ecart
+
+
+def _trajets_probables(reseau, fix):
+    """Trajets du bus compatibles avec sa position (et son sens si connu)."""
+    tolerance = _param('LIVE_ROUTE_TOLERANCE', 1000)
+    candidats = []
+    for trajet_id in reseau['trajets_par_bus'].get(fix['bus_id'], []):
+        trajet = reseau['trajets'][trajet_id]
+        k, restant, parcouru, ecart = _progression(trajet, fix['latitude'], fix['longitude'])
+        if ecart > tolerance:
+            continue
+        avance = None
+        if fix['precedente']:
+            _, _, parcouru_prec, _ = _progression(trajet, *fix['precedente'])
+            avance = parcouru - parcouru_prec
+        candidats.append((trajet, k, restant, avance))
+
+    # Si le mouvement permet de trancher, on ne garde que le(s) sens qui progresse(nt)
+    dans_le_sens = [c for c in candidats if c[3] is not None and c[3] >= 0]
+    return dans_le_sens or candidats
+
+
+def calculer_passages(positions=None, now=None):
+    """Calcule les prochains passages pour tous les arrêts du réseau."""
+    from .views import generate_color_from_numero
+
+    reseau = get_reseau()
+    positions = store.snapshot() if positions is None else positions
+    now = now or timezone.now()
+    vitesse = _param('LIVE_BUS_SPEED_KMH', 18) / 3.6  # m/s
+    horizon = _param('LIVE_BOARD_HORIZON_MINUTES', 60) * 60
+
+    passages = {arret_id: [] for arret_id in reseau['arrets']}
+
+    for bus_id, fix in positions.items():
+        infos_bus = reseau['bus'].get(bus_id)
+        if not infos_bus or infos_bus['status'] != 'Actif':
+            continue
+
+        for trajet, k, restant, _ in _trajets_probables(reseau, fix):
+            arrets, cumul = trajet['arrets'], trajet['cumul']
+            for j in range(k, len(arrets)):
+                distance = restant + cumul[j] - cumul[k]
+                attente = distance / vitesse
+                if attente > horizon:
+                    break
+                passages[arrets[j]['id']].append({
+                    'bus': {
+                        'id': bus_id,
+                        'numero': infos_bus['numero'],
+                        'couleur': generate_color_from_numero(infos_bus['numero']),
+                    },
+                    'trajet': {
+                        'id': trajet['id'],
+                        'type': trajet['type'],
+                        'terminus': arrets[-1]['nom'],
+                    },
+                    'distance': round(distance),
+                    'attente_minutes': round(attente / 60, 1),
+                    'arrivee_prevue': (now + timedelta(seconds=attente)).isoformat(),
+                    'position_date': fix['timestamp'].isoformat(),
+                })
+
+    taille = _param('LIVE_BOARD_SIZE', 10)
+    boards = {}
+    for arret_id, liste in passages.items():
+        liste.sort(key=lambda p: p['distance'])
+        boards[arret_id] = {
+            'arret': {'id': arret_id, 'nom': reseau['arrets'][arret_id]},
+            'mis_a_jour': now.isoformat(),
+            'departures': liste[:taille],
+        }
+    return boards
+
+
+# ========== TICK & CACHE ==========
+
+_tick_lock = threading.Lock()
+_dernier_tick = 0.0
+
+
+def board_cache_key(arret_id, prefixe=None):
+    return f"{prefixe or caches.prefixe('temps_reel')}:departures:{arret_id}"
+
+
+def tick(force=False):
+    """
+    Recalcule en bloc les tableaux de passage de tous les arrêts.
+
+    Limité à un calcul toutes les LIVE_TICK_SECONDS secondes ; un seul
+    calcul à la fois (les autres requêtes d'ingestion ne l'attendent pas).
+    """
+    global _dernier_tick
+    if not force and time.monotonic() - _dernier_tick < _param('LIVE_TICK_SECONDS', 5):
+        return False
+    if not _tick_lock.acquire(blocking=False):
+        return False
+    try:
+        boards = calculer_passages()
+        prefixe = caches.prefixe('temps_reel')
+        cache.set_many(
+            {board_cache_key(arret_id, prefixe): board for arret_id, board in boards.items()},
+            timeout=_param('LIVE_BOARD_TTL', 30),
+        )
+        _dernier_tick = time.monotonic()
+        return True
+    finally:
+        _tick_lock.release()
+
+
+_tick_pool = None
+_tick_en_attente = False
+_planification_lock = threading.Lock()
+
+
+def _tick_de_fond():
+    global _tick_en_attente
+    try:
+        tick()
+    except Exception:
+        logger.exception('Erreur lors du recalcul des tableaux de passage')
+    finally:
+        _tick_en_attente = False
+
+
+def _tick_dans_le_pool():
+    try:
+        _tick_de_fond()
+    finally:
+        connection.close()  # connexion propre au thread du pool
+
+
+def planifier_tick():
+    """
+    Demande un tick hors de la requête d'ingestion, après le commit : dans
+    un thread dédié, ou sur place si LIVE_TICK_WORKERS = 0. Un seul tick en
+    attente à la fois ; les positions reçues entre-temps seront prises en
+    compte par celui-ci.
+    """
+    global _tick_pool, _tick_en_attente
+    if time.monotonic() - _dernier_tick < _param('LIVE_TICK_SECONDS', 5):
+        return
+    with _planification_lock:
+        if _tick_en_attente:
+            return
+        _tick_en_attente = True
+        if _tick_pool is None and _param('LIVE_TICK_WORKERS', 1) > 0:
+            _tick_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='live-tick')
+
+    def lancer():
+        if _param('LIVE_TICK_WORKERS', 1) > 0:
+            _tick_pool.submit(_tick_dans_le_pool)
+        else:
+            _tick_de_fond()
+    transaction.on_commit(lancer)
+
+
+def get_board(arret_id):
+    """Tableau précalculé d'un arrêt (None si absent ou expiré)."""
+    return cache.get(board_cache_key(arret_id))
+
+
+# ========== INGESTION ==========
+
+def positions_depuis(cursor, limit=500):
+    """
+    Flux incrémental : bus dont la position a changé après `cursor`.
+
+    Retourne (liste des bus, nouveau curseur, reste-t-il des changements).
+    Le nouveau curseur est la séquence du dernier bus renvoyé (pagination
+    par curseur).
+
+    Comme pour LivePositionStore.sync, les bus des LIVE_CURSOR_OVERLAP
+    séquences précédant le curseur sont renvoyés à nouveau : une position
+    dont l'id a été commité en retard n'est jamais sautée.
+    """
+    qs = Bus.objects.order_by('position_seq').values(
+        'id', 'numeroBus', 'current_latitude', 'current_longitude', 'position_date', 'position_seq',
+    )
+    rejoues = []
+    if cursor > 0:
+        debut = max(cursor - _param('LIVE_CURSOR_OVERLAP', 50), 0)
+        rejoues = list(qs.filter(position_seq__gt=debut, position_seq__lte=cursor))
+    nouveaux = list(qs.filter(position_seq__gt=cursor)[:limit])
+    nouveau = nouveaux[-1]['position_seq'] if nouveaux else cursor
+    return rejoues + nouveaux, nouveau, len(nouveaux) == limit
+
+
+def enregistrer_position(bus_id, latitude, longitude):
+    """Enregistre une position GPS et met à jour l'état temps réel."""
+    with transaction.atomic():
+        position = PositionBus.objects.create(bus_id=bus_id, latitude=latitude, longitude=longitude)
+        # position_seq n'avance que si le bus a réellement bougé, et ne recule
+        # jamais (deux positions du même bus commitées dans le désordre)
+        Bus.objects.filter(pk=bus_id).update(
+            position_seq=Case(
+                When(Q(current_latitude=latitude) & Q(current_longitude=longitude), then=F('position_seq')),
+                default=Greatest(F('position_seq'), Value(position.id)),
+            ),
+            current_latitude=latitude,
+            current_longitude=longitude,
+            position_date=position.timestamp,
+        )
+
+    store.update(bus_id, latitude, longitude, position.timestamp, position.id)
+    detecter_passages(bus_id, latitude, longitude, position.timestamp)
+    planifier_tick()
+    return position
+
+
+# ========== GÉOFENCING ==========
+
+def oublier_bus(bus_id):
+    """Retire un bus supprimé de l'état temps réel."""
+    store.remove(bus_id)
+    _arret_actuel.pop(bus_id, None)
+
+
+# bus_id -> arrêt dans le rayon duquel se trouve le bus (None entre deux arrêts).
+# Copie locale de Bus.arret_actuel, relue depuis la base au premier passage.
+_arret_actuel = {}
+
+
+def detecter_passages(bus_id, latitude, longitude, date):
+    """
+    Détecte l'entrée / la sortie du bus dans le rayon d'un arrêt de ses trajets.
+
+    Seuls les arrêts des cases voisines de l'index spatial sont examinés
+    (O(1) par position). Un rayon de sortie plus large que le rayon
+    d'entrée évite les oscillations dues au bruit GPS. Les transitions
+    sont écrites avec une mise à jour conditionnelle de Bus.arret_actuel :
+    si un autre processus est passé avant, l'état local est simplement
+    relu au prochain point.
+    """
+    reseau = get_reseau()
+    servis = reseau['arrets_par_bus'].get(bus_id)
+    if not servis:
+        return []
+
+    if bus_id not in _arret_actuel:
+        _arret_actuel[bus_id] = Bus.objects.filter(pk=bus_id).values_list('arret_actuel_id', flat=True).first()
+    actuel = _arret_actuel[bus_id]
+
+    nouveau = actuel
+    if actuel is not None:
+        point = reseau['index_arrets'].get(actuel)
+        sortie = _param('LIVE_GEOFENCE_EXIT_RADIUS', 60)
+        if actuel not in servis or point is None or calculate_distance(latitude, longitude, *point) > sortie:
+            nouveau = None
+
+    if nouveau is None:
+        for arret_id, _ in reseau['index_arrets'].near(latitude, longitude, _param('LIVE_GEOFENCE_RADIUS', 40)):
+            if arret_id in servis:
+                nouveau = arret_id
+                break
+
+    if nouveau == actuel:
+        return []
+
+    if not Bus.objects.filter(pk=bus_id, arret_actuel_id=actuel).update(arret_actuel_id=nouveau):
+        _arret_actuel.pop(bus_id, None)
+        return []
+    _arret_actuel[bus_id] = nouveau
+
+    evenements = []
+    if actuel is not None:
+        evenements.append(PassageArret(bus_id=bus_id, arret_id=actuel, type='depart', date=date))
+    if nouveau is not None:
+        evenements.append(PassageArret(bus_id=bus_id, arret_id=nouveau, type='arrivee', date=date))
+    return PassageArret.objects.bulk_create(evenements)
@@ -0,0 +1,370 @@
+# transport/management/commands/simulate_fleet.py
+"""
+Simulateur de flotte GPS et banc de charge de l'ingestion des positions.
+
+Fait rouler N bus SIM-* (copies des bus réels et de leurs trajets, créées
+pour l'occasion) sur les séquences d'arrêts réelles, à une vitesse
+réaliste avec du bruit GPS, et envoie leurs positions :
+- en interne (appel direct de transport.live.enregistrer_position)
+- ou en HTTP vers un serveur local (POST /api/transport/positions/)
+
+Affiche ensuite le débit, les percentiles de latence et la croissance
+de la base. Fonctionne hors ligne, sans aucun traceur réel. Les bus réels
+ne reçoivent aucune position ; les bus SIM-* sont supprimés à la fin avec
+tout ce qui a été écrit pour eux (positions, passages), sauf avec --keep.
+
+Les bus SIM-* ont le statut 'Simulation' : absents des lignes, des
+itinéraires et des tableaux de départs, et exclus des listes de bus.
+Refuse de tourner hors DEBUG sans --i-know-this-is-prod.
+
+Exemples :
+    python manage.py simulate_fleet --bus 50 --interval 5 --duration 120
+    python manage.py simulate_fleet --bus 200 --mode http --url http://127.0.0.1:8000 \\
+        --username admin --password secret --workers 16
+
+En mode http, le compte doit être staff (seuls les traceurs écrivent des positions).
+"""
+
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from transport.geo import METRES_PAR_DEGRE, calculate_distance
+from transport import live
+from transport.models import PREFIXE_SIMULATION, Bus, PositionBus, Trajet, TrajetArret
+
+
+class BusSimule:
+    """Un bus qui parcourt la polyligne de ses arrêts en aller-retour."""
+
+    def __init__(self, bus_id, points, vitesse, bruit, rng):
+        self.bus_id = bus_id
+        self.points = points
+        self.rng = rng
+        self.vitesse = vitesse * rng.uniform(0.7, 1.3)  # m/s, propre à chaque bus
+        self.bruit = bruit
+        self.cumul = [0.0]
+        for (lat1, lng1), (lat2, lng2) in zip(points, points[1:]):
+            self.cumul.append(self.cumul[-1] + calculate_distance(lat1, lng1, lat2, lng2))
+        self.longueur = self.cumul[-1]
+        self.distance = rng.uniform(0, self.longueur)  # départ à un endroit aléatoire
+        self.sens = 1
+        self.arret_jusqua = 0.0
+
+    def avancer(self, dt):
+        """Fait rouler le bus pendant dt secondes (avec arrêts aux stations)."""
+        if self.arret_jusqua > 0:
+            self.arret_jusqua = max(self.arret_jusqua - dt, 0.0)
+            return
+
+        vitesse = max(self.vitesse * self.rng.gauss(1.0, 0.15), 0.0)
+        precedent = self.distance
+        self.distance += self.sens * vitesse * dt
+
+        if self.distance >= self.longueur or self.distance <= 0:
+            # Terminus : demi-tour
+            self.distance = min(max(self.distance, 0.0), self.longueur)
+            self.sens = -self.sens
+            self.arret_jusqua = self.rng.uniform(30, 120)
+            return
+
+        # Arrêt intermédiaire franchi : temps d'arrêt de quelques secondes
+        bas, haut = sorted((precedent, self.distance))
+        if any(bas < c <= haut for c in self.cumul[1:-1]):
+            self.arret_jusqua = self.rng.uniform(10, 40)
+
+    def position(self):
+        """Position courante interpolée, bruitée comme un vrai GPS."""
+        i = 0
+        while i + 2 < len(self.cumul) and self.cumul[i + 1] < self.distance:
+            i += 1
+        segment = self.cumul[i + 1] - self.cumul[i] or 1.0
+        t = min(max((self.distance - self.cumul[i]) / segment, 0.0), 1.0)
+        (lat1, lng1), (lat2, lng2) = self.points[i], self.points[i + 1]
+        lat = lat1 + (lat2 - lat1) * t
+        lng = lng1 + (lng2 - lng1) * t
+
+        lat += self.rng.gauss(0, self.bruit) / METRES_PAR_DEGRE
+        lng += self.rng.gauss(0, self.bruit) / (METRES_PAR_DEGRE * math.cos(math.radians(lat)))
+        return round(lat, 6), round(lng, 6)
+
+
+def percentile(valeurs, p):
+    if not valeurs:
+        return 0.0
+    k = min(int(round(p / 100 * (len(valeurs) - 1))), len(valeurs) - 1)
+    return valeurs[k]
+
+
+class Command(BaseCommand):
+    help = "Simule une flotte de bus GPS et mesure la charge de l'ingestion des positions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bus', type=int, default=20, help='Nombre de bus simulés')
+        parser.add_argument('--interval', type=float, default=5.0, help='Secondes entre deux positions d\'un même bus')
+        parser.add_argument('--duration', type=float, default=60.0, help='Durée de la simulation (secondes)')
+        parser.add_argument('--speed', type=float, default=18.0, help='Vitesse moyenne (km/h)')
+        parser.add_argument('--noise', type=float, default=8.0, help='Bruit GPS (écart-type en mètres)')
+        parser.add_argument('--workers', type=int, default=4, help='Envois simultanés')
+        parser.add_argument('--mode', choices=['inprocess', 'http'], default='inprocess')
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Serveur cible (mode http)')
+        parser.add_argument('--token', help='Jeton JWT (mode http)')
+        parser.add_argument('--username', help='Compte staff pour obtenir un jeton (mode http)')
+        parser.add_argument('--password', help='Mot de passe pour obtenir un jeton (mode http)')
+        parser.add_argument('--seed', type=int, default=None, help='Graine aléatoire (simulation reproductible)')
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Conserve les bus SIM-* et leurs positions créés pour la simulation',
+        )
+        parser.add_argument(
+            '--i-know-this-is-prod',
+            action='store_true',
+            help='Autorise la simulation hors DEBUG (écrit dans la base réelle)',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        rng = random.Random(options['seed'])
+
+        if not settings.DEBUG and not options['i_know_this_is_prod']:
+            raise CommandError(
+                'DEBUG est désactivé : la simulation écrirait dans la base de production. '
+                'Relancer avec --i-know-this-is-prod pour confirmer.'
+            )
+        if options['bus'] < 1 or options['interval'] <= 0 or options['duration'] <= 0:
+            raise CommandError('--bus, --interval et --duration doivent être positifs')
+
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS('   TAXIBE - Simulation de flotte GPS'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+
+        trajets = self.charger_trajets()
+        if not trajets:
+            raise CommandError('Aucun trajet avec au moins 2 arrêts : rien à simuler')
+
+        envoyer = self.preparer_envoi()  # avant la création des bus SIM-* (jeton refusé : rien à nettoyer)
+        bus_simules, bus_crees = self.preparer_flotte(trajets, rng)
+
+        avant = self.taille_positions()
+        self.stdout.write(
+            f'\n🚌 {len(bus_simules)} bus, une position toutes les {options["interval"]}s '
+            f'({len(bus_simules) / options["interval"]:.1f} positions/s visées), '
+            f'mode {options["mode"]}, {options["workers"]} envois simultanés'
+        )
+        self.stdout.write(f'⏱️  Durée : {options["duration"]:.0f}s\n')
+
+        try:
+            latences, erreurs, retard, duree = self.rouler(bus_simules, envoyer, rng)
+            apres = self.taille_positions()
+            self.rapport(latences, erreurs, retard, duree, avant, apres)
+        finally:
+            if bus_crees and not options['keep']:
+                Bus.objects.filter(id__in=bus_crees).delete()
+                self.stdout.write(f'\n🧹 {len(bus_crees)} bus SIM-* supprimés (avec leurs positions et passages)')
+
+    # ---------- Préparation ----------
+
+    def charger_trajets(self):
+        """Séquences d'arrêts des trajets : {trajet_id: (bus_id, [(lat, lng), ...])}."""
+        trajets = {}
+        rows = (
+            TrajetArret.objects
+            .exclude(trajetRef__busRef__numeroBus__startswith=PREFIXE_SIMULATION)
+            .order_by('trajetRef_id', 'ordrePassage')
+            .values_list('trajetRef_id', 'trajetRef__busRef_id', 'arretRef__latitude', 'arretRef__longitude')
+        )
+        for trajet_id, bus_id, lat, lng in rows:
+            trajets.setdefault(trajet_id, (bus_id, []))[1].append((lat, lng))
+        return {tid: t for tid, t in trajets.items() if len(t[1]) >= 2}
+
+    def preparer_flotte(self, trajets, rng):
+        """
+        Crée les bus SIM-*, chacun copiant le trajet d'un bus réel (à tour
+        de rôle) : la simulation n'écrit jamais sur les bus réels. Écriture
+        en lot, suivie d'une seule invalidation du réseau.
+        """
+        vitesse = self.options['speed'] / 3.6
+        bruit = self.options['noise']
+        ids = list(trajets.keys())
+        modeles = [
+            Trajet.objects.select_related('busRef').prefetch_related('arrets').get(id=ids[i % len(ids)])
+            for i in range(min(self.options['bus'], len(ids)))
+        ]
+        modeles = [modeles[i % len(modeles)] for i in range(self.options['bus'])]
+
+        with transaction.atomic():
+            bus = Bus.objects.bulk_create([
+                Bus(
+                    numeroBus=f'{PREFIXE_SIMULATION}{i + 1}',
+                    primus_id=modele.busRef.primus_id,
+                    terminus_id=modele.busRef.terminus_id,
+                    villeRef_id=modele.busRef.villeRef_id,
+                    status='Simulation',  # hors lignes, itinéraires et tableaux de départs
+                )
+                for i, modele in enumerate(modeles)
+            ])
+            copies = Trajet.objects.bulk_create([
+                Trajet(busRef=b, typeTrajet=modele.typeTrajet, description='Simulation')
+                for b, modele in zip(bus, modeles)
+            ])
+            TrajetArret.objects.bulk_create([
+                TrajetArret(
+                    trajetRef=copie, arretRef_id=ta.arretRef_id,
+                    ordrePassage=ta.ordrePassage, direction=ta.direction,
+                )
+                for copie, modele in zip(copies, modeles)
+                for ta in modele.arrets.all()
+            ])
+            transaction.on_commit(live.invalider_reseau)
+
+        flotte = [
+            BusSimule(b.id, trajets[modele.id][1], vitesse, bruit, rng)
+            for b, modele in zip(bus, modeles)
+        ]
+        bus_crees = [b.id for b in bus]
+        self.stdout.write(
+            f'➕ {len(bus_crees)} bus SIM-* créés (copies de {len({m.id for m in modeles})} trajets réels)'
+        )
+
+        return flotte, bus_crees
+
+    def preparer_envoi(self):
+        """Retourne la fonction d'envoi d'une position selon le mode."""
+        if self.options['mode'] == 'inprocess':
+            from transport import live
+
+            def envoyer(bus_id, lat, lng):
+                try:
+                    live.enregistrer_position(bus_id, lat, lng)
+                finally:
+                    connection.close()  # une connexion par envoi, comme une requête HTTP
+            return envoyer
+
+        base = self.options['url'].rstrip('/')
+        token = self.options['token'] or self.obtenir_token(base)
+
+        def envoyer(bus_id, lat, lng):
+            body = json.dumps({'bus': bus_id, 'latitude': lat, 'longitude': lng}).encode()
+            req = urllib.request.Request(
+                f'{base}/api/transport/positions/',
+                data=body,
+                headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'},
+                method='POST',
+            )
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                if resp.status >= 300:
+                    raise RuntimeError(f'HTTP {resp.status}')
+        return envoyer
+
+    def obtenir_token(self, base):
+        username, password = self.options['username'], self.options['password']
+        if not username or not password:
+            raise CommandError('Mode http : fournir --token ou --username/--password')
+        req = urllib.request.Request(
+            f'{base}/api/auth/token/',
+            data=json.dumps({'username': username, 'password': password}).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                return json.loads(resp.read())['access']
+        except (urllib.error.URLError, KeyError, ValueError) as e:
+            raise CommandError(f"Impossible d'obtenir un jeton sur {base}: {e}")
+
+    # ---------- Simulation ----------
+
+    def rouler(self, flotte, envoyer, rng):
+        interval = self.options['interval']
+        duree = self.options['duration']
+        latences, erreurs = [], []
+        retard_max = [0.0]
+        lock = threading.Lock()
+
+        def job(bus_id, lat, lng, prevu):
+            debut = time.perf_counter()
+            try:
+                envoyer(bus_id, lat, lng)
+            except Exception as e:
+                with lock:
+                    erreurs.append(f'{type(e).__name__}: {e}')
+                return
+            fin = time.perf_counter()
+            with lock:
+                latences.append(fin - debut)
+                retard_max[0] = max(retard_max[0], debut - prevu)
+
+        # Les bus émettent décalés dans l'intervalle, comme des traceurs réels
+        prochains = [rng.uniform(0, interval) for _ in flotte]
+        derniers = [0.0] * len(flotte)
+        debut = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.options['workers']) as pool:
+            while True:
+                maintenant = time.perf_counter() - debut
+                if maintenant >= duree:
+                    break
+                for i, sim in enumerate(flotte):
+                    if prochains[i] <= maintenant:
+                        sim.avancer(maintenant - derniers[i])
+                        derniers[i] = maintenant
+                        lat, lng = sim.position()
+                        pool.submit(job, sim.bus_id, lat, lng, debut + prochains[i])
+                        prochains[i] += interval
+                attente = min(prochains) - (time.perf_counter() - debut)
+                if attente > 0:
+                    time.sleep(min(attente, 0.05))
+
+        total = time.perf_counter() - debut
+        connections.close_all()
+        return sorted(latences), erreurs, retard_max[0], total
+
+    # ---------- Rapport ----------
+
+    def taille_positions(self):
+        taille = None
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_total_relation_size(%s)', [PositionBus._meta.db_table])
+                taille = cursor.fetchone()[0]
+        return PositionBus.objects.count(), taille
+
+    def rapport(self, latences, erreurs, retard, duree, avant, apres):
+        envoyees = len(latences)
+        self.stdout.write('\n' + '=' * 60)
+        self.stdout.write('   RÉSULTATS')
+        self.stdout.write('=' * 60)
+        self.stdout.write(f'   Positions envoyées : {envoyees} en {duree:.1f}s')
+        self.stdout.write(f'   Débit : {envoyees / duree:.1f} positions/s')
+        if latences:
+            ms = [l * 1000 for l in latences]
+            self.stdout.write(
+                f'   Latence (ms) : p50={percentile(ms, 50):.1f}  p90={percentile(ms, 90):.1f}  '
+                f'p99={percentile(ms, 99):.1f}  max={ms[-1]:.1f}'
+            )
+        self.stdout.write(f'   Retard max. sur le planning : {retard * 1000:.0f} ms')
+
+        lignes = apres[0] - avant[0]
+        self.stdout.write(f'   PositionBus : +{lignes} lignes ({apres[0]} au total)')
+        if avant[1] is not None and apres[1] is not None:
+            croissance = apres[1] - avant[1]
+            par_ligne = croissance / lignes if lignes else 0
+            self.stdout.write(
+                f'   Table positions : +{croissance / 1024:.0f} Ko (~{par_ligne:.0f} octets/position, '
+                f'{apres[1] / 1024 / 1024:.1f} Mo au total)'
+            )
+
+        if erreurs:
+            self.stdout.write(self.style.ERROR(f'\n❌ {len(erreurs)} erreurs, par ex. : {erreurs[0]}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\n✅ Aucune erreur'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0002_positionbus'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bus',
+            name='position_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bus',
+            name='position_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localisation', '0001_initial'),
+        ('transport', '0003_bus_position_date_bus_position_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bus',
+            name='arret_actuel',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='localisation.arret'),
+        ),
+        migrations.CreateModel(
+            name='PassageArret',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('arrivee', 'Arrivée'), ('depart', 'Départ')], max_length=8)),
+                ('date', models.DateTimeField()),
+                ('arret', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passages', to='localisation.arret')),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passages', to='transport.bus')),
+            ],
+            options={
+                'verbose_name': 'Passage à un arrêt',
+                'verbose_name_plural': 'Passages aux arrêts',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['arret', 'date'], name='transport_p_arret_i_78ab23_idx'), models.Index(fields=['bus', 'date'], name='transport_p_bus_id_de79ae_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0004_bus_arret_actuel_passagearret'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bus',
+            name='nb_commentaires',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bus',
+            name='nb_signalements_ouverts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bus',
+            name='note_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -2,6 +2,9 @@
 from django.db import models
 from localisation.models import Arret, Ville
 
+# Bus créés par le simulateur de flotte (transport/management/commands/simulate_fleet.py)
+PREFIXE_SIMULATION = 'SIM-'
+
 class Bus(models.Model):
     numeroBus = models.CharField(max_length=50)
     primus = models.ForeignKey(Arret, related_name='bus_depart', on_delete=models.CASCADE)
@@ -11,10 +14,25 @@ class Bus(models.Model):
     status = models.CharField(max_length=20, default='Actif')
     current_latitude = models.FloatField(null=True, blank=True)
     current_longitude = models.FloatField(null=True, blank=True)
+    # Séquence d'ingestion (id de la PositionBus) du dernier déplacement : curseur du flux ?since=
+    position_seq = models.BigIntegerField(default=0, db_index=True)
+    position_date = models.DateTimeField(null=True, blank=True)
+    # Arrêt dans le rayon duquel se trouve le bus (géofencing), None entre deux arrêts
+    arret_actuel = models.ForeignKey(Arret, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
     frais = models.DecimalField(max_digits=10, decimal_places=2, default=600)
+    # Agrégats des commentaires, tenus à jour par interaction/signals.py
+    note_total = models.PositiveIntegerField(default=0)               # somme des notes
+    nb_commentaires = models.PositiveIntegerField(default=0)
+    nb_signalements_ouverts = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return f"Bus {self.numeroBus}"
+
+    @property
+    def note_moyenne(self):
+        if not self.nb_commentaires:
+            return None
+        return round(self.note_total / self.nb_commentaires, 1)
     
     class Meta:
         verbose_name = "Bus"
@@ -74,4 +92,26 @@ class PositionBus(models.Model):
         ordering = ['-timestamp']
 
     def __str__(self):
-        return f"Pos {self.bus.numeroBus} @ {self.timestamp}"        
\ No newline at end of file
+        return f"Pos {self.bus.numeroBus} @ {self.timestamp}"
+
+
+class PassageArret(models.Model):
+    """Arrivée / départ d'un bus à un arrêt (journal en ajout seul, issu du géofencing)"""
+    TYPE_CHOICES = [('arrivee', 'Arrivée'), ('depart', 'Départ')]
+
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name='passages')
+    arret = models.ForeignKey(Arret, on_delete=models.CASCADE, related_name='passages')
+    type = models.CharField(max_length=8, choices=TYPE_CHOICES)
+    date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = "Passage à un arrêt"
+        verbose_name_plural = "Passages aux arrêts"
+        indexes = [
+            models.Index(fields=['arret', 'date']),
+            models.Index(fields=['bus', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_display()} bus {self.bus_id} à l'arrêt {self.arret_id} @ {self.date}"
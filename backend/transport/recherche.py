@@ -0,0 +1,363 @@
+# transport/recherche.py
+"""
+Index en mémoire pour l'autocomplétion des arrêts.
+
+Les noms d'arrêt, de quartier et de ville sont normalisés (minuscules,
+accents retirés, « y » malgache ramené à « i ») et découpés en mots.
+Chaque mot du vocabulaire pointe vers les arrêts qui le contiennent, avec
+le poids du champ (nom > quartier > ville). Un mot saisi est cherché :
+- en préfixe, par recherche dichotomique dans le vocabulaire trié ;
+- à l'intérieur d'un mot, via un index de n-grammes sur le vocabulaire ;
+- avec une ou deux fautes de frappe (distance d'édition bornée), parmi les
+  mots qui partagent assez de trigrammes avec la saisie.
+
+Les meilleurs candidats selon le texte sont ensuite reclassés selon la
+popularité des arrêts (recherches récentes, interaction/tendances.py) et,
+si une position est fournie, leur proximité.
+
+L'index est construit en une requête et reconstruit quand un arrêt, un
+quartier ou une ville change (transport/signals.py). La version partagée
+de l'espace de cache 'arrets' permet aux autres processus de voir le
+changement.
+"""
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from localisation.models import Arret
+from taxibe_backend import caches
+from .geo import calculate_distance, point_valide
+
+# Poids des champs et qualité des correspondances (score = poids × qualité)
+POIDS_NOM, POIDS_QUARTIER, POIDS_VILLE = 3, 2, 1
+EXACT, PREFIXE, FLOU_1, INTERIEUR, FLOU_2 = 6, 4, 3, 2, 1
+FLOU = {1: FLOU_1, 2: FLOU_2}    # qualité selon le nombre de fautes
+QUALITES = (EXACT, PREFIXE, FLOU_1, INTERIEUR, FLOU_2)
+BONUS_DEBUT_NOM = 20
+
+CANDIDATS = 100                  # candidats retenus sur le texte avant reclassement
+MAX_CANDIDATS_FLOUS = 300        # mots comparés (distance d'édition) par mot saisi
+TAILLE_MEMO = 2048               # requêtes récentes gardées avec leurs candidats
+JOURS_POPULARITE = 30
+
+_LIGATURES = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ß': 'ss'})
+_SEPARATEURS = re.compile(r'[^a-z0-9]+')
+
+
+def normaliser(texte):
+    """'Ambohijanaky – Gare' → 'ambohijanaki gare'."""
+    if not texte:
+        return ''
+    texte = unicodedata.normalize('NFKD', texte.lower().translate(_LIGATURES))
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    # Orthographe malgache : « y » en fin de mot, « i » ailleurs (Analakely / Analakeli).
+    # Le repli s'applique partout pour qu'un préfixe saisi reste un préfixe du mot indexé.
+    return ' '.join(_SEPARATEURS.sub(' ', texte.replace('y', 'i')).split())
+
+
+def _param(name, default):
+    return getattr(settings, name, default)
+
+
+def _ngrammes(mot, n):
+    return {mot[i:i + n] for i in range(len(mot) - n + 1)}
+
+
+def _tolerance(saisie):
+    """Fautes tolérées selon la longueur du mot saisi."""
+    if len(saisie) < 4:
+        return 0
+    return 1 if len(saisie) < 8 else 2
+
+
+def distance_prefixe(saisie, mot, maximum):
+    """
+    Distance d'édition (Damerau-Levenshtein restreinte) entre `saisie` et le
+    plus proche préfixe de `mot` ; None si elle dépasse `maximum`.
+    """
+    mot = mot[:len(saisie) + maximum]
+    avant, precedente = None, list(range(len(mot) + 1))
+    for i, c in enumerate(saisie, 1):
+        courante = [i]
+        for j, d in enumerate(mot, 1):
+            cout = min(precedente[j] + 1, courante[j - 1] + 1, precedente[j - 1] + (c != d))
+            if avant is not None and j > 1 and c == mot[j - 2] and saisie[i - 2] == d:
+                cout = min(cout, avant[j - 2] + 1)  # transposition
+            courante.append(cout)
+        if min(courante) > maximum:
+            return None
+        avant, precedente = precedente, courante
+    distance = min(precedente)
+    return distance if distance <= maximum else None
+
+
+class IndexArrets:
+    """
+    Vocabulaire trié, listes inversées mot → arrêts et n-grammes du vocabulaire.
+
+    Les mots de ville ne pointent pas vers leurs milliers d'arrêts mais vers
+    la ville : un mot de ville n'est développé en arrêts que s'il le faut.
+    """
+
+    def __init__(self, lignes):
+        self.arrets = {}    # id -> résultat prêt à renvoyer
+        self.noms = {}      # id -> nom normalisé
+        self.ville_de = {}  # id -> ville normalisée
+        self.par_ville = defaultdict(list)  # ville -> [id]
+        postings = defaultdict(dict)        # mot -> {arret_id: poids du champ}
+        villes = defaultdict(set)           # mot -> {ville}
+
+        for arret_id, nom, lat, lng, quartier, ville in lignes:
+            self.arrets[arret_id] = {
+                'id': arret_id,
+                'nom': nom,
+                'latitude': lat,
+                'longitude': lng,
+                'quartier': quartier,
+                'ville': ville,
+            }
+            self.noms[arret_id] = normaliser(nom)
+            for texte, poids in ((self.noms[arret_id], POIDS_NOM), (normaliser(quartier), POIDS_QUARTIER)):
+                for mot in texte.split():
+                    if postings[mot].get(arret_id, 0) < poids:
+                        postings[mot][arret_id] = poids
+            ville = normaliser(ville)
+            if ville:
+                self.ville_de[arret_id] = ville
+                self.par_ville[ville].append(arret_id)
+                for mot in ville.split():
+                    villes[mot].add(ville)
+
+        # Listes inversées regroupées par poids : {mot: [(poids, (ids...))]}
+        self.postings = {}
+        for mot, ids in postings.items():
+            par_poids = defaultdict(list)
+            for arret_id, poids in ids.items():
+                par_poids[poids].append(arret_id)
+            self.postings[mot] = [(poids, tuple(par_poids[poids])) for poids in sorted(par_poids, reverse=True)]
+        self.villes = dict(villes)
+        self.vocabulaire = sorted(set(self.postings) | set(self.villes))
+        self.ngrammes = defaultdict(set)
+        for mot in self.vocabulaire:
+            # Trigrammes du mot, plus celui de son début (' ab') pour les fautes
+            for gramme in _ngrammes(' ' + mot, 3):
+                self.ngrammes[gramme].add(mot)
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.arrets)
+
+    def _prefixes(self, saisie):
+        """Mots du vocabulaire commençant par `saisie`."""
+        i = bisect_left(self.vocabulaire, saisie)
+        while i < len(self.vocabulaire) and self.vocabulaire[i].startswith(saisie):
+            yield self.vocabulaire[i]
+            i += 1
+
+    def _interieurs(self, saisie):
+        """Mots du vocabulaire contenant `saisie` ailleurs qu'au début (3 lettres au moins)."""
+        grammes = _ngrammes(saisie, 3)
+        if not grammes:
+            return []
+        candidats = set.intersection(*(self.ngrammes.get(g, set()) for g in grammes))
+        return [mot for mot in candidats if saisie in mot[1:]]
+
+    def _flous(self, saisie):
+        """
+        [(mot, fautes)] des mots proches de `saisie` (ou dont le début l'est).
+        Seuls les mots partageant le plus de trigrammes sont comparés.
+        """
+        tolerance = _tolerance(saisie)
+        if not tolerance:
+            return []
+        # Sans '  a' : trop courant pour départager les candidats
+        grammes = _ngrammes(' ' + saisie, 3)
+        communs = Counter()
+        for gramme in grammes:
+            communs.update(self.ngrammes.get(gramme, ()))
+        # Chaque faute détruit au plus trois trigrammes
+        seuil = max(1, len(grammes) - 3 * tolerance)
+        resultat = []
+        for mot, n in communs.most_common(MAX_CANDIDATS_FLOUS):
+            if n < seuil:
+                break
+            fautes = distance_prefixe(saisie, mot, tolerance)
+            if fautes:  # 0 : simple préfixe, déjà trouvé
+                resultat.append((mot, fautes))
+        return resultat
+
+    def _niveaux(self, correspondances):
+        """{score: [ids]} pour des (mot, qualité) du vocabulaire."""
+        niveaux = defaultdict(list)
+        for mot, qualite in correspondances:
+            for poids, ids in self.postings.get(mot, ()):
+                niveaux[poids * qualite].append(ids)
+            for ville in self.villes.get(mot, ()):
+                niveaux[POIDS_VILLE * qualite].append(self.par_ville[ville])
+        return niveaux
+
+    def _scores_mot(self, saisie, limit=None, etendu=True):
+        """
+        {arret_id: score} pour un mot saisi (meilleure correspondance par arrêt).
+
+        Les niveaux sont lus par score décroissant. Avec `limit`, la lecture
+        s'arrête dès que `limit` arrêts sont retenus : les niveaux restants,
+        de score inférieur, ne changeraient pas le classement. Les
+        correspondances sur le nom (qui portent le bonus) sont toujours lues,
+        et les n-grammes (intérieur des mots, fautes de frappe) ne sont
+        consultés que si les préfixes ne suffisent pas (jamais sans `etendu`).
+        """
+        niveaux = self._niveaux(
+            (mot, EXACT if mot == saisie else PREFIXE) for mot in self._prefixes(saisie)
+        )
+        etendus = False
+        scores = {}
+        for score in sorted({q * p for q in QUALITES
+                             for p in (POIDS_NOM, POIDS_QUARTIER, POIDS_VILLE)}, reverse=True):
+            if score <= POIDS_NOM * FLOU_1 and etendu and not etendus:
+                correspondances = [(mot, INTERIEUR) for mot in self._interieurs(saisie)]
+                correspondances += [(mot, FLOU[fautes]) for mot, fautes in self._flous(saisie)]
+                for s, ids in self._niveaux(correspondances).items():
+                    niveaux[s].extend(ids)
+                etendus = True
+            for ids in niveaux.get(score, ()):
+                for arret_id in ids:
+                    scores.setdefault(arret_id, score)
+            if limit is not None and score <= POIDS_NOM * PREFIXE and len(scores) >= limit:
+                break
+        return scores
+
+    def _candidats(self, mots, limit):
+        """
+        {arret_id: score total} des arrêts correspondant à tous les mots.
+        Les correspondances à l'intérieur des mots et avec fautes ne sont
+        cherchées que si les préfixes ne fournissent pas `limit` arrêts.
+        """
+        if len(mots) == 1:
+            return self._scores_mot(mots[0], limit)
+        scores = {}
+        for etendu in (False, True):
+            par_mot = sorted((self._scores_mot(mot, etendu=etendu) for mot in mots), key=len)
+            scores = par_mot[0]
+            for autre in par_mot[1:]:
+                scores = {a: s + autre[a] for a, s in scores.items() if a in autre}
+            if len(scores) >= limit:
+                break
+        return scores
+
+    def candidats(self, requete):
+        """[(arret_id, score texte)] des CANDIDATS meilleurs arrêts pour la requête (mémorisés)."""
+        requete = normaliser(requete)
+        mots = list(dict.fromkeys(requete.split()))
+        if not mots:
+            return []
+        resultat = self._memo.get(requete)
+        if resultat is not None:
+            return resultat
+
+        scores = self._candidats(mots, CANDIDATS)
+
+        def rang(arret_id):
+            nom = self.noms[arret_id]
+            bonus = BONUS_DEBUT_NOM if nom.startswith(requete) else 0
+            return (scores[arret_id] + bonus, -len(nom), -arret_id)
+
+        resultat = [(a, rang(a)[0]) for a in heapq.nlargest(CANDIDATS, scores, key=rang)]
+        if len(self._memo) >= TAILLE_MEMO:
+            self._memo.clear()
+        self._memo[requete] = resultat
+        return resultat
+
+    def chercher(self, requete, limit=20, position=None, popularite=None):
+        """
+        Arrêts correspondant à tous les mots de la requête, du plus pertinent
+        au moins pertinent. `popularite` : {arret_id: 0..1} ; `position` :
+        (lat, lng), ajoute la distance (m) à chaque résultat (ignorée si elle
+        n'est pas un point GPS valide).
+        """
+        popularite = popularite or {}
+        if position is not None and not point_valide(*position):
+            position = None
+        poids_popularite = _param('STOP_SEARCH_POPULARITY_WEIGHT', 4)
+        poids_proximite = _param('STOP_SEARCH_PROXIMITY_WEIGHT', 4)
+        rayon = _param('STOP_SEARCH_PROXIMITY_RADIUS', 1000)
+
+        classes = []
+        for ordre, (arret_id, score) in enumerate(self.candidats(requete)):
+            arret = self.arrets[arret_id]
+            score += poids_popularite * popularite.get(arret_id, 0)
+            if position is not None:
+                distance = calculate_distance(position[0], position[1], arret['latitude'], arret['longitude'])
+                score += poids_proximite / (1 + distance / rayon)
+                arret = {**arret, 'distance': round(distance)}
+            classes.append((-score, ordre, arret))
+        return [arret for _, _, arret in heapq.nsmallest(limit, classes)]
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def invalider_index():
+    """À appeler quand Arret / Quartier / Ville changent (tous les processus)."""
+    global _index
+    with _index_lock:
+        _index = None
+    caches.invalider('arrets')
+
+
+def get_index():
+    """Index courant ; reconstruit (une requête) si la version partagée a changé."""
+    global _index, _index_version
+    version = caches.version('arrets')
+    with _index_lock:
+        if _index is not None and _index_version == version:
+            return _index
+
+    lignes = Arret.objects.values_list(
+        'id', 'nomArret', 'latitude', 'longitude', 'quartier__nomQuartier', 'villeRef__nomVille',
+    )
+    index = IndexArrets(lignes)
+    with _index_lock:
+        _index, _index_version = index, version
+    return index
+
+
+_popularite = (None, {})
+_popularite_lock = threading.Lock()
+
+
+def popularite():
+    """
+    {arret_id: 0..1} : recherches récentes de chaque arrêt (échelle
+    logarithmique), relues au plus toutes les SEARCH_SKETCH_SYNC_SECONDS.
+    """
+    global _popularite
+    date, valeurs = _popularite
+    now = time.monotonic()
+    if date is not None and now - date < _param('SEARCH_SKETCH_SYNC_SECONDS', 60):
+        return valeurs
+    if not _popularite_lock.acquire(blocking=False):
+        return valeurs  # recalcul en cours dans un autre thread
+    try:
+        from interaction.tendances import tendances
+
+        top = tendances.top('arrets', JOURS_POPULARITE, _param('SEARCH_SKETCH_CAPACITY', 200))
+        maximum = math.log1p(top[0][1]) if top else 1
+        valeurs = {arret_id: math.log1p(compte) / maximum for arret_id, compte, _ in top}
+        _popularite = (now, valeurs)
+        return valeurs
+    finally:
+        _popularite_lock.release()
+
+
+def chercher_arrets(requete, limit=20, position=None):
+    return get_index().chercher(requete, limit, position=position, popularite=popularite())
@@ -1,5 +1,6 @@
 # backend/transport/serializers.py
 from rest_framework import serializers
+from .geo import point_valide
 from .models import Bus, Trajet, TrajetArret, PositionBus
 from localisation.models import Arret
 
@@ -32,6 +33,9 @@ class TrajetInlineSerializer(serializers.ModelSerializer):
 
 # ========== BUS LISTE ==========
 class BusListSerializer(serializers.ModelSerializer):
+    note_moyenne = serializers.FloatField(read_only=True)
+    # Annoté par BusViewSet pour l'utilisateur connecté (False sinon)
+    is_favori = serializers.BooleanField(read_only=True, default=False)
     primus_nom = serializers.SerializerMethodField()
     terminus_nom = serializers.SerializerMethodField()
     ville_nom = serializers.SerializerMethodField()
@@ -43,6 +47,7 @@ class BusListSerializer(serializers.ModelSerializer):
             'id', 'numeroBus', 'frais', 'status',
             'primus', 'primus_nom', 'terminus', 'terminus_nom',
             'villeRef', 'ville_nom', 'trajetCount',
+            'note_moyenne', 'nb_commentaires', 'nb_signalements_ouverts', 'is_favori',
         ]
 
     def get_primus_nom(self, obj):
@@ -69,6 +74,9 @@ class BusListSerializer(serializers.ModelSerializer):
 
 # ========== BUS DETAIL ==========
 class BusDetailSerializer(serializers.ModelSerializer):
+    note_moyenne = serializers.FloatField(read_only=True)
+    # Annoté par BusViewSet pour l'utilisateur connecté (False sinon)
+    is_favori = serializers.BooleanField(read_only=True, default=False)
     primus_nom = serializers.SerializerMethodField()
     terminus_nom = serializers.SerializerMethodField()
     ville_nom = serializers.SerializerMethodField()
@@ -80,6 +88,7 @@ class BusDetailSerializer(serializers.ModelSerializer):
             'id', 'numeroBus', 'frais', 'status',
             'primus', 'primus_nom', 'terminus', 'terminus_nom',
             'villeRef', 'ville_nom', 'trajets',
+            'note_moyenne', 'nb_commentaires', 'nb_signalements_ouverts', 'is_favori',
         ]
 
     def get_primus_nom(self, obj):
@@ -204,6 +213,12 @@ class PositionBusSerializer(serializers.ModelSerializer):
         model = PositionBus
         fields = ['id', 'bus', 'bus_numero', 'latitude', 'longitude', 'timestamp']
 
+    def validate(self, data):
+        """Position GPS réelle : NaN, infini ou hors du globe refusés (index spatial)"""
+        if not point_valide(data['latitude'], data['longitude']):
+            raise serializers.ValidationError("Coordonnées GPS invalides.")
+        return data
+
 
 class TrajetDetailSerializer(serializers.ModelSerializer):
     arrets = serializers.SerializerMethodField()
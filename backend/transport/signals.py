@@ -0,0 +1,36 @@
+# transport/signals.py
+"""
+Invalidation des espaces de cache du réseau quand il change, après le
+commit (taxibe_backend/caches.py) :
+- 'reseau' : lignes, trajets, GeoJSON et réseau du suivi temps réel ;
+- 'arrets' : arrêts, villes, quartiers et index de recherche des arrêts.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from localisation.models import Arret, Quartier, Ville
+from .models import Bus, Trajet, TrajetArret
+from . import live, recherche
+
+
+@receiver([post_save, post_delete], sender=Bus)
+@receiver([post_save, post_delete], sender=Trajet)
+@receiver([post_save, post_delete], sender=TrajetArret)
+@receiver([post_save, post_delete], sender=Arret)
+@receiver([post_save, post_delete], sender=Quartier)
+@receiver([post_save, post_delete], sender=Ville)
+def invalider_reseau(sender, **kwargs):
+    transaction.on_commit(live.invalider_reseau)
+
+
+@receiver(post_delete, sender=Bus)
+def retirer_bus_temps_reel(sender, instance, **kwargs):
+    live.oublier_bus(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Arret)
+@receiver([post_save, post_delete], sender=Quartier)
+@receiver([post_save, post_delete], sender=Ville)
+def invalider_arrets(sender, **kwargs):
+    transaction.on_commit(recherche.invalider_index)
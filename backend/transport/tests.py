@@ -1,3 +1,358 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from localisation.models import Arret, Quartier, Ville
+from taxibe_backend import caches
+from .geo import METRES_PAR_DEGRE
+from .models import Bus, PassageArret, PositionBus, Trajet, TrajetArret
+from .recherche import IndexArrets, distance_prefixe
+from . import live
+
+
+def creer_reseau():
+    """Une ville, six arrêts alignés et une ligne aller / retour."""
+    ville = Ville.objects.create(nomVille='Fianarantsoa', codePostal='301', pays='MG')
+    quartier = Quartier.objects.create(nomQuartier='Centre', villeRef=ville)
+    arrets = [
+        Arret.objects.create(
+            nomArret=f'Arrêt {i}', latitude=-21.45 + i * 0.005, longitude=47.08,
+            villeRef=ville, quartier=quartier,
+        )
+        for i in range(6)
+    ]
+    bus = Bus.objects.create(numeroBus='12', primus=arrets[0], terminus=arrets[-1], villeRef=ville)
+    aller = Trajet.objects.create(busRef=bus, typeTrajet='Aller')
+    retour = Trajet.objects.create(busRef=bus, typeTrajet='Retour')
+    for i, arret in enumerate(arrets):
+        TrajetArret.objects.create(trajetRef=aller, arretRef=arret, ordrePassage=i + 1, direction='Aller')
+        TrajetArret.objects.create(trajetRef=retour, arretRef=arret, ordrePassage=len(arrets) - i, direction='Retour')
+    return ville, quartier, arrets, bus
+
+
+# ========== CURSEUR DU SUIVI TEMPS RÉEL ==========
+
+@override_settings(LIVE_TICK_WORKERS=0)
+class CurseurPositionsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.bus2 = Bus.objects.create(
+            numeroBus='7', primus=cls.arrets[0], terminus=cls.arrets[-1], villeRef=cls.ville,
+        )
+
+    def setUp(self):
+        cache.clear()
+        live.store.clear()
+
+    def position(self, bus, lat, **kwargs):
+        return PositionBus.objects.create(bus=bus, latitude=lat, longitude=47.08, **kwargs)
+
+    def test_premier_sync_part_de_la_tete(self):
+        anciennes = [self.position(self.bus, -21.45) for _ in range(5)]
+        PositionBus.objects.filter(pk__in=[p.pk for p in anciennes]).update(
+            timestamp=anciennes[0].timestamp.replace(year=2000)
+        )
+        live.store.sync(force=True)
+        self.assertEqual(live.store._cursor, anciennes[-1].pk)
+        self.assertEqual(live.store.snapshot(), {})  # positions périmées : rien à afficher
+
+    @override_settings(LIVE_CURSOR_OVERLAP=5)
+    def test_sync_suivant_ne_relit_que_le_chevauchement(self):
+        anciennes = [self.position(self.bus, -21.45) for _ in range(20)]
+        PositionBus.objects.update(timestamp=anciennes[0].timestamp.replace(year=2000))
+        live.store.sync(force=True)
+        with CaptureQueriesContext(connection) as requetes:
+            live.store.sync(force=True)
+        self.assertEqual(len(requetes), 1)
+        self.assertIn(f'> {anciennes[-1].pk - 5}', requetes[0]['sql'])
+
+    def test_premier_sync_charge_les_positions_fraiches(self):
+        self.position(self.bus, -21.45)
+        derniere = self.position(self.bus, -21.44)
+        live.store.sync(force=True)
+        snapshot = live.store.snapshot()
+        self.assertEqual(list(snapshot), [self.bus.pk])
+        self.assertEqual(snapshot[self.bus.pk]['seq'], derniere.pk)
+
+    @override_settings(LIVE_SYNC_BATCH=3)
+    def test_sync_par_lots(self):
+        live.store.sync(force=True)
+        for i in range(10):
+            derniere = self.position(self.bus2, -21.40 - i / 1000)
+        live.store.sync(force=True)
+        self.assertEqual(live.store._cursor, derniere.pk)
+        self.assertAlmostEqual(live.store.snapshot()[self.bus2.pk]['latitude'], -21.409)
+
+    def test_position_commitee_en_retard_non_sautee(self):
+        live.store.sync(force=True)
+        p = self.position(self.bus, -21.45)
+        self.position(self.bus, -21.44, id=p.pk + 5)
+        live.store.sync(force=True)
+        self.assertEqual(live.store._cursor, p.pk + 5)
+        # Id inférieur au curseur, visible seulement maintenant
+        self.position(self.bus2, -21.43, id=p.pk + 2)
+        live.store.sync(force=True)
+        self.assertIn(self.bus2.pk, live.store.snapshot())
+
+    def test_flux_since_pagine_et_rejoue_le_chevauchement(self):
+        live.enregistrer_position(self.bus.pk, -21.45, 47.08)
+        live.enregistrer_position(self.bus2.pk, -21.44, 47.08)
+
+        page, curseur, reste = live.positions_depuis(0, limit=1)
+        self.assertEqual([b['id'] for b in page], [self.bus.pk])
+        self.assertTrue(reste)
+
+        page, curseur2, reste = live.positions_depuis(curseur, limit=1)
+        self.assertEqual([b['id'] for b in page], [self.bus.pk, self.bus2.pk])  # bus 1 rejoué
+        self.assertGreater(curseur2, curseur)
+
+        page, curseur3, reste = live.positions_depuis(curseur2, limit=1)
+        self.assertFalse(reste)
+        self.assertEqual(curseur3, curseur2)
+
+    def test_sequence_ne_recule_jamais(self):
+        live.enregistrer_position(self.bus.pk, -21.45, 47.08)
+        # Position plus récente déjà commitée par un autre worker
+        Bus.objects.filter(pk=self.bus.pk).update(position_seq=10 ** 9)
+        live.enregistrer_position(self.bus.pk, -21.44, 47.08)
+        self.assertEqual(Bus.objects.get(pk=self.bus.pk).position_seq, 10 ** 9)
+
+    def test_bus_immobile_ne_fait_pas_avancer_le_flux(self):
+        live.enregistrer_position(self.bus.pk, -21.45, 47.08)
+        seq = Bus.objects.get(pk=self.bus.pk).position_seq
+        live.enregistrer_position(self.bus.pk, -21.45, 47.08)
+        self.assertEqual(Bus.objects.get(pk=self.bus.pk).position_seq, seq)
+
+
+# ========== TABLEAUX DE PASSAGE ==========
+
+@override_settings(LIVE_TICK_WORKERS=0)
+class TableauxPassageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        cls.usager = User.objects.create_user('usager', password='x')
+
+    def setUp(self):
+        cache.clear()
+        live.invalider_reseau()
+        live.store.clear()
+        live._arret_actuel.clear()
+
+    def tableau(self, arret):
+        return self.client.get(f'/api/transport/arrets/{arret.pk}/departures/').json()
+
+    def rouler_vers_le_nord(self):
+        # Entre les arrêts 1 et 2, en direction du terminus (trajet Aller)
+        live.enregistrer_position(self.bus.pk, -21.4440, 47.08)
+        live.enregistrer_position(self.bus.pk, -21.4430, 47.08)
+        self.assertTrue(live.tick(force=True))
+
+    def test_tableau_apres_quelques_positions(self):
+        self.rouler_vers_le_nord()
+        tableau = self.tableau(self.arrets[4])
+        self.assertIsNotNone(tableau['mis_a_jour'])
+        [passage] = tableau['departures']
+        self.assertEqual(passage['bus']['numero'], '12')
+        self.assertEqual((passage['trajet']['type'], passage['trajet']['terminus']), ('Aller', 'Arrêt 5'))
+        self.assertAlmostEqual(passage['distance'], 0.013 * METRES_PAR_DEGRE, delta=5)
+
+        # Arrêts suivants par distance croissante ; l'arrêt déjà dépassé n'attend pas ce bus
+        distances = [self.tableau(arret)['departures'][0]['distance'] for arret in self.arrets[2:]]
+        self.assertEqual(distances, sorted(distances))
+        self.assertEqual(self.tableau(self.arrets[0])['departures'], [])
+
+    def test_bus_inactif_absent_des_tableaux(self):
+        Bus.objects.filter(pk=self.bus.pk).update(status='Simulation')
+        live.invalider_reseau()
+        self.rouler_vers_le_nord()
+        self.assertEqual(self.tableau(self.arrets[4])['departures'], [])
+
+    def test_tableau_vide_sans_tick(self):
+        tableau = self.tableau(self.arrets[0])
+        self.assertEqual((tableau['mis_a_jour'], tableau['departures']), (None, []))
+        self.assertEqual(self.client.get('/api/transport/arrets/999999/departures/').status_code, 404)
+
+    def test_ingestion_reservee_au_staff(self):
+        api = APIClient()
+        position = {'bus': self.bus.pk, 'latitude': -21.44, 'longitude': 47.08}
+        self.assertEqual(api.post('/api/transport/positions/', position).status_code, 401)
+        api.force_authenticate(self.usager)
+        self.assertEqual(api.post('/api/transport/positions/', position).status_code, 403)
+        api.force_authenticate(self.admin)
+        self.assertEqual(api.post('/api/transport/positions/', position).status_code, 201)
+        self.assertEqual(PositionBus.objects.count(), 1)
+
+
+# ========== GÉOFENCING ==========
+
+@override_settings(LIVE_TICK_WORKERS=0, LIVE_GEOFENCE_RADIUS=40, LIVE_GEOFENCE_EXIT_RADIUS=60)
+class GeofencingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+
+    def setUp(self):
+        cache.clear()
+        live.invalider_reseau()
+        live.store.clear()
+        live._arret_actuel.clear()
+
+    def rouler(self, *distances):
+        """Positions au nord de l'arrêt 2, à `distance` mètres."""
+        arret = self.arrets[2]
+        for distance in distances:
+            live.enregistrer_position(self.bus.pk, arret.latitude + distance / METRES_PAR_DEGRE, arret.longitude)
+
+    def passages(self):
+        return list(PassageArret.objects.order_by('id').values_list('arret_id', 'type'))
+
+    def test_entree_puis_sortie_sans_oscillation(self):
+        arret = self.arrets[2].pk
+        self.rouler(150, 80, 50)
+        self.assertEqual(self.passages(), [])  # jamais à moins de 40 m
+
+        self.rouler(30)
+        self.assertEqual(self.passages(), [(arret, 'arrivee')])
+        self.assertEqual(Bus.objects.get(pk=self.bus.pk).arret_actuel_id, arret)
+
+        # Bruit GPS autour du rayon d'entrée : le bus reste à l'arrêt
+        self.rouler(45, 38, 55, 42, 58, 35)
+        self.assertEqual(self.passages(), [(arret, 'arrivee')])
+
+        self.rouler(70, 50, 45)  # sorti ; 50 et 45 m ne suffisent pas pour revenir
+        self.assertEqual(self.passages(), [(arret, 'arrivee'), (arret, 'depart')])
+        self.assertIsNone(Bus.objects.get(pk=self.bus.pk).arret_actuel_id)
+
+    def test_etat_relu_depuis_la_base(self):
+        self.rouler(10)
+        live._arret_actuel.clear()  # autre processus : état local absent
+        self.rouler(20, 500)
+        self.assertEqual(self.passages(), [(self.arrets[2].pk, 'arrivee'), (self.arrets[2].pk, 'depart')])
+
+
+# ========== RECHERCHE D'ARRÊTS ==========
+
+class RechercheArretsTests(TestCase):
+    LIGNES = [
+        (1, 'Analakely Gare', -18.910, 47.520, 'Analakely', 'Antananarivo'),
+        (2, 'Analakely Marché', -18.905, 47.525, 'Analakely', 'Antananarivo'),
+        (3, 'Ambohijatovo', -18.920, 47.520, 'Isoraka', 'Antananarivo'),
+        (4, 'Anosy', -18.930, 47.520, 'Anosy', 'Antananarivo'),
+        (5, 'Lycée Jules Ferry', -18.930, 47.520, 'Anosy', 'Antananarivo'),
+        (6, 'Gare Nord', -21.400, 47.000, 'Centre', 'Fianarantsoa'),
+        (7, 'Gare Sud', -21.500, 47.000, 'Centre', 'Fianarantsoa'),
+    ]
+
+    def setUp(self):
+        self.index = IndexArrets(self.LIGNES)
+
+    def ids(self, requete, **kwargs):
+        return [arret['id'] for arret in self.index.chercher(requete, **kwargs)]
+
+    def test_distance_prefixe_bornee(self):
+        self.assertEqual(distance_prefixe('anlakely', 'analakely', 1), 1)
+        self.assertEqual(distance_prefixe('marhce', 'marche', 1), 1)  # transposition
+        self.assertEqual(distance_prefixe('ana', 'analakely', 0), 0)
+        self.assertIsNone(distance_prefixe('xyzw', 'analakely', 1))
+
+    def test_sans_accents_ni_casse(self):
+        self.assertEqual(self.ids('ANALAKÉLY'), [1, 2])
+        self.assertEqual(self.ids('analakeli'), [1, 2])  # « y » malgache
+
+    def test_fautes_de_frappe(self):
+        self.assertEqual(self.ids('analakaly'), [1, 2])
+        self.assertEqual(self.ids('ambohijatuvo'), [3])
+        self.assertEqual(self.ids('marhce'), [2])
+        self.assertEqual(self.ids('xyz'), [])
+
+    def test_nom_avant_quartier(self):
+        self.assertEqual(self.ids('anosy'), [4, 5])
+
+    def test_tous_les_mots_requis(self):
+        self.assertEqual(sorted(self.ids('gare fianar')), [6, 7])
+
+    def test_popularite_departage(self):
+        self.assertEqual(self.ids('gare')[0], 7)
+        self.assertEqual(self.ids('gare', popularite={6: 1.0})[0], 6)
+
+    def test_proximite(self):
+        resultats = self.index.chercher('gare', position=(-21.400, 47.000))
+        self.assertEqual(resultats[0]['id'], 6)
+        self.assertEqual(resultats[0]['distance'], 0)
+        # Position invalide : ignorée
+        self.assertNotIn('distance', self.index.chercher('gare', position=(float('nan'), 47.0))[0])
+
+    def test_coordonnees_invalides_refusees(self):
+        for lat in ('nan', 'inf', '95', 'abc'):
+            reponse = self.client.get('/api/transport/arrets/search/', {'q': 'gare', 'lat': lat, 'lng': '47'})
+            self.assertEqual(reponse.status_code, 400, lat)
+
+
+# ========== INVALIDATION DU CACHE ==========
+
+class InvalidationCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_obtenir_calcule_une_fois_par_version(self):
+        appels = []
+        calcul = lambda: appels.append(1) or len(appels)
+        self.assertEqual(caches.obtenir('reseau', ('essai',), calcul), 1)
+        self.assertEqual(caches.obtenir('reseau', ('essai',), calcul), 1)
+        caches.invalider('reseau')
+        self.assertEqual(caches.obtenir('reseau', ('essai',), calcul), 2)
+
+    def test_invalider_un_espace_epargne_les_autres(self):
+        caches.obtenir('arrets', ('essai',), lambda: 'avant')
+        caches.invalider('reseau')
+        self.assertEqual(caches.obtenir('arrets', ('essai',), lambda: 'après'), 'avant')
+
+    def test_vue_en_cache_puis_invalidee_par_ecriture(self):
+        self.assertEqual(len(self.client.get('/api/transport/lignes/').json()), 1)
+        with self.assertNumQueries(0):
+            self.client.get('/api/transport/lignes/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Bus.objects.create(numeroBus='25', primus=self.arrets[0], terminus=self.arrets[-1], villeRef=self.ville)
+        self.assertEqual(
+            sorted(ligne['numero'] for ligne in self.client.get('/api/transport/lignes/').json()),
+            ['12', '25'],
+        )
+
+    def test_invalidation_seulement_apres_commit(self):
+        self.client.get('/api/transport/lignes/')
+        with self.captureOnCommitCallbacks() as rappels:
+            self.bus.numeroBus = '13'
+            self.bus.save()
+        with self.assertNumQueries(0):
+            self.client.get('/api/transport/lignes/')  # pas encore commité : cache intact
+        for rappel in rappels:
+            rappel()
+        self.assertEqual(self.client.get('/api/transport/lignes/').json()[0]['numero'], '13')
+
+    def test_index_des_arrets_suit_les_ecritures(self):
+        self.assertEqual(self.client.get('/api/transport/arrets/search/', {'q': 'zebu'}).json(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            arret = Arret.objects.create(
+                nomArret='Zébu Rouge', latitude=-21.44, longitude=47.09, villeRef=self.ville, quartier=self.quartier,
+            )
+        noms = [a['nom'] for a in self.client.get('/api/transport/arrets/search/', {'q': 'zebu'}).json()]
+        self.assertEqual(noms, ['Zébu Rouge'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            arret.delete()
+        self.assertEqual(self.client.get('/api/transport/arrets/search/', {'q': 'zebu'}).json(), [])
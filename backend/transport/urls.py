@@ -20,6 +20,7 @@ urlpatterns = [
     path('arrets/search/', views.search_arrets, name='search-arrets'),
     path('arrets/nearest/', views.nearest_arret, name='nearest-arret'),
     path('arrets/<int:arret_id>/lignes/', views.lignes_by_arret, name='lignes-by-arret'),
+    path('arrets/<int:arret_id>/departures/', views.departures_by_arret, name='departures-by-arret'),
     
     # ========== LIGNES ==========
     path('lignes/', views.ligne_list, name='ligne-list'),
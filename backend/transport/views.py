@@ -1,6 +1,6 @@
 # transport/views.py - VERSION COMPLÈTE FINALE
 
-from rest_framework import viewsets, status
+from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
@@ -8,13 +8,15 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.db import IntegrityError
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db.models import Exists, OuterRef
 from datetime import timedelta
-from math import radians, sin, cos, sqrt, atan2
-import traceback
+import logging
 
-from .models import Bus, Trajet, TrajetArret, PositionBus
+from .models import PREFIXE_SIMULATION, Bus, Trajet, TrajetArret, PositionBus
+from .geo import calculate_distance, point_valide
+from . import live, recherche
 from localisation.models import Arret, Quartier, Ville
+from taxibe_backend import caches
 from .serializers import (
     BusListSerializer, 
     BusDetailSerializer, 
@@ -24,20 +26,105 @@ from .serializers import (
     TrajetDetailSerializer
 )
 
+logger = logging.getLogger(__name__)
+
 # ========== VIEWSETS BUS ==========
 
 class BusMapViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet pour la carte (lecture seule)"""
-    queryset = Bus.objects.select_related('primus', 'terminus', 'villeRef').all()
+    queryset = Bus.objects.select_related('primus', 'terminus', 'villeRef').exclude(
+        numeroBus__startswith=PREFIXE_SIMULATION
+    )
     serializer_class = BusMapSerializer
     permission_classes = [AllowAny]
 
 
-class PositionBusViewSet(viewsets.ReadOnlyModelViewSet):
-    """ViewSet pour les positions GPS des bus"""
+class PositionBusViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """ViewSet pour les positions GPS des bus (lecture + ingestion par les traceurs, comptes staff)"""
     queryset = PositionBus.objects.select_related('bus')
     serializer_class = PositionBusSerializer
-    permission_classes = [AllowAny]
+
+    def get_permissions(self):
+        if self.action == 'create':
+            return [IsAdminUser()]
+        return [AllowAny()]
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance = live.enregistrer_position(
+            data['bus'].id, data['latitude'], data['longitude']
+        )
+
+    def list(self, request, *args, **kwargs):
+        # ?since=<curseur> : flux incrémental des bus qui ont bougé
+        since = request.query_params.get('since')
+        if since is None:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            cursor = max(int(since), 0)
+            limit = min(max(int(request.query_params.get('limit', 500)), 1), 1000)
+        except ValueError:
+            return Response({'error': 'since et limit doivent être des entiers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        bus, nouveau, has_more = live.positions_depuis(cursor, limit)
+        return Response({
+            'cursor': nouveau,
+            'has_more': has_more,
+            'positions': [
+                {
+                    'bus': b['id'],
+                    'bus_numero': b['numeroBus'],
+                    'latitude': b['current_latitude'],
+                    'longitude': b['current_longitude'],
+                    'timestamp': timezone.localtime(b['position_date']) if b['position_date'] else None,
+                    'seq': b['position_seq'],
+                }
+                for b in bus
+            ],
+        })
+
+    def _positions_live(self, fixes):
+        bus = live.get_reseau()['bus']
+        data = []
+        for fix in fixes:
+            item = {
+                'bus': fix['bus_id'],
+                'bus_numero': bus.get(fix['bus_id'], {}).get('numero'),
+                'latitude': fix['latitude'],
+                'longitude': fix['longitude'],
+                'timestamp': timezone.localtime(fix['timestamp']),
+            }
+            if 'distance' in fix:
+                item['distance'] = round(fix['distance'], 2)
+            data.append(item)
+        return data
+
+    @action(detail=False, methods=['get'])
+    def near(self, request):
+        """Bus à moins de `radius` mètres d'un point (?lat=&lng=&radius=500)"""
+        try:
+            lat = float(request.query_params.get('lat'))
+            lng = float(request.query_params.get('lng'))
+            radius = min(float(request.query_params.get('radius', 500)), 20000)
+        except (TypeError, ValueError):
+            return Response({'error': 'Paramètres lat, lng invalides'}, status=status.HTTP_400_BAD_REQUEST)
+        if not point_valide(lat, lng) or not 0 <= radius <= 20000:  # NaN échoue aussi
+            return Response({'error': 'Paramètres lat, lng ou radius hors limites'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(self._positions_live(live.store.near(lat, lng, radius)))
+
+    @action(detail=False, methods=['get'])
+    def bbox(self, request):
+        """Bus visibles dans la vue de la carte (?bbox=sud,ouest,nord,est)"""
+        try:
+            south, west, north, east = [float(x) for x in request.query_params.get('bbox', '').split(',')]
+        except ValueError:
+            return Response({'error': 'bbox attendu: sud,ouest,nord,est'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (point_valide(south, west) and point_valide(north, east)) or south > north or west > east:
+            return Response({'error': 'bbox invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(self._positions_live(live.store.in_bbox(south, west, north, east)))
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -69,6 +156,20 @@ class BusViewSet(viewsets.ModelViewSet):
     """ViewSet principal pour la gestion des bus"""
     queryset = Bus.objects.all()
     
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == 'list':
+            qs = qs.exclude(numeroBus__startswith=PREFIXE_SIMULATION)
+        user = self.request.user
+        if user.is_authenticated and self.action in ['list', 'retrieve']:
+            from interaction.models import Favori
+
+            # Statut favori calculé dans la même requête que la liste (sous-requête EXISTS)
+            qs = qs.annotate(is_favori=Exists(
+                Favori.objects.filter(utilisateurRef=user, busRef=OuterRef('pk'))
+            ))
+        return qs
+    
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return BusCreateSerializer
@@ -89,8 +190,7 @@ class BusViewSet(viewsets.ModelViewSet):
         except ObjectDoesNotExist:
             return Response({'detail': 'Bus non trouvé'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            print(f"❌ ERREUR RETRIEVE: {type(e).__name__}: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Erreur détail bus %s", kwargs.get('pk'))
             return Response({'detail': 'Erreur serveur', 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def create(self, request, *args, **kwargs):
@@ -102,9 +202,8 @@ class BusViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
         except IntegrityError as e:
             return Response({'detail': f'Erreur d\'intégrité: {e}'}, status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            print(f"❌ ERREUR CRÉATION BUS: {e}")
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Erreur création bus")
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def _enregistrer_historique(self, request, depart_id, arrivee_id):
@@ -113,30 +212,13 @@ class BusViewSet(viewsets.ModelViewSet):
             return None
         
         try:
-            from interaction.models import HistoriqueRecherche
-            
-            since = timezone.now() - timedelta(minutes=30)
-            existing = HistoriqueRecherche.objects.filter(
-                userRef=request.user,
-                depart_id=depart_id,
-                arrivee_id=arrivee_id,
-                date_recherche__gte=since
-            ).first()
-            
-            if existing:
-                existing.date_recherche = timezone.now()
-                existing.save(update_fields=['date_recherche'])
-                return existing
-            else:
-                historique = HistoriqueRecherche.objects.create(
-                    userRef=request.user,
-                    depart_id=depart_id,
-                    arrivee_id=arrivee_id
-                )
-                return historique
+            from interaction.historique import differer_recherche
+
+            # Écriture différée : la recherche part dans le tampon, écrit par lots
+            differer_recherche(request.user, depart_id, arrivee_id)
                 
         except Exception as e:
-            print(f"⚠️ Erreur enregistrement historique: {e}")
+            logger.warning("Erreur enregistrement historique : %s", e)
             return None
     
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
@@ -185,8 +267,7 @@ class BusViewSet(viewsets.ModelViewSet):
             })
             
         except Exception as e:
-            print(f"❌ Erreur recherche itinéraire: {e}")
-            traceback.print_exc()
+            logger.exception("Erreur recherche itinéraire %s → %s", depart_id, arrivee_id)
             return Response(
                 {'error': 'Erreur lors de la recherche', 'detail': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -285,6 +366,7 @@ class BusViewSet(viewsets.ModelViewSet):
 # ========== VUES ARRÊTS ==========
 
 @api_view(['GET'])
+@caches.en_cache('arrets')
 def arret_list(request):
     """Liste de tous les arrêts"""
     arrets = Arret.objects.select_related('quartier', 'villeRef').all()
@@ -312,6 +394,7 @@ def arret_list(request):
 
 
 @api_view(['GET'])
+@caches.en_cache('arrets')
 def arret_detail(request, pk):
     """Détail d'un arrêt"""
     arret = get_object_or_404(Arret, pk=pk)
@@ -405,35 +488,35 @@ def nearest_arret(request):
 
 @api_view(['GET'])
 def search_arrets(request):
-    """Recherche d'arrêts par nom, quartier ou ville"""
+    """
+    Recherche d'arrêts par nom, quartier ou ville (index en mémoire, sans
+    accents, tolérant aux fautes). Avec ?lat=&lng=, les arrêts proches
+    remontent et chaque résultat porte sa distance.
+    """
     query = request.GET.get('q', '')
     
     if len(query) < 2:
         return Response([])
     
-    arrets = Arret.objects.filter(
-        Q(nomArret__icontains=query) | 
-        Q(quartier__nomQuartier__icontains=query) |
-        Q(villeRef__nomVille__icontains=query)
-    ).select_related('quartier', 'villeRef')[:20]
-    
-    data = []
-    for arret in arrets:
-        data.append({
-            'id': arret.id,
-            'nom': arret.nomArret,
-            'latitude': arret.latitude,
-            'longitude': arret.longitude,
-            'quartier': arret.quartier.nomQuartier if arret.quartier else None,
-            'ville': arret.villeRef.nomVille if arret.villeRef else None,
-        })
+    position = None
+    if request.GET.get('lat') and request.GET.get('lng'):
+        try:
+            position = (float(request.GET.get('lat')), float(request.GET.get('lng')))
+        except ValueError:
+            position = None
+        if position is None or not point_valide(*position):
+            return Response(
+                {'error': 'Paramètres lat, lng invalides'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
     
-    return Response(data)
+    return Response(recherche.chercher_arrets(query, limit=20, position=position))
 
 
 # ========== VUES LIGNES ==========
 
 @api_view(['GET'])
+@caches.en_cache('reseau')
 def ligne_list(request):
     """Liste de toutes les lignes (bus actifs)"""
     bus_list = Bus.objects.filter(status='Actif').select_related('primus', 'terminus')
@@ -456,6 +539,7 @@ def ligne_list(request):
 
 
 @api_view(['GET'])
+@caches.en_cache('reseau')
 def lignes_by_arret(request, arret_id):
     """Lignes de bus passant par un arrêt"""
     arret = get_object_or_404(Arret, pk=arret_id)
@@ -486,6 +570,28 @@ def lignes_by_arret(request, arret_id):
 
 
 @api_view(['GET'])
+def departures_by_arret(request, arret_id):
+    """
+    Prochains passages à un arrêt (temps réel)
+
+    Exemple: GET /api/transport/arrets/12/departures/
+
+    Servi depuis le tableau précalculé à chaque tick de positions ;
+    aucune prédiction n'est calculée pendant la requête.
+    """
+    board = live.get_board(arret_id)
+    if board is None:
+        arret = get_object_or_404(Arret, pk=arret_id)
+        board = {
+            'arret': {'id': arret.id, 'nom': arret.nomArret},
+            'mis_a_jour': None,
+            'departures': [],
+        }
+    return Response(board)
+
+
+@api_view(['GET'])
+@caches.en_cache('reseau')
 def arrets_by_ligne(request, ligne_id):
     """Arrêts d'une ligne de bus (dans l'ordre)"""
     bus = get_object_or_404(Bus, pk=ligne_id)
@@ -518,6 +624,7 @@ def arrets_by_ligne(request, ligne_id):
 # ========== ITINÉRAIRES ==========
 
 @api_view(['GET'])
+@caches.en_cache('reseau')
 def find_itineraire(request):
     """Trouve un itinéraire entre deux arrêts"""
     try:
@@ -619,6 +726,7 @@ def find_itineraire_from_position(request):
 # ========== VILLES & QUARTIERS ==========
 
 @api_view(['GET'])
+@caches.en_cache('arrets')
 def ville_list(request):
     """Liste des villes"""
     villes = Ville.objects.all()
@@ -631,6 +739,7 @@ def ville_list(request):
 
 
 @api_view(['GET'])
+@caches.en_cache('arrets')
 def quartiers_by_ville(request, ville_id):
     """Quartiers d'une ville"""
     ville = get_object_or_404(Ville, pk=ville_id)
@@ -644,16 +753,6 @@ def quartiers_by_ville(request, ville_id):
 
 # ========== UTILITAIRES ==========
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Formule de Haversine - Distance en mètres"""
-    R = 6371000
-    lat1_rad, lat2_rad = radians(lat1), radians(lat2)
-    delta_lat, delta_lon = radians(lat2 - lat1), radians(lon2 - lon1)
-    a = sin(delta_lat / 2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(delta_lon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
-
-
 def generate_color_from_numero(numero):
     """Génère une couleur à partir du numéro de bus"""
     colors = ['#e74c3c', '#3498db', '#27ae60', '#f39c12', '#9b59b6',
@@ -664,6 +763,7 @@ def generate_color_from_numero(numero):
     # ========== NOUVELLES API TRAJETS ==========
 
 @api_view(['GET'])
+@caches.en_cache('reseau')
 def get_bus_trajet(request, bus_id):
     """
     Récupère les trajets d'un bus avec tous ses arrêts ordonnés
@@ -727,6 +827,7 @@ def get_bus_trajet(request, bus_id):
 
 
 @api_view(['GET'])
+@caches.en_cache('reseau')
 def get_all_bus_trajets(request):
     """
     Récupère tous les bus avec un résumé de leurs trajets
@@ -767,6 +868,7 @@ def get_all_bus_trajets(request):
 
 
 @api_view(['GET'])
+@caches.en_cache('reseau')
 def get_trajet_detail(request, trajet_id):
     """
     Récupère le détail d'un trajet spécifique
@@ -809,6 +911,7 @@ def get_trajet_detail(request, trajet_id):
 
 
 @api_view(['GET'])
+@caches.en_cache('reseau')
 def get_trajet_geojson(request, trajet_id):
     """
     Récupère un trajet au format GeoJSON pour affichage carte
@@ -869,6 +972,7 @@ def get_trajet_geojson(request, trajet_id):
 
 
 @api_view(['GET'])
+@caches.en_cache('reseau')
 def get_bus_geojson(request, bus_id):
     """
     Récupère les trajets d'un bus au format GeoJSON
@@ -929,6 +1033,7 @@ def get_bus_geojson(request, bus_id):
 
 
 @api_view(['GET'])
+@caches.en_cache('reseau')
 def get_all_trajets_geojson(request):
     """
     Récupère tous les trajets au format GeoJSON
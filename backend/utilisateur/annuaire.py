@@ -0,0 +1,84 @@
+# utilisateur/annuaire.py
+"""
+Liste admin des utilisateurs, paginée par clé (username).
+
+Chaque page est une seule requête : profils + User (jointure) et compteurs
+d'activité en sous-requêtes (utilisateur/stats.py), sans OFFSET ni COUNT(*).
+La recherche ?q= est un préfixe insensible à la casse sur username, email
+et nom, servi par les index UPPER(...) text_pattern_ops (migration 0002).
+"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import Utilisateur
+from . import stats
+
+
+def filtrer(qs, params):
+    """Filtres ?q= (préfixe), ?role=, ?active=, ?staff= de la liste admin."""
+    q = (params.get('q') or '').strip()
+    role = params.get('role')
+    active = params.get('active')
+    staff = params.get('staff')
+
+    if q:
+        qs = qs.filter(
+            Q(username__istartswith=q) |
+            Q(email__istartswith=q) |
+            Q(nom__istartswith=q)
+        )
+    if role:
+        qs = qs.filter(role__iexact=role)
+    if active in ('true', 'false'):
+        qs = qs.filter(user__is_active=active == 'true')
+    if staff in ('true', 'false'):
+        qs = qs.filter(user__is_staff=staff == 'true')
+    return qs
+
+
+def annoter(qs):
+    return stats.annoter(qs.select_related('user'))
+
+
+def encoder_curseur(username):
+    return base64.urlsafe_b64encode(username.encode()).decode()
+
+
+def decoder_curseur(curseur):
+    """Dernier username vu ; ValueError si le curseur est invalide."""
+    try:
+        return base64.urlsafe_b64decode(curseur.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError('curseur invalide')
+
+
+def page(qs, curseur=None, limit=None):
+    """{'cursor', 'has_more', 'results': [profils]} ; lève ValueError sur un curseur invalide."""
+    limit = min(limit or getattr(settings, 'ADMIN_USERS_PAGE_SIZE', 50), 200)
+    if limit < 1:
+        raise ValueError('limit invalide')
+    qs = qs.order_by('username')
+    if curseur:
+        qs = qs.filter(username__gt=decoder_curseur(curseur))
+    lignes = list(qs[:limit + 1])
+    has_more = len(lignes) > limit
+    lignes = lignes[:limit]
+    return {
+        'cursor': encoder_curseur(lignes[-1].username) if has_more else None,
+        'has_more': has_more,
+        'results': lignes,
+    }
+
+
+def resume():
+    """Totaux pour le tableau de bord admin (deux requêtes agrégées)."""
+    totaux = Utilisateur.objects.aggregate(
+        total=Count('pk'),
+        actifs=Count('pk', filter=Q(user__is_active=True)),
+        staff=Count('pk', filter=Q(user__is_staff=True)),
+    )
+    par_role = Utilisateur.objects.order_by().values_list('role').annotate(n=Count('pk'))
+    return {**totaux, 'par_role': dict(par_role)}
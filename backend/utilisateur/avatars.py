@@ -0,0 +1,151 @@
+# utilisateur/avatars.py
+"""
+Miniatures des avatars.
+
+L'original uploadé reste dans avatars/ ; après le commit, un pool de threads
+local en tire des variantes carrées de taille fixe (TAILLES) en WebP et JPEG,
+nommées d'après le hash du contenu : avatars/v/<hash>-<taille>.<ext>. Un
+même nom désigne toujours le même contenu, d'où le cache HTTP « immutable »
+(voir servir_variante). Tant que le traitement n'est pas terminé,
+profile.avatar_hash est vide et les clients retombent sur l'original.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+from PIL import Image, ImageOps
+
+# Côté du carré, en pixels (sm : avatars de liste et d'en-tête, md / lg : profil)
+TAILLES = {'sm': 96, 'md': 256, 'lg': 512}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+DOSSIER = 'avatars/v'
+CACHE_UN_AN = 60 * 60 * 24 * 365
+
+_pool = None
+_verrou = threading.Lock()
+
+
+def _executeur():
+    global _pool
+    with _verrou:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'AVATAR_WORKERS', 2),
+                thread_name_prefix='avatars',
+            )
+        return _pool
+
+
+def nom_variante(empreinte, taille, fmt):
+    return f'{DOSSIER}/{empreinte}-{taille}.{EXTENSIONS[fmt]}'
+
+
+def variantes(profile, request=None):
+    """{taille: {format: url}} de l'avatar, None s'il n'est pas encore traité."""
+    if not profile.avatar or not profile.avatar_hash:
+        return None
+    resultat = {}
+    for taille in TAILLES:
+        resultat[taille] = {}
+        for fmt in FORMATS:
+            url = default_storage.url(nom_variante(profile.avatar_hash, taille, fmt))
+            resultat[taille][fmt] = request.build_absolute_uri(url) if request else url
+    return resultat
+
+
+# ========== TRAITEMENT ==========
+
+def _ouvrir(contenu):
+    image = Image.open(BytesIO(contenu))
+    # JPEG : décodage directement à une résolution réduite (DCT), bien plus rapide
+    image.draft('RGB', (max(TAILLES.values()),) * 2)
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        fond = Image.new('RGB', image.size, 'white')
+        fond.paste(image, mask=image.getchannel('A'))
+        return fond
+    return image.convert('RGB')
+
+
+def generer(contenu):
+    """Écrit les variantes de `contenu` (octets de l'original) ; retourne le hash."""
+    empreinte = hashlib.sha256(contenu).hexdigest()[:20]
+    noms = {
+        (taille, fmt): nom_variante(empreinte, taille, fmt)
+        for taille in TAILLES for fmt in FORMATS
+    }
+    if all(default_storage.exists(nom) for nom in noms.values()):
+        return empreinte  # même image déjà traitée
+
+    image = _ouvrir(contenu)
+    for taille, cote in TAILLES.items():
+        carre = ImageOps.fit(image, (cote, cote), Image.LANCZOS)
+        for fmt, (format_pil, options) in FORMATS.items():
+            nom = noms[(taille, fmt)]
+            if default_storage.exists(nom):
+                continue
+            tampon = BytesIO()
+            carre.save(tampon, format_pil, **options)
+            default_storage.save(nom, ContentFile(tampon.getvalue()))
+    return empreinte
+
+
+def traiter(user_id, nom_avatar):
+    """
+    Génère les variantes de l'avatar `nom_avatar` puis enregistre le hash,
+    sauf si l'avatar a été remplacé entre-temps.
+    """
+    from authentification.authentication import invalider_utilisateur
+    from .models import Utilisateur
+
+    try:
+        with default_storage.open(nom_avatar, 'rb') as f:
+            contenu = f.read()
+        empreinte = generer(contenu)
+        n = Utilisateur.objects.filter(pk=user_id, avatar=nom_avatar).update(avatar_hash=empreinte)
+        if n:
+            invalider_utilisateur(user_id)
+    except Exception:
+        logger.exception("Erreur miniatures avatar (%s)", nom_avatar)
+
+
+def _dans_le_pool(user_id, nom_avatar):
+    try:
+        traiter(user_id, nom_avatar)
+    finally:
+        connection.close()  # connexion propre au thread du pool
+
+
+def planifier(user_id, nom_avatar):
+    """Traitement après le commit : dans le pool, ou sur place si AVATAR_WORKERS = 0."""
+    def lancer():
+        if getattr(settings, 'AVATAR_WORKERS', 2) > 0:
+            _executeur().submit(_dans_le_pool, user_id, nom_avatar)
+        else:
+            traiter(user_id, nom_avatar)
+    transaction.on_commit(lancer)
+
+
+# ========== SERVICE ==========
+
+def servir_variante(request, path):
+    """Sert avatars/v/ avec un cache d'un an : le nom change avec le contenu."""
+    reponse = serve(request, path, document_root=os.path.join(settings.MEDIA_ROOT, DOSSIER))
+    patch_cache_control(reponse, public=True, max_age=CACHE_UN_AN, immutable=True)
+    return reponse
@@ -0,0 +1,28 @@
+# utilisateur/management/commands/generer_miniatures.py
+"""
+Génère les miniatures des avatars qui n'en ont pas encore (avatars uploadés
+avant utilisateur/avatars.py, ou traitement interrompu).
+"""
+
+from django.core.management.base import BaseCommand
+
+from utilisateur import avatars
+from utilisateur.models import Utilisateur
+
+
+class Command(BaseCommand):
+    help = "Génère les miniatures WebP/JPEG des avatars sans variantes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tous', action='store_true', help='Régénérer aussi les avatars déjà traités')
+
+    def handle(self, *args, **options):
+        qs = Utilisateur.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        if not options['tous']:
+            qs = qs.filter(avatar_hash='')
+
+        n = 0
+        for user_id, nom in qs.values_list('pk', 'avatar').iterator():
+            avatars.traiter(user_id, nom)
+            n += 1
+        self.stdout.write(self.style.SUCCESS(f'✅ {n} avatar(s) traité(s)'))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:05
+
+from django.db import migrations
+from django.db.models import F, Q
+
+CHAMPS_INDEXES = ('username', 'email', 'nom')
+
+
+def synchroniser_profils(apps, schema_editor):
+    """Recopie username / email du User dans les profils désynchronisés."""
+    Utilisateur = apps.get_model('utilisateur', 'Utilisateur')
+    desynchronises = Utilisateur.objects.exclude(
+        Q(username=F('user__username')) & Q(email=F('user__email'))
+    ).select_related('user')
+    for profil in desynchronises.iterator():
+        Utilisateur.objects.filter(pk=profil.pk).update(
+            username=profil.user.username, email=profil.user.email,
+        )
+
+
+def creer_index(apps, schema_editor):
+    """
+    PostgreSQL : index UPPER(champ) text_pattern_ops pour les filtres
+    istartswith (UPPER(champ::text) LIKE UPPER('q%')), quelle que soit la collation.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for champ in CHAMPS_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS utilisateur_profile_{champ}_prefixe '
+            f'ON utilisateur_profile (UPPER({champ}::text) text_pattern_ops)'
+        )
+
+
+def supprimer_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for champ in CHAMPS_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS utilisateur_profile_{champ}_prefixe')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilisateur', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(synchroniser_profils, migrations.RunPython.noop),
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
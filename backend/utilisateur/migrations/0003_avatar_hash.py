@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilisateur', '0002_recherche_utilisateurs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='utilisateur',
+            name='avatar_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, pre_save
 from django.dispatch import receiver
 
+from . import avatars
+
 class Utilisateur(models.Model):
     ROLE_CHOICES = [
         ('user', 'Utilisateur'),
@@ -19,6 +21,8 @@ class Utilisateur(models.Model):
     email = models.EmailField(blank=True, null=True)
     nom = models.CharField(max_length=255, blank=True, null=True)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    # Hash du contenu de l'avatar une fois ses miniatures générées (utilisateur/avatars.py)
+    avatar_hash = models.CharField(max_length=40, blank=True, default='')
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='user')
     date_creation = models.DateTimeField(auto_now_add=True)
     date_derniere_connexion = models.DateTimeField(null=True, blank=True)
@@ -30,20 +34,93 @@ class Utilisateur(models.Model):
     def __str__(self):
         return self.username
 
+# ========================== PROFIL ======================================
+
+# Champs du User recopiés dans le profil
+CHAMPS_SYNCHRONISES = ('username', 'email')
+
+
+def profil_de(user):
+    """Profil de `user` (déjà chargé ou lu une fois), None s'il n'existe pas."""
+    try:
+        return user.profile
+    except Utilisateur.DoesNotExist:
+        return None
+
+
+def assurer_profil(user):
+    """
+    Profil de `user`, créé s'il n'existe pas encore. Seul point de création
+    des profils (signal, inscription, vues) : aucune écriture s'il existe.
+    """
+    profile = profil_de(user)
+    if profile is None:
+        profile, _ = Utilisateur.objects.get_or_create(
+            user=user,
+            defaults={'username': user.username, 'email': user.email, 'nom': user.username},
+        )
+        user.profile = profile
+    return profile
+
 # ========================== SIGNALS ======================================
 
+@receiver(post_init, sender=User)
+def memoriser_user(sender, instance, **kwargs):
+    # __dict__ : ne pas charger un champ différé à chaque instanciation
+    instance._profil_initial = tuple(instance.__dict__.get(champ) for champ in CHAMPS_SYNCHRONISES)
+
+
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def synchroniser_profil(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Crée le profil d'un nouvel utilisateur ; ensuite, ne recopie username /
+    email que s'ils ont changé (rien à écrire pour une mise à jour de
+    last_login à la connexion).
+    """
+    valeurs = tuple(getattr(instance, champ) for champ in CHAMPS_SYNCHRONISES)
+    initial = getattr(instance, '_profil_initial', None)  # absent : instance venue du cache
+    instance._profil_initial = valeurs
+
     if created:
-        Utilisateur.objects.get_or_create(
-            user=instance,
-            defaults={
-                'username': instance.username,
-                'email': instance.email
-            }
-        )
+        assurer_profil(instance)
+        return
+    if update_fields is not None and not set(update_fields) & set(CHAMPS_SYNCHRONISES):
+        return
+    if valeurs == initial:
+        return
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
\ No newline at end of file
+    champs = dict(zip(CHAMPS_SYNCHRONISES, valeurs))
+    Utilisateur.objects.filter(user=instance).exclude(**champs).update(**champs)
+    profile = instance._state.fields_cache.get('profile')
+    if profile is not None:
+        for champ, valeur in champs.items():
+            setattr(profile, champ, valeur)
+
+
+def _nom_avatar(valeur):
+    return getattr(valeur, 'name', valeur) or ''
+
+
+@receiver(post_init, sender=Utilisateur)
+def memoriser_avatar(sender, instance, **kwargs):
+    instance._avatar_initial = _nom_avatar(instance.__dict__.get('avatar'))
+
+
+@receiver(pre_save, sender=Utilisateur)
+def detecter_nouvel_avatar(sender, instance, update_fields=None, **kwargs):
+    """Nouvel avatar : les miniatures de l'ancien ne valent plus."""
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    instance._avatar_change = _nom_avatar(instance.avatar) != getattr(instance, '_avatar_initial', '')
+    if instance._avatar_change:
+        instance.avatar_hash = ''
+
+
+@receiver(post_save, sender=Utilisateur)
+def planifier_miniatures(sender, instance, **kwargs):
+    if not getattr(instance, '_avatar_change', False):
+        return
+    instance._avatar_change = False
+    instance._avatar_initial = _nom_avatar(instance.avatar)
+    if instance.avatar:
+        avatars.planifier(instance.pk, instance.avatar.name)
@@ -4,7 +4,8 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.db import IntegrityError
-from .models import Utilisateur
+from .models import Utilisateur, assurer_profil, profil_de
+from . import avatars
 
 User = get_user_model()
 
@@ -21,6 +22,7 @@ class UtilisateurSerializer(serializers.ModelSerializer):
     is_staff = serializers.BooleanField(source='user.is_staff', read_only=True)
     is_superuser = serializers.BooleanField(source='user.is_superuser', read_only=True)
     avatar_url = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
     is_admin = serializers.SerializerMethodField()  # ✅ Ajout du champ is_admin
 
     class Meta:
@@ -33,6 +35,7 @@ class UtilisateurSerializer(serializers.ModelSerializer):
             'nom',
             'avatar',
             'avatar_url',
+            'avatar_variants',
             'reputation',
             'role',
             'date_derniere_connexion',
@@ -54,6 +57,10 @@ class UtilisateurSerializer(serializers.ModelSerializer):
             return obj.avatar.url
         return None
 
+    def get_avatar_variants(self, obj):
+        """Miniatures {sm, md, lg} x {webp, jpeg} ; None tant qu'elles ne sont pas prêtes"""
+        return avatars.variantes(obj, self.context.get('request'))
+
     def get_is_admin(self, obj):
         """✅ CORRECTION: Méthode correctement indentée"""
         try:
@@ -77,6 +84,21 @@ class UtilisateurSerializer(serializers.ModelSerializer):
         return instance
 
 
+class UtilisateurAdminSerializer(UtilisateurSerializer):
+    """Liste admin : profil + compteurs d'activité annotés (voir utilisateur/annuaire.py)"""
+    favoris_count = serializers.IntegerField(read_only=True, default=0)
+    contributions_count = serializers.IntegerField(read_only=True, default=0)
+    commentaires_count = serializers.IntegerField(read_only=True, default=0)
+
+    class Meta(UtilisateurSerializer.Meta):
+        fields = UtilisateurSerializer.Meta.fields + [
+            'date_creation',
+            'favoris_count',
+            'contributions_count',
+            'commentaires_count',
+        ]
+
+
 # =============================================================
 # 2. USER SERIALIZER (pour l'authentification)
 # =============================================================
@@ -104,7 +126,7 @@ class UserSerializer(serializers.ModelSerializer):
     def get_role(self, obj):
         """Récupérer le rôle depuis le profil Utilisateur"""
         try:
-            profile = Utilisateur.objects.filter(user=obj).first()
+            profile = profil_de(obj)
             if profile:
                 return profile.role
             return 'user'
@@ -114,7 +136,7 @@ class UserSerializer(serializers.ModelSerializer):
     def get_is_admin(self, obj):
         """Vérifier si l'utilisateur est admin"""
         try:
-            profile = Utilisateur.objects.filter(user=obj).first()
+            profile = profil_de(obj)
             return (
                 obj.is_staff or 
                 obj.is_superuser or 
@@ -126,7 +148,7 @@ class UserSerializer(serializers.ModelSerializer):
     def get_reputation(self, obj):
         """Récupérer la réputation depuis le profil"""
         try:
-            profile = Utilisateur.objects.filter(user=obj).first()
+            profile = profil_de(obj)
             if profile:
                 return profile.reputation
             return 0
@@ -202,19 +224,13 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
                 password=password
             )
 
-            # Vérifier si un profil existe déjà (cas rare)
-            profile, created = Utilisateur.objects.get_or_create(
-                user=user,
-                defaults={
-                    'nom': username,
-                    'avatar': avatar,
-                    **validated_data
-                }
-            )
-
-            # Si le profil existait déjà, mettre à jour l'avatar
-            if not created and avatar:
+            # Profil créé par le signal post_save du User
+            profile = assurer_profil(user)
+            for champ, valeur in validated_data.items():
+                setattr(profile, champ, valeur)
+            if avatar:
                 profile.avatar = avatar
+            if avatar or validated_data:
                 profile.save()
 
             return profile
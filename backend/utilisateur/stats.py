@@ -0,0 +1,71 @@
+# utilisateur/stats.py
+"""
+Compteurs d'activité d'un utilisateur (page profil).
+
+Réputation, favoris, contributions et commentaires sont lus en une seule
+requête (sous-requêtes COUNT corrélées) puis gardés en cache quelques
+instants par utilisateur (espace de cache 'utilisateurs'). Le cache est
+invalidé à chaque écriture qui les modifie (interaction/signals.py,
+interaction/moderation.py).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from taxibe_backend import caches
+
+VIDE = {
+    'reputation': 0,
+    'favoris_count': 0,
+    'contributions_count': 0,
+    'commentaires_count': 0,
+}
+
+
+def _compte(model):
+    """COUNT(*) des lignes de `model` appartenant à l'utilisateur courant (OuterRef)."""
+    qs = (
+        model.objects.filter(utilisateurRef=OuterRef('pk'))
+        .order_by().values('utilisateurRef')
+        .annotate(n=Count('pk')).values('n')
+    )
+    return Coalesce(Subquery(qs, output_field=IntegerField()), Value(0))
+
+
+def annoter(qs):
+    """
+    Ajoute favoris_count / contributions_count / commentaires_count à un
+    queryset de User ou de profils (même clé primaire).
+    """
+    from interaction.models import Commentaire, Contribution, Favori
+
+    return qs.annotate(
+        favoris_count=_compte(Favori),
+        contributions_count=_compte(Contribution),
+        commentaires_count=_compte(Commentaire),
+    )
+
+
+def calculer(user_id):
+    """Compteurs de l'utilisateur, en une requête."""
+    ligne = (
+        annoter(get_user_model().objects.filter(pk=user_id))
+        .annotate(reputation=Coalesce('profile__reputation', Value(0)))
+        .values(*VIDE)
+        .first()
+    )
+    return ligne or dict(VIDE)
+
+
+def compteurs(user_id):
+    """Compteurs en cache (USER_STATS_TTL secondes), recalculés si absents."""
+    return caches.obtenir(
+        'utilisateurs', ('stats', user_id),
+        lambda: calculer(user_id),
+        getattr(settings, 'USER_STATS_TTL', 60),
+    )
+
+
+def invalider(*user_ids):
+    caches.supprimer('utilisateurs', *[('stats', user_id) for user_id in user_ids if user_id])
@@ -1,3 +1,270 @@
-from django.test import TestCase
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from interaction.models import Commentaire, Contribution, Favori
+from interaction.moderation import ajuster_reputation
+from transport.tests import creer_reseau
+from . import avatars, stats
+from .models import Utilisateur
+
+
+# ========== LISTE ADMIN DES UTILISATEURS ==========
+
+class ListeUtilisateursTests(TestCase):
+    URL = '/api/utilisateur/users/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        for nom in ('Rakoto', 'rabe', 'Rasoa', 'Jean', 'Hery', 'Fara'):
+            User.objects.create_user(nom, email=f'{nom.lower()}@taxibe.mg', password='x')
+        Utilisateur.objects.filter(username='Hery').update(nom='Randria')
+        Commentaire.objects.create(utilisateurRef=User.objects.get(username='Jean'), contenu='Bien')
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def parcourir(self, **params):
+        noms, curseur = [], None
+        while True:
+            page = self.api.get(self.URL, {**params, **({'cursor': curseur} if curseur else {})}).json()
+            noms += [u['username'] for u in page['results']]
+            if not page['has_more']:
+                self.assertIsNone(page['cursor'])
+                return noms
+            curseur = page['cursor']
+
+    def test_pages_par_username(self):
+        tous = list(Utilisateur.objects.order_by('username').values_list('username', flat=True))  # collation de la base
+        self.assertEqual(len(tous), 7)
+        self.assertEqual(self.parcourir(limit=2), tous)
+        self.assertEqual(self.parcourir(limit=200), tous)
+
+    def test_recherche_par_prefixe(self):
+        # username, email ou nom ; insensible à la casse
+        self.assertEqual(sorted(self.parcourir(q='RA', limit=2)), ['Hery', 'Rakoto', 'Rasoa', 'rabe'])
+        self.assertEqual(self.parcourir(q='jean@'), ['Jean'])
+        self.assertEqual(self.parcourir(q='akoto'), [])
+
+    def test_compteurs_annotes(self):
+        resultats = {u['username']: u for u in self.api.get(self.URL, {'q': 'j'}).json()['results']}
+        self.assertEqual(resultats['Jean']['commentaires_count'], 1)
+
+    def test_requetes_independantes_de_la_taille(self):
+        with CaptureQueriesContext(connection) as petite:
+            self.api.get(self.URL, {'limit': 2})
+        with CaptureQueriesContext(connection) as grande:
+            self.api.get(self.URL, {'limit': 7})
+        self.assertEqual(len(petite), len(grande))
+
+    def test_parametres_invalides(self):
+        for params in ({'cursor': 'abc'}, {'limit': '-1'}, {'limit': 'x'}):
+            self.assertEqual(self.api.get(self.URL, params).status_code, 400, params)
+
+    def test_reserve_au_staff(self):
+        self.api.force_authenticate(User.objects.get(username='Jean'))
+        self.assertEqual(self.api.get(self.URL).status_code, 403)
+
+
+# ========== COMPTEURS D'ACTIVITÉ ==========
+
+class StatsUtilisateurTests(TestCase):
+    URL = '/api/utilisateur/stats/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ville, cls.quartier, cls.arrets, cls.bus = creer_reseau()
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.bob = User.objects.create_user('bob', password='x')
+        Commentaire.objects.create(utilisateurRef=cls.alice, busRef=cls.bus, contenu='Bien', note=4)
+        Commentaire.objects.create(utilisateurRef=cls.alice, busRef=cls.bus, contenu='Lent', note=2)
+        Contribution.objects.create(utilisateurRef=cls.alice, description='Nouvel arrêt')
+        Favori.objects.create(utilisateurRef=cls.bob, busRef=cls.bus)
+
+    def setUp(self):
+        cache.clear()
+
+    def compteurs(self, user, requetes):
+        with self.assertNumQueries(requetes):
+            return stats.compteurs(user.pk)
+
+    def ecrire(self, fonction, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return fonction(*args, **kwargs)
+
+    def test_une_requete_puis_cache(self):
+        attendu = {'reputation': 0, 'favoris_count': 0, 'contributions_count': 1, 'commentaires_count': 2}
+        self.assertEqual(self.compteurs(self.alice, 1), attendu)
+        self.assertEqual(self.compteurs(self.alice, 0), attendu)
+        self.assertEqual(self.compteurs(self.bob, 1)['favoris_count'], 1)
+
+    def test_invalide_apres_chaque_ecriture(self):
+        self.compteurs(self.alice, 1)
+        favori = self.ecrire(Favori.objects.create, utilisateurRef=self.alice, busRef=self.bus)
+        self.assertEqual(self.compteurs(self.alice, 1)['favoris_count'], 1)
+        self.ecrire(favori.delete)
+        self.assertEqual(self.compteurs(self.alice, 1)['favoris_count'], 0)
+
+        self.ecrire(Contribution.objects.create, utilisateurRef=self.alice, description='Tarif')
+        self.assertEqual(self.compteurs(self.alice, 1)['contributions_count'], 2)
+
+        commentaire = self.ecrire(Commentaire.objects.create, utilisateurRef=self.alice, contenu='Propre', note=5)
+        self.assertEqual(self.compteurs(self.alice, 1)['commentaires_count'], 3)
+        self.ecrire(commentaire.delete)
+        self.assertEqual(self.compteurs(self.alice, 1)['commentaires_count'], 2)
+
+        self.ecrire(ajuster_reputation, {self.alice.pk: 5})
+        self.assertEqual(self.compteurs(self.alice, 1)['reputation'], 5)
+
+    def test_ecriture_d_un_autre_utilisateur(self):
+        self.compteurs(self.alice, 1)
+        self.ecrire(Contribution.objects.create, utilisateurRef=self.bob, description='Horaires')
+        self.compteurs(self.alice, 0)
+
+    def test_vue(self):
+        api = APIClient()
+        self.assertEqual(api.get(self.URL).status_code, 401)
+        api.force_authenticate(self.alice)
+        self.assertEqual(api.get(self.URL).json(), stats.compteurs(self.alice.pk))
+
+
+# ========== SYNCHRONISATION DU PROFIL ==========
+
+class SynchronisationProfilTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user('rakoto', email='rakoto@taxibe.mg', password='x')
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.get(username='rakoto')
+
+    def profil(self):
+        return Utilisateur.objects.values_list('username', 'email').get(user=self.user)
+
+    def test_rien_a_ecrire_si_inchange(self):
+        self.user.first_name = 'Jean'
+        with self.assertNumQueries(1):  # UPDATE auth_user seul
+            self.user.save()
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['last_login'])
+
+    def test_recopie_username_et_email(self):
+        self.user.email = 'jean@taxibe.mg'
+        with self.assertNumQueries(2):
+            self.user.save()
+        self.assertEqual(self.profil(), ('rakoto', 'jean@taxibe.mg'))
+        with self.assertNumQueries(1):  # état mémorisé après l'écriture
+            self.user.save()
+
+        self.user.username = 'jean'
+        self.user.save(update_fields=['username'])
+        self.assertEqual(self.profil(), ('jean', 'jean@taxibe.mg'))
+
+    def test_profil_charge_mis_a_jour(self):
+        profile = self.user.profile
+        self.user.username = 'jean'
+        self.user.save()
+        self.assertEqual(profile.username, 'jean')
+
+    def test_instance_sans_etat_initial(self):
+        # Instance venue du cache JWT : pas d'état mémorisé, on compare en base
+        del self.user._profil_initial
+        self.user.email = 'autre@taxibe.mg'
+        self.user.save()
+        self.assertEqual(self.profil(), ('rakoto', 'autre@taxibe.mg'))
+
+
+# ========== MINIATURES DES AVATARS ==========
+
+def image_png(couleur, taille=(600, 400)):
+    tampon = BytesIO()
+    Image.new('RGBA', taille, couleur).save(tampon, 'PNG')
+    return tampon.getvalue()
+
+
+@override_settings(AVATAR_WORKERS=0)
+class AvatarsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('rakoto', password='x')
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        reglages = override_settings(MEDIA_ROOT=media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.profile = Utilisateur.objects.get(user=self.user)
+
+    def televerser(self, contenu):
+        self.profile.avatar = SimpleUploadedFile('photo.png', contenu, content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.save()
+        self.profile.refresh_from_db()
+        return self.profile.avatar_hash
+
+    def test_variantes_nommees_par_le_contenu(self):
+        contenu = image_png((200, 30, 30, 128))
+        empreinte = self.televerser(contenu)
+        self.assertEqual(empreinte, hashlib.sha256(contenu).hexdigest()[:20])
+        for taille, cote in avatars.TAILLES.items():
+            for fmt in avatars.FORMATS:
+                with default_storage.open(avatars.nom_variante(empreinte, taille, fmt)) as f:
+                    image = Image.open(f)
+                    self.assertEqual((image.size, image.mode), ((cote, cote), 'RGB'))
+        urls = avatars.variantes(self.profile)
+        self.assertEqual(urls['sm']['webp'], default_storage.url(f'avatars/v/{empreinte}-sm.webp'))
+
+    def test_meme_image_non_retraitee(self):
+        contenu = image_png('blue')
+        empreinte = self.televerser(contenu)
+        with mock.patch.object(avatars, '_ouvrir', side_effect=AssertionError('déjà traitée')):
+            self.assertEqual(self.televerser(contenu), empreinte)
+
+    def test_nouvel_avatar_remplace_le_hash(self):
+        ancienne = self.televerser(image_png('blue'))
+        ancien_nom = self.profile.avatar.name
+        self.profile.avatar = SimpleUploadedFile('autre.png', image_png('green'), content_type='image/png')
+        self.profile.save()
+        self.assertEqual(Utilisateur.objects.get(pk=self.profile.pk).avatar_hash, '')
+        # Traitement en retard de l'ancien avatar : ne doit pas écraser le nouveau
+        avatars.traiter(self.profile.pk, ancien_nom)
+        self.assertEqual(Utilisateur.objects.get(pk=self.profile.pk).avatar_hash, '')
+        with self.captureOnCommitCallbacks(execute=True):
+            avatars.planifier(self.profile.pk, self.profile.avatar.name)
+        self.assertNotIn(Utilisateur.objects.get(pk=self.profile.pk).avatar_hash, ('', ancienne))
+
+    def test_autre_champ_sans_traitement(self):
+        self.televerser(image_png('blue'))
+        self.profile.nom = 'Rakoto'
+        with self.captureOnCommitCallbacks() as rappels:
+            self.profile.save()
+        self.assertEqual(rappels, [])
+        self.assertIsNotNone(avatars.variantes(Utilisateur.objects.get(pk=self.profile.pk)))
+
+    def test_variante_servie_avec_cache_immuable(self):
+        empreinte = self.televerser(image_png('blue'))
+        reponse = self.client.get(reverse('avatar_variante', kwargs={'path': f'{empreinte}-md.jpg'}))
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIn('immutable', reponse['Cache-Control'])
+        self.assertIn(f'max-age={avatars.CACHE_UN_AN}', reponse['Cache-Control'])
@@ -1,4 +1,5 @@
 # utilisateur/views.py
+import logging
 
 from rest_framework import viewsets, generics, permissions, status
 from rest_framework.views import APIView
@@ -8,17 +9,19 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated  # ✅ Import ajouté
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError
-from django.db.models import Q  # ✅ Import ajouté
 
-from .models import Utilisateur
+from .models import Utilisateur, assurer_profil, profil_de
+from . import annuaire, stats
 from .serializers import (
     UtilisateurSerializer,
+    UtilisateurAdminSerializer,
     PasswordChangeSerializer,
     UserRegistrationSerializer,
     UserSerializer,  # ✅ Import ajouté
 )
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 # ============================
@@ -31,10 +34,7 @@ class MeView(APIView):
     def get(self, request):
         """Récupérer le profil de l'utilisateur connecté"""
         try:
-            profile, created = Utilisateur.objects.get_or_create(
-                user=request.user,
-                defaults={'nom': request.user.username}
-            )
+            profile = assurer_profil(request.user)
             
             serializer = UtilisateurSerializer(profile, context={'request': request})
             data = serializer.data
@@ -57,18 +57,13 @@ class MeView(APIView):
             return Response(data)
             
         except Exception as e:
-            print("❌ Erreur GET /me :", str(e))
-            import traceback
-            traceback.print_exc()
+            logger.exception("Erreur GET /me")
             return Response({'error': str(e)}, status=500)
 
     def patch(self, request):
         """Mettre à jour le profil"""
         try:
-            profile, created = Utilisateur.objects.get_or_create(
-                user=request.user,
-                defaults={'nom': request.user.username}
-            )
+            profile = assurer_profil(request.user)
             
             serializer = UtilisateurSerializer(
                 profile, 
@@ -106,9 +101,7 @@ class MeView(APIView):
             return Response(updated_data, status=200)
             
         except Exception as e:
-            print("❌ Erreur PATCH /me :", str(e))
-            import traceback
-            traceback.print_exc()
+            logger.exception("Erreur PATCH /me")
             return Response({'error': str(e)}, status=500)
 
     def put(self, request):
@@ -124,10 +117,7 @@ class UpdateProfileView(APIView):
 
     def patch(self, request):
         try:
-            profile, _ = Utilisateur.objects.get_or_create(
-                user=request.user,
-                defaults={'nom': request.user.username}
-            )
+            profile = assurer_profil(request.user)
             
             serializer = UtilisateurSerializer(
                 profile, 
@@ -155,9 +145,7 @@ class UpdateProfileView(APIView):
             return Response(data, status=200)
             
         except Exception as e:
-            print("❌ Erreur UpdateProfileView:", str(e))
-            import traceback
-            traceback.print_exc()
+            logger.exception("Erreur UpdateProfileView")
             return Response({'error': str(e)}, status=500)
 
     def put(self, request):
@@ -168,53 +156,15 @@ class UpdateProfileView(APIView):
 # 📊 3. Vue Stats
 # ============================
 class UserStatsView(APIView):
-    """Vue pour les statistiques utilisateur"""
+    """Vue pour les statistiques utilisateur (une requête, puis cache court)"""
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         try:
-            profile = Utilisateur.objects.filter(user=request.user).first()
-            
-            favoris_count = 0
-            contributions_count = 0
-            commentaires_count = 0
-            
-            try:
-                from interaction.models import Favori, Contribution, Commentaire
-                
-                try:
-                    favoris_count = Favori.objects.filter(utilisateurRef=request.user).count()
-                except:
-                    pass
-                    
-                try:
-                    contributions_count = Contribution.objects.filter(utilisateurRef=request.user).count()
-                except:
-                    pass
-                    
-                try:
-                    commentaires_count = Commentaire.objects.filter(utilisateurRef=request.user).count()
-                except:
-                    pass
-                    
-            except Exception as e:
-                print(f"⚠️ Erreur import interaction models: {e}")
-            
-            return Response({
-                'reputation': profile.reputation if profile else 0,
-                'favoris_count': favoris_count,
-                'contributions_count': contributions_count,
-                'commentaires_count': commentaires_count,
-            })
-            
-        except Exception as e:
-            print(f"❌ Erreur stats view: {e}")
-            return Response({
-                'reputation': 0,
-                'favoris_count': 0,
-                'contributions_count': 0,
-                'commentaires_count': 0,
-            })
+            return Response(stats.compteurs(request.user.id))
+        except Exception:
+            logger.exception("Erreur stats utilisateur")
+            return Response(dict(stats.VIDE))
 
 
 # ============================
@@ -255,11 +205,8 @@ class ChangePasswordView(APIView):
 @permission_classes([permissions.IsAuthenticated])
 def ensure_profile_view(request):
     try:
-        user = request.user
-        profil, created = Utilisateur.objects.get_or_create(
-            user=user,
-            defaults={'nom': user.username}
-        )
+        created = profil_de(request.user) is None
+        assurer_profil(request.user)
         return Response({'message': 'Profil assuré.', 'created': created}, status=200)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
@@ -278,34 +225,35 @@ class UtilisateurViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-
-        params = self.request.query_params
-        q = params.get('q')
-        role = params.get('role')
-        active = params.get('active')
-        staff = params.get('staff')
-
-        if q:
-            qs = qs.filter(
-                Q(user__username__icontains=q) |
-                Q(user__email__icontains=q) |
-                Q(nom__icontains=q)
-            )
-
-        if role:
-            qs = qs.filter(role__iexact=role)
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return UtilisateurAdminSerializer
+        return super().get_serializer_class()
 
-        if active in ('true', 'false'):
-            is_active = active == 'true'
-            qs = qs.filter(user__is_active=is_active)
+    def get_queryset(self):
+        qs = annuaire.filtrer(super().get_queryset(), self.request.query_params)
+        if self.action in ('list', 'retrieve'):
+            qs = annuaire.annoter(qs)
+        return qs
 
-        if staff in ('true', 'false'):
-            is_staff = staff == 'true'
-            qs = qs.filter(user__is_staff=is_staff)
+    def list(self, request, *args, **kwargs):
+        """Page de la liste : ?cursor=<curseur opaque>&limit=N (+ q, role, active, staff)"""
+        limit = request.query_params.get('limit')
+        try:
+            page = annuaire.page(
+                self.get_queryset(),
+                curseur=request.query_params.get('cursor'),
+                limit=int(limit) if limit else None,
+            )
+        except ValueError:
+            return Response({'error': 'cursor ou limit invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        page['results'] = self.get_serializer(page['results'], many=True).data
+        return Response(page)
 
-        return qs
+    @action(detail=False, methods=['get'])
+    def resume(self, request):
+        """Totaux (utilisateurs, actifs, staff, par rôle) pour le tableau de bord"""
+        return Response(annuaire.resume())
 
     @action(detail=True, methods=['post'])
     def toggle_active(self, request, pk=None):
@@ -354,7 +302,7 @@ def user_profile(request):
         data = serializer.data
         
         # Ajouter explicitement is_admin
-        profile = Utilisateur.objects.filter(user=request.user).first()
+        profile = profil_de(request.user)
         data['is_admin'] = (
             request.user.is_staff or 
             request.user.is_superuser or 
@@ -363,7 +311,7 @@ def user_profile(request):
         
         return Response(data)
     except Exception as e:
-        print(f"❌ Erreur user_profile: {e}")
+        logger.exception("Erreur user_profile")
         return Response({'error': str(e)}, status=500)
 
 
@@ -373,7 +321,7 @@ def user_role(request):
     """✅ Retourne uniquement le rôle de l'utilisateur"""
     try:
         # Récupérer le profil
-        profile = Utilisateur.objects.filter(user=request.user).first()
+        profile = profil_de(request.user)
         
         # Déterminer le rôle
         if profile:
@@ -395,8 +343,8 @@ def user_role(request):
             'is_staff': request.user.is_staff,
             'is_superuser': request.user.is_superuser
         })
-    except Exception as e:
-        print(f"❌ Erreur user_role: {e}")
+    except Exception:
+        logger.exception("Erreur user_role")
         return Response({
             'username': request.user.username,
             'role': 'user',
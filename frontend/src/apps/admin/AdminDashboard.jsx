@@ -64,7 +64,7 @@ const AdminDashboard = () => {
   const [contribs, setContribs] = useState([]);
   const [comments, setComments] = useState([]);
   const [buses, setBuses] = useState([]);
-  const [users, setUsers] = useState([]);
+  const [users, setUsers] = useState({});
   const [loading, setLoading] = useState(true);
 
   // Séries pour graphiques
@@ -81,8 +81,8 @@ const AdminDashboard = () => {
       comments: comments.length,
       buses: buses.length,
       busesActifs: buses.filter(b => (b.status || '').toLowerCase() === 'actif').length,
-      users: users.length,
-      usersActifs: users.filter(u => u.is_active !== false).length,
+      users: users.total || 0,
+      usersActifs: users.actifs || 0,
     };
   }, [contribs, comments, buses, users]);
 
@@ -99,13 +99,13 @@ const AdminDashboard = () => {
         interactionService.getContributions().catch(() => []),
         interactionService.getComments().catch(() => []),
         transportService.getAllBuses().catch(() => ({ data: [] })),
-        userService.list({}).catch(() => []),
+        userService.summary().catch(() => ({})),
       ]);
       
       setContribs(Array.isArray(contribData) ? contribData : []);
       setComments(Array.isArray(commentData) ? commentData : []);
       setBuses(busesRes.data?.results || busesRes.data || []);
-      setUsers(Array.isArray(usersData) ? usersData : []);
+      setUsers(usersData || {});
 
       await loadAnalytics(usersData);
     } finally {
@@ -115,13 +115,13 @@ const AdminDashboard = () => {
 
   const loadAnalytics = async (usersData) => {
     // Répartition des rôles
-    const arr = Array.isArray(usersData) ? usersData : [];
+    const parRole = usersData?.par_role || {};
     const counts = { admin: 0, staff: 0, moderator: 0, user: 0 };
     
-    arr.forEach(u => {
-      const r = (u.role || 'user').toLowerCase();
-      if (counts[r] !== undefined) counts[r] += 1;
-      else counts.user += 1;
+    Object.entries(parRole).forEach(([role, n]) => {
+      const r = (role || 'user').toLowerCase();
+      if (counts[r] !== undefined) counts[r] += n;
+      else counts.user += n;
     });
     
     const roleData = Object.entries(counts)
@@ -21,6 +21,8 @@ const AdminUsers = () => {
 
   const [list, setList] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [cursor, setCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Filtres
   const [q, setQ] = useState('');
@@ -35,16 +37,19 @@ const AdminUsers = () => {
     setTimeout(() => setToast({ show: false, type, text: '' }), duration);
   };
 
+  const filters = () => ({
+    q: q || undefined,
+    role: role || undefined,
+    active: active || undefined,
+    staff: staff || undefined,
+  });
+
   const load = async () => {
     setLoading(true);
     try {
-      const data = await userService.list({
-        q: q || undefined,
-        role: role || undefined,
-        active: active || undefined,
-        staff: staff || undefined,
-      });
-      setList(Array.isArray(data) ? data : []);
+      const data = await userService.listPage(filters());
+      setList(Array.isArray(data.results) ? data.results : []);
+      setCursor(data.has_more ? data.cursor : null);
     } catch (e) {
       console.error('Erreur chargement utilisateurs:', e);
       showToast("Impossible de charger les utilisateurs", 'error', 2500);
@@ -53,6 +58,21 @@ const AdminUsers = () => {
     }
   };
 
+  const loadMore = async () => {
+    if (!cursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await userService.listPage(filters(), cursor);
+      setList((prev) => [...prev, ...(data.results || [])]);
+      setCursor(data.has_more ? data.cursor : null);
+    } catch (e) {
+      console.error('Erreur chargement utilisateurs:', e);
+      showToast("Impossible de charger la suite", 'error', 2500);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // 1) Chargement initial
   useEffect(() => {
     if (!deny) {
@@ -162,7 +182,7 @@ const AdminUsers = () => {
         <form className="search-field" onSubmit={onSubmitSearch}>
           <FaSearch className="icon-muted" />
           <input
-            placeholder="Recherche (nom d'utilisateur, email, nom…)"
+            placeholder="Recherche (début du nom d'utilisateur, de l'email ou du nom)"
             value={q}
             onChange={(e) => setQ(e.target.value)}
           />
@@ -218,6 +238,9 @@ const AdminUsers = () => {
                   <div className="user-col user-identite-col">
                     <div className="user-name">{displayName}</div>
                     <div className="user-email">{u.email || '-'}</div>
+                    <div className="user-activity">
+                      {u.contributions_count ?? 0} contribution(s) · {u.commentaires_count ?? 0} commentaire(s)
+                    </div>
                   </div>
 
                   {/* Colonne milieu : rôle + badges */}
@@ -279,6 +302,11 @@ const AdminUsers = () => {
                 </div>
               );
             })}
+            {cursor && (
+              <button className="btn-load-more" onClick={loadMore} disabled={loadingMore}>
+                {loadingMore ? 'Chargement…' : 'Afficher plus'}
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -123,11 +123,12 @@ const Profil = () => {
 
       // Gérer l'URL de l'avatar
       if (user.avatar) {
-        if (user.avatar.startsWith('http')) {
-          setAvatarPreview(user.avatar);
+        const avatar = user.avatar_variants?.lg?.webp || user.avatar;
+        if (avatar.startsWith('http')) {
+          setAvatarPreview(avatar);
         } else {
           const baseUrl = process.env.REACT_APP_API_URL || 'http://localhost:8000';
-          setAvatarPreview(`${baseUrl}${user.avatar}`);
+          setAvatarPreview(`${baseUrl}${avatar}`);
         }
       } else {
         setAvatarPreview(null);
@@ -196,11 +197,12 @@ const Profil = () => {
 
       // Restaurer l'avatar original
       if (user.avatar) {
-        if (user.avatar.startsWith('http')) {
-          setAvatarPreview(user.avatar);
+        const avatar = user.avatar_variants?.lg?.webp || user.avatar;
+        if (avatar.startsWith('http')) {
+          setAvatarPreview(avatar);
         } else {
           const baseUrl = process.env.REACT_APP_API_URL || 'http://localhost:8000';
-          setAvatarPreview(`${baseUrl}${user.avatar}`);
+          setAvatarPreview(`${baseUrl}${avatar}`);
         }
       } else {
         setAvatarPreview(null);
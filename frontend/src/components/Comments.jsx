@@ -5,11 +5,18 @@ import { commentService } from '../services/commentService';
 import { useLanguage } from '../hooks/useLanguage';
 import './Comments.css';
 
+const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
+
+// Les miniatures d'avatars arrivent en chemins relatifs (/media/avatars/v/...)
+const mediaUrl = (url) => (url.startsWith('http') ? url : `${API_URL}${url}`);
+
 const Comments = ({ busId }) => {
   const { isAuthenticated } = useAuth();
   const { t } = useLanguage();
 
   const [comments, setComments] = useState([]);
+  const [cursor, setCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [newComment, setNewComment] = useState('');
   const [rating, setRating] = useState(5);
   const [loading, setLoading] = useState(true);
@@ -26,8 +33,8 @@ const Comments = ({ busId }) => {
       setError(null);
 
       const res = await commentService.getComments(busId);
-      const list = Array.isArray(res.data) ? res.data : (res.data.results || []);
-      setComments(list);
+      setComments(res.data.commentaires || []);
+      setCursor(res.data.has_more ? res.data.cursor : null);
     } catch (err) {
       console.error('❌ Erreur chargement commentaires:', err);
       setError(t('common.error') || 'Erreur de chargement');
@@ -36,6 +43,21 @@ const Comments = ({ busId }) => {
     }
   };
 
+  const loadMore = async () => {
+    if (!cursor) return;
+    try {
+      setLoadingMore(true);
+      const res = await commentService.getComments(busId, cursor);
+      setComments((prev) => [...prev, ...(res.data.commentaires || [])]);
+      setCursor(res.data.has_more ? res.data.cursor : null);
+    } catch (err) {
+      console.error('❌ Erreur chargement commentaires:', err);
+      setError(t('common.error') || 'Erreur de chargement');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
 
@@ -183,7 +205,14 @@ const Comments = ({ busId }) => {
                 <div className="comment-header">
                   <div className="user-info">
                     <div className="user-avatar">
-                      {username[0]?.toUpperCase() || '?'}
+                      {c.avatar ? (
+                        <picture>
+                          <source srcSet={mediaUrl(c.avatar.webp)} type="image/webp" />
+                          <img src={mediaUrl(c.avatar.jpeg)} alt={username} loading="lazy" />
+                        </picture>
+                      ) : (
+                        username[0]?.toUpperCase() || '?'
+                      )}
                     </div>
                     <div>
                       <strong>{username}</strong>
@@ -202,6 +231,19 @@ const Comments = ({ busId }) => {
           })
         )}
       </div>
+
+      {cursor && (
+        <button
+          type="button"
+          className="btn-load-more"
+          onClick={loadMore}
+          disabled={loadingMore}
+        >
+          {loadingMore
+            ? t('common.loading') || 'Chargement...'
+            : t('comments.loadMore') || 'Voir plus de commentaires'}
+        </button>
+      )}
     </div>
   );
 };
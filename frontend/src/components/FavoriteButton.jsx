@@ -15,13 +15,7 @@ const FavoriteButton = ({ busId }) => {
   }, [busId, isAuthenticated]);
 
   const checkFavorite = async () => {
-    try {
-      const res = await favoritesService.getFavorites();
-      const favorites = res.data.results || res.data || [];
-      setIsFavorite(favorites.some(f => f.bus_id === parseInt(busId)));
-    } catch (err) {
-      console.error(err);
-    }
+    setIsFavorite(await favoritesService.isFavorite(busId));
   };
 
   const toggleFavorite = async () => {
@@ -32,12 +26,8 @@ const FavoriteButton = ({ busId }) => {
 
     setLoading(true);
     try {
-      if (isFavorite) {
-        await favoritesService.removeFavorite(busId);
-      } else {
-        await favoritesService.addFavorite(busId);
-      }
-      setIsFavorite(!isFavorite);
+      const res = await favoritesService.toggleFavorite(busId);
+      setIsFavorite(res.data.is_favorite);
     } catch (err) {
       console.error(err);
     } finally {
@@ -45,26 +45,37 @@ const AdminLayout = () => {
   const [latestComments, setLatestComments] = useState([]);
   const unreadTotal = pendingContribCount + openReportsCount;
 
-  const loadNotifications = async () => {
-    try {
-      let c = [];
-      try { c = await interactionService.adminListContributions({ status: 'En attente' }); } catch {}
-      setPendingContribCount(Array.isArray(c) ? c.length : 0);
-
-      let r = [];
-      try { r = await interactionService.adminListReports({ status: 'open' }); } catch {}
-      setOpenReportsCount(Array.isArray(r) ? r.length : 0);
-
-      let cm = [];
-      try { cm = await interactionService.getComments({}); } catch {}
-      setLatestComments(Array.isArray(cm) ? cm.slice(0, 5) : []);
-    } catch {}
+  // Compteurs servis depuis le cache ; avec une version, le serveur attend un changement
+  const loadNotifications = async (version = null) => {
+    const data = await interactionService.getNotificationCounters(
+      version ? { version, wait: 25 } : {}
+    );
+    setPendingContribCount(data.contributions_en_attente || 0);
+    setOpenReportsCount(data.signalements_ouverts || 0);
+    setLatestComments(data.derniers_commentaires || []);
+    return data;
   };
 
   useEffect(() => {
-    loadNotifications();
-    const id = setInterval(loadNotifications, 30000);
-    return () => clearInterval(id);
+    let cancelled = false;
+    const poll = async () => {
+      let version = null;
+      while (!cancelled) {
+        try {
+          const data = await loadNotifications(version);
+          version = data.version;
+          // Serveur saturé de long-polls : il répond sans attendre, on repasse plus tard
+          if (data.retry_after) {
+            await new Promise((resolve) => setTimeout(resolve, data.retry_after * 1000));
+          }
+        } catch {
+          version = null;
+          await new Promise((resolve) => setTimeout(resolve, 30000));
+        }
+      }
+    };
+    poll();
+    return () => { cancelled = true; };
   }, []);
 
   // Fermer dropdowns au clic externe
@@ -217,7 +228,7 @@ const AdminLayout = () => {
                   </div>
 
                   <div className="panel-actions">
-                    <button className="btn-small" onClick={loadNotifications}>Actualiser</button>
+                    <button className="btn-small" onClick={() => loadNotifications().catch(() => {})}>Actualiser</button>
                     <button className="btn-small ghost" onClick={() => setShowNotif(false)}>
                       Fermer <FaTimes />
                     </button>
@@ -268,7 +279,7 @@ const AdminLayout = () => {
               >
                 <div className="user-avatar">
                   {user?.avatar ? (
-                    <img src={user.avatar} alt="avatar" />
+                    <img src={user.avatar_thumb || user.avatar} alt="avatar" />
                   ) : (
                     <span>
                       {user?.username?.charAt(0).toUpperCase() || <FaUser />}
@@ -284,7 +295,7 @@ const AdminLayout = () => {
                   <div className="user-profile-summary">
                     <div className="user-avatar medium">
                       {user?.avatar ? (
-                        <img src={user.avatar} alt="avatar" />
+                        <img src={user.avatar_thumb || user.avatar} alt="avatar" />
                       ) : (
                         <span>{user?.username?.charAt(0).toUpperCase()}</span>
                       )}
@@ -312,7 +312,7 @@ const Header = () => {
                 >
                   <div className="user-avatar">
                     {user?.avatar ? (
-                      <img src={user.avatar} alt="avatar" />
+                      <img src={user.avatar_thumb || user.avatar} alt="avatar" />
                     ) : (
                       <span>
                         {user?.username?.charAt(0).toUpperCase() || <FaUserIcon />}
@@ -328,7 +328,7 @@ const Header = () => {
                     <div className="user-profile-summary">
                       <div className="user-avatar medium">
                         {user?.avatar ? (
-                          <img src={user.avatar} alt="avatar" />
+                          <img src={user.avatar_thumb || user.avatar} alt="avatar" />
                         ) : (
                           <span>{user?.username?.charAt(0).toUpperCase()}</span>
                         )}
@@ -51,7 +51,7 @@ const ItinerairePanel = () => {
     if (query.length >= 2) {
       debounceRef.current = setTimeout(async () => {
         try {
-          const results = await localisationService.searchArrets(query);
+          const results = await localisationService.searchArrets(query, userLocation);
           if (type === 'depart') {
             setDepartResults(results);
           } else {
@@ -13,6 +13,7 @@ const SearchPanel = () => {
     selectStop,
     isSearching,
     setIsSearching,
+    userLocation,
   } = useLocation();
 
   const [isOpen, setIsOpen] = useState(false);
@@ -29,7 +30,7 @@ const SearchPanel = () => {
       setIsSearching(true);
       debounceRef.current = setTimeout(async () => {
         try {
-          const results = await localisationService.searchArrets(searchQuery);
+          const results = await localisationService.searchArrets(searchQuery, userLocation);
           setSearchResults(results);
         } catch (error) {
           console.error('Erreur recherche:', error);
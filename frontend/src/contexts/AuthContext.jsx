@@ -39,9 +39,13 @@ export const AuthProvider = ({ children }) => {
           : `${baseUrl}/${avatarUrl}`;
       }
 
+      // Miniature pour les en-têtes (l'original reste dans avatar)
+      const avatarThumb = currentUser.avatar_variants?.sm?.webp || avatarUrl;
+
       setUser({
         ...currentUser,
         avatar: avatarUrl,
+        avatar_thumb: avatarThumb,
         is_staff: !!currentUser.is_staff,
         is_superuser: !!(currentUser.is_superuser || currentUser.isSuperuser),
         is_staf: !!currentUser.is_staf,
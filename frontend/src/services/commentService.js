@@ -3,13 +3,16 @@ import api from './api';
 
 export const commentService = {
   /**
-   * Récupérer les commentaires d'un bus
+   * Récupérer une page du fil de commentaires d'un bus
+   * (cursor = curseur renvoyé par la page précédente)
    */
-  getComments: async (busId) => {
+  getComments: async (busId, cursor = null) => {
     try {
       console.log('📥 Récupération commentaires pour bus:', busId);
       
-      const response = await api.get(`/interaction/commentaires/?bus=${busId}`);
+      const response = await api.get(`/interaction/commentaires/bus/${busId}/`, {
+        params: cursor ? { cursor } : {},
+      });
       
       console.log('✅ Commentaires reçus:', response.data);
       
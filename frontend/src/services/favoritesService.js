@@ -12,11 +12,19 @@ export const favoritesService = {
     return await api.post('/interaction/favoris/toggle/', { busRef: busId });
   },
 
+  // Bus favoris parmi une liste d'ids (une seule requête)
+  async getFavoriteStatus(busIds) {
+    const response = await api.get('/interaction/favoris/statut/', {
+      params: { bus: busIds.join(',') },
+    });
+    return response.data.favoris || [];
+  },
+
   // Vérifie si un bus est favori
   async isFavorite(busId) {
     try {
-      const response = await api.get('/interaction/favoris/');
-      return response.data.some(fav => fav.busRef === busId);
+      const favoris = await this.getFavoriteStatus([busId]);
+      return favoris.includes(Number(busId));
     } catch {
       return false;
     }
@@ -88,6 +88,15 @@ export const interactionService = {
   },
   dismissReport: async (id) => api.post(`${BASE}/reports/${id}/dismiss/`),
   removeReportComment: async (id) => api.post(`${BASE}/reports/${id}/remove_comment/`),
+
+  // Compteurs de la cloche admin (long-polling : { version, wait } attend un changement)
+  getNotificationCounters: async (params = {}) => {
+    const res = await api.get(`${BASE}/notifications/compteurs/`, {
+      params,
+      timeout: ((params.wait || 0) + 15) * 1000,
+    });
+    return res.data;
+  },
 };
 
 export default interactionService;
\ No newline at end of file
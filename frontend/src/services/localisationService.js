@@ -39,11 +39,15 @@ const localisationService = {
     }
   },
 
-  searchArrets: async (query) => {
+  // position optionnelle { lat, lng } : les arrêts proches remontent en tête
+  searchArrets: async (query, position = null) => {
     try {
-      const response = await api.get('/transport/arrets/search/', {
-        params: { q: query },
-      });
+      const params = { q: query };
+      if (position) {
+        params.lat = position.lat;
+        params.lng = position.lng;
+      }
+      const response = await api.get('/transport/arrets/search/', { params });
       return response.data;
     } catch (error) {
       console.error('❌ searchArrets - Erreur:', error);
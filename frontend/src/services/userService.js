@@ -8,6 +8,16 @@ const userService = {
     const res = await api.get(BASE + '/', { params });
     return Array.isArray(res.data) ? res.data : res.data.results || [];
   },
+  // Page de la liste : { results, cursor, has_more } (cursor = curseur de la page précédente)
+  listPage: async (params = {}, cursor = null) => {
+    const res = await api.get(BASE + '/', { params: cursor ? { ...params, cursor } : params });
+    return res.data;
+  },
+  // Totaux { total, actifs, staff, par_role } pour le tableau de bord
+  summary: async () => {
+    const res = await api.get(`${BASE}/resume/`);
+    return res.data;
+  },
   retrieve: async (id) => {
     const res = await api.get(`${BASE}/${id}/`);
     return res.data;